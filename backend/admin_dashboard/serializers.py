@@ -61,7 +61,7 @@ class AdminDashboardStatsSerializer(serializers.Serializer):
         return User.objects.filter(role='customer').count()
 
     def get_pending_orders(self, obj):
-        return Order.objects.filter(status='pending').count()
+        return Order.objects.hot().filter(status='pending').count()
 
     # ---------------- Advanced Metrics ----------------
     def get_monthly_sales(self, obj):
@@ -539,6 +539,8 @@ class AdminOrderSerializer(serializers.ModelSerializer):
                   'delivery_charge','total_commission','total','payment_method','is_paid',
                   'paid_at','razorpay_order_id','razorpay_payment_id','has_refund',
                   'refund_status','cancel_reason','cancelled_at','cancelled_by','cancelled_by_role','is_restocked','courier','waybill','tracking_url','label_url','label_generated_at','shipped_at','handoff_timestamp','delivered_at','checkout_session_id','items','created_at','updated_at',
+                  'item_count','active_item_count','cancelled_item_count','returned_item_count',
+                  'total_weight_grams','refundable_amount',
         ]
         read_only_fields = fields
 
@@ -632,23 +634,13 @@ class OrderPackingSerializer(serializers.ModelSerializer):
     def get_products(self, obj):
         products = []
 
-        for item in obj.items.select_related(
-            "product_variant__product"
-        ).prefetch_related(
-            "product_variant__images"
-        ):
-            variant = item.product_variant
-
-            # ✅ Get first Cloudinary image safely
-            image_url = None
-            first_image = variant.images.first()
-            if first_image:
-                image_url = first_image.image_url
+        for item in obj.items.all():
+            image_url = item.thumbnail_url or None
 
             products.append({
                 "item_id": item.id,                     # 🔥 REQUIRED
-                "product_name": variant.product.name,   # 🔥 clearer
-                "variant": str(variant),
+                "product_name": item.product_name,      # 🔥 clearer
+                "variant": item.display_name,
                 "quantity": item.quantity,
                 "image": image_url,
                 "packed_at": item.packed_at,
@@ -24,3 +24,17 @@ def create_warehouse_log(order_or_item, updated_by, comment=None):
         updated_by=updated_by,
         comment=comment or "",
     )
+
+
+def create_warehouse_logs(items, updated_by, comment=None):
+    """create_warehouse_log for many OrderItems in one insert."""
+    AdminLog.objects.bulk_create([
+        AdminLog(
+            order_item=item,
+            order_id=item.order_id,
+            action=item.status or "Item Updated",
+            updated_by=updated_by,
+            comment=comment or "",
+        )
+        for item in items
+    ])
@@ -31,6 +31,10 @@ from orders.returnReplacementSerializer import ReturnRequestSerializer,Replaceme
 from rest_framework.filters import OrderingFilter,SearchFilter
 from django.utils.dateparse import parse_date
 from orders.models import Order,ReturnRequest,ReplacementRequest,OrderStatus,OrderItemStatus,OrderItem
+from orders.transitions import transition_items, transition_orders
+from orders.models import OrderEvent
+from orders.timeline import record_event, scan_time
+from orders.search import OrderSearchFilter
 from .helpers import str_to_bool
 from .pagination import FlexiblePageSizePagination
 from .models import AdminLog,ContactMessage
@@ -501,14 +505,16 @@ class AdminOrderListAPIView(ListAPIView):
     serializer_class = AdminOrderSerializer
     permission_classes = [IsAdmin]
     pagination_class = FlexiblePageSizePagination
-    filter_backends = [OrderingFilter, SearchFilter]
+    # ?search= matches order number, waybill, customer, phone, product or SKU
+    filter_backends = [OrderingFilter, OrderSearchFilter]
     ordering_fields = [
         'order_number',"created_at", "updated_at", "delivered_at", "total",
         "user__first_name", "user__last_name",
-        "status", "is_paid", "is_refunded", "refund_amount"
+        "status", "is_paid", "is_refunded",
+        "item_count", "active_item_count", "cancelled_item_count", "returned_item_count",
+        "total_weight_grams", "refundable_amount",
     ]
     ordering = ["-created_at"]
-    search_fields = ["user__first_name", "user__last_name", "user__email", "tracking_number"]
 
     def get_queryset(self):
         queryset = Order.objects.all()
@@ -538,6 +544,30 @@ class AdminOrderListAPIView(ListAPIView):
             except ValueError:
                 raise ValidationError("Invalid is_refunded value. Use true/false.")
 
+        # Archived (cold) history vs active orders
+        archived = self.request.query_params.get("archived")
+        if archived is not None:
+            try:
+                queryset = queryset.archived() if str_to_bool(archived) else queryset.hot()
+            except ValueError:
+                raise ValidationError("Invalid archived value. Use true/false.")
+
+        # Stored item aggregates (orders/aggregates.py)
+        partially_cancelled = self.request.query_params.get("partially_cancelled")
+        if partially_cancelled is not None:
+            try:
+                partial = Q(cancelled_item_count__gt=0, cancelled_item_count__lt=F("item_count"))
+                queryset = queryset.filter(partial) if str_to_bool(partially_cancelled) else queryset.exclude(partial)
+            except ValueError:
+                raise ValidationError("Invalid partially_cancelled value. Use true/false.")
+
+        refundable = self.request.query_params.get("refundable")
+        if refundable is not None:
+            try:
+                queryset = queryset.filter(refundable_amount__gt=0) if str_to_bool(refundable) else queryset.filter(refundable_amount=0)
+            except ValueError:
+                raise ValidationError("Invalid refundable value. Use true/false.")
+
         # Filter by date range
         start_date = self.request.query_params.get("start")
         end_date = self.request.query_params.get("end")
@@ -853,10 +883,12 @@ class MarkPackedBulkAPIView(APIView):
 
         updated_items = []
         failed_orders = []
+        to_pack = []
+        packed_at = timezone.now()
 
-        # Prefetch items and variant images for efficiency
-        orders = Order.objects.prefetch_related(
-            Prefetch('items', queryset=OrderItem.objects.select_related('product_variant__product').prefetch_related('product_variant__images'))
+        # Prefetch items (names and images come from the item snapshot)
+        orders = Order.objects.hot().prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.order_by('pk'))
                     ).filter(
                 order_number__in=order_numbers,
                 is_paid=True,
@@ -883,27 +915,30 @@ class MarkPackedBulkAPIView(APIView):
                 failed_orders.append({"order_number": number, "error": "All items already packed"})
                 continue
 
-            to_update = []
             for item in items:
                 if not item.packed_at:
-                    item.packed_at = timezone.now()
-                    item.status = OrderItemStatus.PROCESSING
-                    to_update.append(item)
+                    to_pack.append(item.pk)
 
-                    # Add info for frontend
-                    first_image = item.product_variant.images.first()
+                    # Add info for frontend (from the item's catalog snapshot)
                     updated_items.append({
                         "order_number": order.order_number,
                         "item_id": item.id,
-                        "product_name": item.product_variant.product.name,
-                        "variant": str(item.product_variant),
+                        "product_name": item.product_name,
+                        "variant": item.display_name,
                         "quantity": item.quantity,
-                        "image": first_image.image_url if first_image else None,
-                        "packed_at": item.packed_at
+                        "image": item.thumbnail_url or None,
+                        "packed_at": packed_at
                     })
 
-            if to_update:
-                OrderItem.objects.bulk_update(to_update, ['packed_at', 'status'])
+        # One UPDATE for every item across the selected orders; items already
+        # in processing only get their packed_at
+        if to_pack:
+            with transaction.atomic():
+                transition_items(
+                    to_pack, OrderItemStatus.PROCESSING, fields={"packed_at": packed_at},
+                    actor=request.user, source="packing",
+                )
+                OrderItem.objects.filter(pk__in=to_pack, packed_at__isnull=True).update(packed_at=packed_at)
 
         return Response({
             'success': len(updated_items) > 0,
@@ -921,11 +956,10 @@ class OrdersPackingListAPIView(APIView):
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        orders = (Order.objects.filter(is_paid=True,status=OrderStatus.PROCESSING)
+        orders = (Order.objects.hot().filter(is_paid=True,status=OrderStatus.PROCESSING)
             .prefetch_related(
-                Prefetch(
-                    "items",queryset=OrderItem.objects.select_related("product_variant", "product_variant__product"
-                    ) )) )
+                Prefetch("items", queryset=OrderItem.objects.order_by("pk"))
+            ) )
 
         pending_orders = []
         packed_orders = []
@@ -1097,25 +1131,30 @@ class DelhiveryWebhookAPIView(APIView):
 
     # -------------------- UPDATE FORWARD ORDER --------------------
     def _update_order(self, order, status_type, status_text, new_status, updated_at):
+        # Courier fields always follow the scan; the status only moves
+        # forward through the state machine (late or repeated scans are
+        # ignored), and the order's live items move with it
         with transaction.atomic():
             old_status = order.status
-            order.status = new_status
-            order.delhivery_status_type = status_type
-            order.delhivery_status = status_text
-            order.delhivery_status_updated_at = updated_at
-
-            if new_status == "delivered":
-                order.delivered_at = timezone.now()
-            if new_status == "out_for_delivery":
-                order.shipped_at = timezone.now()
-
-            order.save(update_fields=[
-                "status", "delhivery_status_type", "delhivery_status",
-                "delhivery_status_updated_at", "shipped_at", "delivered_at"
-            ])
-            logger.info("📦 Order %s: %s → %s", order.id, old_status, new_status)
-
-        return {"type": "order", "order_id": order.id, "status": new_status, "waybill": order.waybill}
+            Order.objects.filter(pk=order.pk).update(
+                delhivery_status_type=status_type,
+                delhivery_status=status_text,
+                delhivery_status_updated_at=updated_at,
+            )
+            record_event(
+                order, OrderEvent.SHIPMENT_SCAN, status_text, f"{status_type}: {status_text}",
+                payload={"waybill": order.waybill, "status_type": status_type, "mapped_status": new_status},
+                source="delhivery_webhook", occurred_at=scan_time(updated_at),
+            )
+            moved = transition_orders([order.pk], new_status, source="delhivery_webhook")
+            transition_items(order.items.all(), new_status, source="delhivery_webhook")
+            if moved:
+                logger.info("📦 Order %s: %s → %s", order.id, old_status, new_status)
+
+        return {
+            "type": "order", "order_id": order.id, "status": new_status if moved else old_status,
+            "transitioned": bool(moved), "waybill": order.waybill,
+        }
 
 class ContactMessageAPIView(APIView):
     permission_classes = [IsAuthenticated, IsCustomer | IsPromoter]
@@ -154,7 +154,7 @@ class DelhiveryPickupRequestSerializer(serializers.ModelSerializer):
         return value
 
     def validate_order_numbers(self, value):
-        eligible_orders = Order.objects.filter(
+        eligible_orders = Order.objects.hot().filter(
             order_number__in=value,
             status=OrderStatus.PROCESSING,
             is_paid=True,
@@ -4,6 +4,7 @@ import requests
 from datetime import date, time
 from django.conf import settings
 from .warehouse import DelhiveryPickupRequest
+from orders.delhivery import get_delhivery_client
 from rest_framework.generics import ListAPIView
 logger = logging.getLogger(__name__)
 from rest_framework.views import APIView
@@ -14,7 +15,7 @@ from accounts.permissions import IsAdmin
 from orders.models import Order,OrderStatus
 from django.db import transaction
 
-DELHIVERY_PICKUP_URL = "https://track.delhivery.com/fm/request/new/"
+DELHIVERY_PICKUP_PATH = "/fm/request/new/"
 
 PICKUP_SLOTS = {
     "midday": time(10, 0, 0),
@@ -65,25 +66,19 @@ def create_delhivery_pickup_request(
         "expected_package_count": expected_package_count,
     }
 
-    headers = {
-        "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
 
     # 🔍 DEBUG LOGS (IMPORTANT)
     logger.debug("Delhivery pickup request initiated")
     logger.debug("Pickup payload: %s", payload)
     logger.debug(
         "Delhivery URL: %s | Pickup location: %s",
-        DELHIVERY_PICKUP_URL,
+        DELHIVERY_PICKUP_PATH,
         location_name,
     )
 
     try:
-        response = requests.post(
-            DELHIVERY_PICKUP_URL,
-            headers=headers,
+        response = get_delhivery_client().post(
+            DELHIVERY_PICKUP_PATH,
             json=payload,
             timeout=20,
         )
@@ -156,7 +151,7 @@ class CreateDelhiveryPickupRequestAPIView(APIView):
             )
 
         # 1️⃣ Fetch eligible orders
-        eligible_orders = Order.objects.filter(
+        eligible_orders = Order.objects.hot().filter(
             order_number__in=order_numbers,
             status=OrderStatus.PROCESSING,
             is_paid=True,
@@ -215,7 +210,7 @@ class EligibleOrdersForPickupAPIView(ListAPIView):
     serializer_class=OrderPickupListSerializer
     
     def get_queryset(self):
-        return Order.objects.filter(
+        return Order.objects.hot().filter(
             status=OrderStatus.PROCESSING,
             is_paid=True,
             pickup_request__isnull=True,
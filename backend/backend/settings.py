@@ -5,6 +5,7 @@ load_dotenv()
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 import environ                      
+from corsheaders.defaults import default_headers
 import os
 env = environ.Env(
     # set default values and casting
@@ -352,6 +353,7 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 CSRF_COOKIE_HTTPONLY = False
 CORS_ALLOWED_ORIGINS = [
     "https://beston.netlify.app",
@@ -409,6 +411,12 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # Razorpay credentials (test mode)
 RAZORPAY_KEY_ID = env('RAZORPAY_KEY_ID')
 RAZORPAY_KEY_SECRET = env('RAZORPAY_KEY_SECRET')
+RAZORPAY_WEBHOOK_SECRET = env('RAZORPAY_WEBHOOK_SECRET', default='')
+# "razorpay" or "fake" (in-memory gateway for load runs)
+PAYMENT_GATEWAY_BACKEND = env('PAYMENT_GATEWAY_BACKEND', default='razorpay')
+RAZORPAY_BASE_URL = env('RAZORPAY_BASE_URL', default='') or None
+RAZORPAY_RETRIES = env.int('RAZORPAY_RETRIES', default=2)
+RAZORPAY_POOL_SIZE = env.int('RAZORPAY_POOL_SIZE', default=20)
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 
@@ -426,6 +434,12 @@ else:
     DELHIVERY_API_TOKEN = env("DELHIVERY_TEST_API_TOKEN")
 
 DELHIVERY_API_URL = os.environ.get("DELHIVERY_API_URL", "https://staging-express.delhivery.com/api/kinko/v1/invoice/charges/.json")
+DELHIVERY_BASE_URL = env("DELHIVERY_BASE_URL", default="https://track.delhivery.com")
+# Shared Delhivery client: (connect, read) timeout, retries for idempotent calls, circuit breaker
+DELHIVERY_TIMEOUT = (3.05, 10)
+DELHIVERY_RETRIES = env.int("DELHIVERY_RETRIES", default=2)
+DELHIVERY_BREAKER_THRESHOLD = env.int("DELHIVERY_BREAKER_THRESHOLD", default=5)
+DELHIVERY_BREAKER_RESET = env.int("DELHIVERY_BREAKER_RESET", default=30)
 DELHIVERY_CLIENT_CODE=os.environ.get("DELHIVERY_CLIENT_CODE")
 DELHIVERY_PICKUP = {
     "name": env("DELHIVERY_PICKUP_NAME", default="Beston Connect"),
@@ -442,5 +456,32 @@ DELHIVERY_PICKUP = {
 
 DELHIVERY_PICKUP_LOCATION = DELHIVERY_PICKUP["name"]
 
+# Rate / TAT quote cache (seconds). Stale quotes are served while refreshing.
+DELIVERY_QUOTE_TTL = env.int("DELIVERY_QUOTE_TTL", default=6 * 60 * 60)
+DELIVERY_QUOTE_STALE_TTL = env.int("DELIVERY_QUOTE_STALE_TTL", default=24 * 60 * 60)
+
+# "ratecard": price from the imported rate card + pincode zones, live API as
+# fallback; "live": always ask Delhivery
+DELIVERY_PRICING = env("DELIVERY_PRICING", default="ratecard")
+RATE_CARD_CACHE_SECONDS = env.int("RATE_CARD_CACHE_SECONDS", default=300)
+
+# Overall deadline (seconds) for parallel outbound calls in preview / checkout
+EXTERNAL_CALL_DEADLINE = env.float("EXTERNAL_CALL_DEADLINE", default=8)
+
+# How long a signed preview quote can be reused at checkout
+QUOTE_TOKEN_TTL_SECONDS = env.int("QUOTE_TOKEN_TTL_SECONDS", default=15 * 60)
+
+# Idempotency-Key handling on checkout / verify / cancel / refund
+IDEMPOTENCY_WAIT_SECONDS = env.int("IDEMPOTENCY_WAIT_SECONDS", default=15)
+IDEMPOTENCY_STALE_SECONDS = env.int("IDEMPOTENCY_STALE_SECONDS", default=120)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24)
+
+# How long checkout holds stock for an unpaid order
+STOCK_RESERVATION_TTL_MINUTES = env.int("STOCK_RESERVATION_TTL_MINUTES", default=30)
+
+# Closed orders older than this leave the hot set (manage.py archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = env.int("ORDER_ARCHIVE_AFTER_DAYS", default=180)
+ORDER_ARCHIVE_BATCH_SIZE = env.int("ORDER_ARCHIVE_BATCH_SIZE", default=500)
+
 CRON_SECRET_KEY = env("CRON_SECRET_KEY")
 
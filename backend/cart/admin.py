@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, AbandonedCartArchive, AbandonedCartDailyStat
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'created_at')
-    list_filter = ('created_at',)
+    list_display = ('id', 'user', 'created_at', 'updated_at')
+    list_filter = ('created_at', 'updated_at')
     search_fields = ('user__username', 'user__email')
     ordering = ('-created_at',)
 
@@ -15,3 +15,15 @@ class CartItemAdmin(admin.ModelAdmin):
     search_fields = ('cart__user__username', 'product_variant__product__title')
     autocomplete_fields = ['cart', 'product_variant']
     ordering = ('-added_at',)
+
+@admin.register(AbandonedCartArchive)
+class AbandonedCartArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'item_count', 'total_quantity', 'total_value', 'last_activity_at', 'archived_at')
+    list_filter = ('archived_at',)
+    search_fields = ('user__email',)
+    ordering = ('-archived_at',)
+
+@admin.register(AbandonedCartDailyStat)
+class AbandonedCartDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('date', 'carts', 'empty_carts', 'items', 'units', 'value')
+    ordering = ('-date',)
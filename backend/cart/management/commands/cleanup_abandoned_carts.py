@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+from cart.models import AbandonedCartDailyStat
+from cart.services import archive_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Archives and deletes carts with no activity for CART_RETENTION_DAYS (default 60) days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, "CART_RETENTION_DAYS", 60))
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the carts that would be archived')
+        parser.add_argument('--stats', action='store_true', help='Print the abandoned cart rollup and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats(options['days'])
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        self.stdout.write(f"Cleaning carts inactive since {cutoff:%Y-%m-%d %H:%M}")
+
+        totals = archive_abandoned_carts(
+            cutoff,
+            batch_size=max(options['batch_size'], 1),
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"[dry-run] {totals['carts']} carts would be archived."))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {totals['carts']} carts in {totals['batches']} batches "
+            f"({totals['archived']} archived, {totals['deleted_rows']} rows deleted)."
+        ))
+
+    def print_stats(self, days):
+        since = timezone.localdate() - timedelta(days=days)
+        rows = AbandonedCartDailyStat.objects.filter(date__gte=since)
+        for row in rows:
+            self.stdout.write(f"{row.date}  carts={row.carts} empty={row.empty_carts} units={row.units} value={row.value}")
+        agg = rows.aggregate(carts=Sum('carts'), units=Sum('units'), value=Sum('value'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Last {days} days: {agg['carts'] or 0} carts, {agg['units'] or 0} units, value {agg['value'] or 0}"
+        ))
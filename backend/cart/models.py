@@ -1,11 +1,14 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from products.models import ProductVariant
 User=get_user_model()
 # Create your models here.
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last time the cart or any of its items changed; drives abandoned-cart cleanup
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     @property
     def total_quantity(self):
@@ -17,6 +20,11 @@ class Cart(models.Model):
 
     def __str__(self):
         return self.user.email
+
+    @classmethod
+    def touch(cls, cart_id):
+        """Mark cart activity without loading the row (item add/update/remove)."""
+        cls.objects.filter(pk=cart_id).update(updated_at=timezone.now())
     
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
@@ -41,4 +49,45 @@ class CartItem(models.Model):
 
     @property
     def is_replaceable(self):
-        return self.product_variant.allow_replacement if self.product_variant else False
\ No newline at end of file
+        return self.product_variant.allow_replacement if self.product_variant else False
+
+
+class AbandonedCartArchive(models.Model):
+    """
+    Snapshot of a cart removed by the cleanup job. Keeps the contents for
+    analytics / win-back campaigns without leaving rows in the hot cart tables.
+    """
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="archived_carts")
+    cart_created_at = models.DateTimeField()
+    last_activity_at = models.DateTimeField(db_index=True)
+    item_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    items = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-archived_at"]
+
+    def __str__(self):
+        return f"Archived cart of {self.user_id} ({self.item_count} items)"
+
+
+class AbandonedCartDailyStat(models.Model):
+    """
+    Rollup of archived carts per day of last activity. Statistics are read
+    from here instead of scanning carts or the archive.
+    """
+    date = models.DateField(unique=True)
+    carts = models.PositiveIntegerField(default=0)
+    empty_carts = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.date}: {self.carts} abandoned carts"
@@ -107,3 +107,19 @@ class CartSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ["id", "created_at", "items", "total_quantity", "total_price"]
+
+
+# =========================
+# GUEST CART HYDRATION - INPUT
+# =========================
+class CartHydrationInputSerializer(serializers.Serializer):
+    """
+    variant_ids come from the client's local cart; version is the token
+    returned by the previous hydration call (optional).
+    """
+    variant_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=True,
+        max_length=100,
+    )
+    version = serializers.CharField(required=False, allow_blank=True, allow_null=True)
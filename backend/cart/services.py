@@ -0,0 +1,266 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from products.models import ProductVariant
+from promoter.models import Promoter
+from .models import Cart, CartItem, AbandonedCartArchive, AbandonedCartDailyStat
+
+# Issues that stop a checkout; the rest are informational.
+BLOCKING_ISSUES = {"not_found", "inactive", "out_of_stock", "quantity_reduced"}
+
+
+def _line_variant_id(line):
+    if line.get("product_variant_id") is not None:
+        return int(line["product_variant_id"])
+    variant = line.get("product_variant")
+    return variant.id if variant is not None else None
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _normalize_code(code):
+    return code.strip().upper() if code else None
+
+
+def revalidate_cart(lines, fallback_referral_code=None):
+    """
+    Check a whole cart against current stock, prices, active flags and
+    promoter validity in a fixed number of queries (variants + promoters).
+
+    lines: iterable of dicts with product_variant_id (or product_variant),
+           quantity, and optionally referral_code / expected_price.
+
+    Returns:
+        {
+            "is_valid": bool,          # False if any blocking issue exists
+            "lines": [...],            # one entry per input line (includes model objects)
+            "changes": [...],          # JSON-safe diff entries
+            "subtotal": Decimal,       # subtotal of the valid lines at current prices
+            "variants": {id: ProductVariant},
+            "promoters": {code: Promoter},
+        }
+    """
+    lines = list(lines)
+    variant_ids = {vid for vid in (_line_variant_id(l) for l in lines) if vid is not None}
+    codes = {
+        _normalize_code(l.get("referral_code") or fallback_referral_code)
+        for l in lines
+    } - {None}
+
+    variants = {
+        v.id: v for v in ProductVariant.objects.filter(id__in=variant_ids).select_related("product")
+    }
+    promoters = {p.referral_code: p for p in Promoter.objects.filter(referral_code__in=codes)} if codes else {}
+
+    result_lines = []
+    changes = []
+    subtotal = Decimal("0.00")
+
+    for line in lines:
+        variant_id = _line_variant_id(line)
+        quantity = int(line.get("quantity", 1))
+        variant = variants.get(variant_id)
+        issues = []
+
+        entry = {
+            "product_variant_id": variant_id,
+            "product_variant": variant,
+            "quantity": quantity,
+            "available_quantity": 0,
+            "unit_price": None,
+            "referral_code": line.get("referral_code"),
+            "promoter": None,
+            "issues": issues,
+        }
+        result_lines.append(entry)
+
+        if variant is None:
+            issues.append("not_found")
+            changes.append({"product_variant_id": variant_id, "type": "not_found"})
+            continue
+
+        unit_price = Decimal(str(variant.final_price or 0))
+        entry["unit_price"] = unit_price
+        entry["available_quantity"] = variant.stock
+
+        if not variant.is_active or not variant.product.is_available:
+            issues.append("inactive")
+            changes.append({"product_variant_id": variant_id, "type": "inactive"})
+        elif variant.stock <= 0:
+            issues.append("out_of_stock")
+            changes.append({"product_variant_id": variant_id, "type": "out_of_stock", "requested": quantity})
+        elif variant.stock < quantity:
+            issues.append("quantity_reduced")
+            changes.append({
+                "product_variant_id": variant_id,
+                "type": "quantity_reduced",
+                "requested": quantity,
+                "available": variant.stock,
+            })
+
+        expected_price = _to_decimal(line.get("expected_price"))
+        if expected_price is not None and expected_price != unit_price:
+            issues.append("price_changed")
+            changes.append({
+                "product_variant_id": variant_id,
+                "type": "price_changed",
+                "old_price": f"{expected_price:.2f}",
+                "new_price": f"{unit_price:.2f}",
+            })
+
+        code = _normalize_code(line.get("referral_code") or fallback_referral_code)
+        if code:
+            entry["promoter"] = promoters.get(code)
+            if entry["promoter"] is None:
+                issues.append("invalid_referral")
+                changes.append({"product_variant_id": variant_id, "type": "invalid_referral", "referral_code": code})
+
+        if not BLOCKING_ISSUES.intersection(issues):
+            subtotal += unit_price * quantity
+
+    return {
+        "is_valid": not any(BLOCKING_ISSUES.intersection(l["issues"]) for l in result_lines),
+        "lines": result_lines,
+        "changes": changes,
+        "subtotal": subtotal,
+        "variants": variants,
+        "promoters": promoters,
+    }
+
+
+def revalidation_response(result):
+    """JSON-safe view of a revalidate_cart() result for API responses."""
+    return {
+        "is_valid": result["is_valid"],
+        "subtotal": f"{result['subtotal']:.2f}",
+        "changes": result["changes"],
+        "lines": [
+            {
+                "product_variant_id": l["product_variant_id"],
+                "quantity": l["quantity"],
+                "available_quantity": l["available_quantity"],
+                "unit_price": f"{l['unit_price']:.2f}" if l["unit_price"] is not None else None,
+                "issues": l["issues"],
+            }
+            for l in result["lines"]
+        ],
+    }
+
+
+def cart_lines_for_user(user):
+    """Revalidation input for a user's saved cart (single query, no variant joins)."""
+    from .models import CartItem
+
+    return [
+        {
+            "product_variant_id": pv_id,
+            "quantity": qty,
+            "referral_code": ref,
+        }
+        for pv_id, qty, ref in CartItem.objects.filter(
+            cart__user=user, product_variant__isnull=False
+        ).values_list("product_variant_id", "quantity", "referral_code")
+    ]
+
+
+# =====================================================
+# ABANDONED CART CLEANUP
+# =====================================================
+def _archive_cart_batch(cart_rows, cutoff):
+    """
+    Snapshot, roll up and delete one batch of carts. Caller holds the row
+    locks; items are read with a single values() query.
+    """
+    ids = [row["id"] for row in cart_rows]
+    items_by_cart = defaultdict(list)
+    for item in CartItem.objects.filter(cart_id__in=ids).values(
+        "cart_id", "product_variant_id", "quantity", "referral_code",
+        "product_variant__base_price", "product_variant__offer_price",
+    ):
+        price = item["product_variant__offer_price"] or item["product_variant__base_price"] or Decimal("0")
+        items_by_cart[item["cart_id"]].append({
+            "product_variant_id": item["product_variant_id"],
+            "quantity": item["quantity"],
+            "unit_price": f"{price:.2f}",
+            "referral_code": item["referral_code"],
+        })
+
+    archives = []
+    daily = defaultdict(lambda: {"carts": 0, "empty_carts": 0, "items": 0, "units": 0, "value": Decimal("0")})
+    for row in cart_rows:
+        items = items_by_cart.get(row["id"], [])
+        units = sum(i["quantity"] for i in items)
+        value = sum((Decimal(i["unit_price"]) * i["quantity"] for i in items), Decimal("0"))
+
+        bucket = daily[timezone.localdate(row["updated_at"])]
+        bucket["carts"] += 1
+        bucket["empty_carts"] += 0 if items else 1
+        bucket["items"] += len(items)
+        bucket["units"] += units
+        bucket["value"] += value
+
+        # Empty carts are only counted, there is nothing worth keeping
+        if items:
+            archives.append(AbandonedCartArchive(
+                user_id=row["user_id"],
+                cart_created_at=row["created_at"],
+                last_activity_at=row["updated_at"],
+                item_count=len(items),
+                total_quantity=units,
+                total_value=value,
+                items=items,
+            ))
+
+    AbandonedCartArchive.objects.bulk_create(archives)
+
+    for day, counts in daily.items():
+        updated = AbandonedCartDailyStat.objects.filter(date=day).update(
+            **{key: F(key) + val for key, val in counts.items()}
+        )
+        if not updated:
+            AbandonedCartDailyStat.objects.create(date=day, **counts)
+
+    # Re-check the cutoff so a cart touched since selection is never dropped
+    deleted, _ = Cart.objects.filter(id__in=ids, updated_at__lt=cutoff).delete()
+    return {"carts": len(cart_rows), "archived": len(archives), "deleted_rows": deleted}
+
+
+def archive_abandoned_carts(cutoff, batch_size=500, dry_run=False):
+    """
+    Archive and delete carts with no activity since `cutoff`, in short
+    per-batch transactions. Rows locked by a live request are skipped and
+    picked up on the next run.
+    """
+    totals = {"batches": 0, "carts": 0, "archived": 0, "deleted_rows": 0}
+    stale = Cart.objects.filter(updated_at__lt=cutoff)
+
+    if dry_run:
+        totals["carts"] = stale.count()
+        return totals
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            cart_rows = list(
+                stale.filter(id__gt=last_id)
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values("id", "user_id", "created_at", "updated_at")[:batch_size]
+            )
+            if not cart_rows:
+                break
+            result = _archive_cart_batch(cart_rows, cutoff)
+
+        last_id = cart_rows[-1]["id"]
+        totals["batches"] += 1
+        for key in ("carts", "archived", "deleted_rows"):
+            totals[key] += result[key]
+
+    return totals
@@ -1,3 +1,120 @@
+from decimal import Decimal
 from django.test import TestCase
+from rest_framework.test import APIClient
+from products.models import Category, Product, ProductVariant
 
-# Create your tests here.
+
+class GuestCartHydrateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/cart/hydrate/'
+        category = Category.objects.create(name="Mobiles")
+        product = Product.objects.create(category=category, name="Phone", description="A phone")
+        self.v1 = ProductVariant.objects.create(
+            product=product, variant_name="64GB", sku="PH-64", stock=5, base_price=Decimal("100.00")
+        )
+        self.v2 = ProductVariant.objects.create(
+            product=product, variant_name="128GB", sku="PH-128", stock=2,
+            base_price=Decimal("150.00"), offer_price=Decimal("140.00")
+        )
+
+    def test_full_hydration_returns_compact_rows(self):
+        response = self.client.post(self.url, {"variant_ids": [self.v1.id, self.v2.id, 999]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        rows = {row["id"]: row for row in response.data["variants"]}
+        self.assertEqual(rows[self.v2.id]["final_price"], "140.00")
+        self.assertEqual(set(rows[self.v1.id]), {"id", "final_price", "stock", "is_active", "thumbnail"})
+        self.assertEqual(response.data["removed"], [999])
+        self.assertTrue(response.data["version"])
+
+    def test_delta_returns_only_changed_variants(self):
+        first = self.client.post(self.url, {"variant_ids": [self.v1.id, self.v2.id]}, format="json")
+        ProductVariant.objects.filter(id=self.v2.id).update(stock=0)
+
+        second = self.client.post(
+            self.url,
+            {"variant_ids": [self.v1.id, self.v2.id], "version": first.data["version"]},
+            format="json",
+        )
+        self.assertTrue(second.data["is_delta"])
+        self.assertEqual([row["id"] for row in second.data["variants"]], [self.v2.id])
+        self.assertEqual(second.data["variants"][0]["stock"], 0)
+
+    def test_tampered_version_falls_back_to_full_response(self):
+        response = self.client.post(
+            self.url, {"variant_ids": [self.v1.id], "version": "garbage"}, format="json"
+        )
+        self.assertFalse(response.data["is_delta"])
+        self.assertEqual(len(response.data["variants"]), 1)
+
+
+class CartRevalidationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Laptops")
+        product = Product.objects.create(category=category, name="Laptop", description="A laptop")
+        self.in_stock = ProductVariant.objects.create(
+            product=product, variant_name="8GB", sku="LP-8", stock=10, base_price=Decimal("500.00")
+        )
+        self.low_stock = ProductVariant.objects.create(
+            product=product, variant_name="16GB", sku="LP-16", stock=1, base_price=Decimal("700.00")
+        )
+        self.inactive = ProductVariant.objects.create(
+            product=product, variant_name="32GB", sku="LP-32", stock=3, base_price=Decimal("900.00"), is_active=False
+        )
+
+    def test_diff_reports_every_problem_in_fixed_queries(self):
+        from .services import revalidate_cart
+
+        lines = [
+            {"product_variant_id": self.in_stock.id, "quantity": 1, "expected_price": "450.00"},
+            {"product_variant_id": self.low_stock.id, "quantity": 2},
+            {"product_variant_id": self.inactive.id, "quantity": 1},
+            {"product_variant_id": 999, "quantity": 1, "referral_code": "nope"},
+        ]
+        with self.assertNumQueries(2):
+            result = revalidate_cart(lines)
+
+        types = {(c["product_variant_id"], c["type"]) for c in result["changes"]}
+        self.assertIn((self.in_stock.id, "price_changed"), types)
+        self.assertIn((self.low_stock.id, "quantity_reduced"), types)
+        self.assertIn((self.inactive.id, "inactive"), types)
+        self.assertIn((999, "not_found"), types)
+        self.assertFalse(result["is_valid"])
+        self.assertEqual(result["subtotal"], Decimal("500.00"))
+
+
+class AbandonedCartCleanupTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        User = get_user_model()
+        category = Category.objects.create(name="Books")
+        product = Product.objects.create(category=category, name="Novel", description="A novel")
+        self.variant = ProductVariant.objects.create(
+            product=product, variant_name="Paperback", sku="NV-PB", stock=5, base_price=Decimal("250.00")
+        )
+        self.stale_user = User.objects.create_user("stale@example.com", "Stale", "User", "pass1234")
+        self.fresh_user = User.objects.create_user("fresh@example.com", "Fresh", "User", "pass1234")
+
+    def test_stale_carts_are_archived_and_rolled_up(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import Cart, CartItem, AbandonedCartArchive, AbandonedCartDailyStat
+
+        stale = Cart.objects.create(user=self.stale_user)
+        CartItem.objects.create(cart=stale, product_variant=self.variant, quantity=2)
+        fresh = Cart.objects.create(user=self.fresh_user)
+        Cart.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=90))
+
+        call_command("cleanup_abandoned_carts", days=60, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(Cart.objects.filter(pk=stale.pk).exists())
+        self.assertTrue(Cart.objects.filter(pk=fresh.pk).exists())
+        archive = AbandonedCartArchive.objects.get()
+        self.assertEqual(archive.user, self.stale_user)
+        self.assertEqual(archive.total_quantity, 2)
+        self.assertEqual(archive.total_value, Decimal("500.00"))
+        stat = AbandonedCartDailyStat.objects.get()
+        self.assertEqual((stat.carts, stat.units), (1, 2))
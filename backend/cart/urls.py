@@ -4,7 +4,9 @@ from .views import (
     CartSummaryAPIView,
     CartMergeAPIView,
     ProductVariantBulkAPIView,
-    GuestCartDetailsAPIView
+    GuestCartDetailsAPIView,
+    GuestCartHydrateAPIView,
+    CartRevalidateAPIView,
 )
 from django.urls import path
 
@@ -13,7 +15,9 @@ urlpatterns = [
     path('cart/<int:id>/', CartItemRetrieveUpdateDestroyAPIView.as_view()),
     path('cart/summary/', CartSummaryAPIView.as_view(), name='cart-summary'),
     path("cart/merge/", CartMergeAPIView.as_view(), name="cart-merge"),
+    path("cart/revalidate/", CartRevalidateAPIView.as_view(), name="cart-revalidate"),
     path('product-variants/bulk/', ProductVariantBulkAPIView.as_view(), name='product-variant-bulk'),
+    path('cart/hydrate/', GuestCartHydrateAPIView.as_view(), name='cart-hydrate'),
 
     
 ]
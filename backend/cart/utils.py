@@ -1,7 +1,93 @@
+import hashlib
+from django.core import signing
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
+from products.models import ProductVariant, ProductVariantImage
+
+HYDRATION_TOKEN_SALT = "cart.hydration"
+
 
 def check_stock(product_variant, quantity):
     if product_variant.stock is None or product_variant.stock < quantity:
         raise serializers.ValidationError(
             f'Not enough stock available. Requested: {quantity}, Available: {product_variant.stock or 0}'
         )
+
+
+def get_variant_hydration_rows(variant_ids):
+    """
+    Fetch the compact per-variant state a client cart needs (price, stock,
+    active flag, thumbnail) in a single query.
+    """
+    first_image = (
+        ProductVariantImage.objects.filter(variant=OuterRef("pk"))
+        .order_by("id")
+        .values("image_url")[:1]
+    )
+    rows = (
+        ProductVariant.objects.filter(id__in=variant_ids)
+        .annotate(thumbnail=Coalesce(Subquery(first_image), F("product__image_url")))
+        .values("id", "base_price", "offer_price", "stock", "is_active", "thumbnail")
+    )
+
+    result = []
+    for row in rows:
+        final_price = row["offer_price"] or row["base_price"]
+        result.append({
+            "id": row["id"],
+            "final_price": f"{final_price:.2f}" if final_price is not None else None,
+            "stock": row["stock"],
+            "is_active": row["is_active"],
+            "thumbnail": row["thumbnail"],
+        })
+    return result
+
+
+def hydration_digest(row):
+    """Short fingerprint of the fields a client caches for a variant."""
+    raw = f"{row['final_price']}|{row['stock']}|{row['is_active']}|{row['thumbnail']}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:10]
+
+
+def dump_hydration_version(digests):
+    return signing.dumps(digests, salt=HYDRATION_TOKEN_SALT, compress=True)
+
+
+def load_hydration_version(token):
+    """Return the {variant_id: digest} map from a version token, or {} if invalid."""
+    if not token:
+        return {}
+    try:
+        data = signing.loads(token, salt=HYDRATION_TOKEN_SALT)
+    except signing.BadSignature:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def build_cart_hydration(variant_ids, version=None):
+    """
+    Build a hydration response for the given variants.
+    When a previous version token is supplied only the variants whose
+    state changed since that token are returned.
+    """
+    previous = load_hydration_version(version)
+    rows = get_variant_hydration_rows(variant_ids)
+
+    digests = {}
+    changed = []
+    for row in rows:
+        key = str(row["id"])
+        digests[key] = hydration_digest(row)
+        if previous.get(key) != digests[key]:
+            changed.append(row)
+
+    found_ids = {row["id"] for row in rows}
+    removed = [vid for vid in dict.fromkeys(variant_ids) if vid not in found_ids]
+
+    return {
+        "version": dump_hydration_version(digests),
+        "variants": changed,
+        "removed": removed,
+        "is_delta": bool(previous),
+    }
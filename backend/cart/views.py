@@ -11,11 +11,13 @@ from .serializers import (
     CartItemSerializer,
     CartSummarySerializer,
     CartItemInputSerializer,
+    CartHydrationInputSerializer,
 )
 from .models import CartItem, Cart
 from accounts.permissions import IsCustomer
 from products.models import ProductVariant
-from .utils import check_stock
+from .utils import check_stock, build_cart_hydration
+from .services import revalidate_cart, revalidation_response, cart_lines_for_user
 from decimal import Decimal
 
 
@@ -67,6 +69,7 @@ class CartItemListCreateApiView(ListCreateAPIView):
                 quantity=quantity,
                 referral_code=ref_code,
             )
+        Cart.touch(cart.id)
 
 
 # =====================================================
@@ -98,11 +101,14 @@ class CartItemRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         if ref_code is not None:
             item.referral_code = ref_code
         item.save()
+        Cart.touch(item.cart_id)
 
     def perform_destroy(self, instance):
         if instance.cart.user != self.request.user:
             raise ValidationError("Not allowed.")
+        cart_id = instance.cart_id
         instance.delete()
+        Cart.touch(cart_id)
 
 
 # =====================================================
@@ -124,6 +130,32 @@ class CartSummaryAPIView(APIView):
         serializer = CartSummarySerializer(cart, context={"request": request})
         return Response(serializer.data)
 
+# =====================================================
+# CART REVALIDATION (pre-checkout diff)
+# =====================================================
+class CartRevalidateAPIView(APIView):
+    """
+    Revalidates the user's whole cart against current stock, prices, active
+    flags and referral codes. Optional body:
+        {"expected_prices": {"<variant_id>": "199.00", ...}}
+    so the client can be told which prices changed since it rendered the cart.
+    """
+    permission_classes = [IsAuthenticated, IsCustomer]
+
+    def post(self, request):
+        expected_prices = request.data.get("expected_prices") or {}
+        if not isinstance(expected_prices, dict):
+            return Response({"detail": "expected_prices must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = cart_lines_for_user(request.user)
+        for line in lines:
+            expected = expected_prices.get(str(line["product_variant_id"]))
+            if expected is not None:
+                line["expected_price"] = expected
+
+        return Response(revalidation_response(revalidate_cart(lines)))
+
+
 class CartMergeAPIView(APIView):
     permission_classes = [IsAuthenticated, IsCustomer]
     throttle_classes = [UserRateThrottle]
@@ -188,6 +220,9 @@ class CartMergeAPIView(APIView):
             except Exception as e:
                 failed_items.append({"item": item, "error": str(e)})
 
+        if merged_items:
+            Cart.touch(cart.id)
+
         return Response({
             "detail": "Cart merged successfully",
             "cart": CartSummarySerializer(cart).data,
@@ -217,6 +252,25 @@ class ProductVariantBulkAPIView(APIView):
         return Response(serializer.data)
 
 
+# =====================================================
+# GUEST CART HYDRATION (compact, delta-aware)
+# =====================================================
+class GuestCartHydrateAPIView(APIView):
+    """
+    Lightweight replacement for the bulk variant fetch on page load.
+    Returns only price / stock / active flag / thumbnail per variant, and
+    only the variants that changed when the client sends its last version.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = CartHydrationInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        return Response(build_cart_hydration(data["variant_ids"], data.get("version")))
+
+
 # =====================================================
 # GUEST CART DETAILS
 # =====================================================
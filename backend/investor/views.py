@@ -23,7 +23,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models import Sum
 import razorpay
-from django.conf import settings
+from orders.gateway import get_payment_gateway
 from datetime import timezone
 
 class InvestorListCreateAPIView(generics.ListCreateAPIView):
@@ -234,9 +234,9 @@ class RazorpayInvestmentOrderCreateAPIView(APIView):
 
         total_amount = sum(inv.amount for inv in investments)
 
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        gateway = get_payment_gateway()
 
-        razorpay_order = client.order.create({
+        razorpay_order = gateway.create_order({
             "amount": int(total_amount * 100),  # Razorpay expects amount in paise
             "currency": "INR",
             "payment_capture": 1,
@@ -271,17 +271,17 @@ class RazorpayInvestmentVerifyAPIView(APIView):
             raise ValidationError("Missing Razorpay verification data.")
 
         try:
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+            gateway = get_payment_gateway()
 
             # Step 1: Verify signature
-            client.utility.verify_payment_signature({
+            gateway.verify_payment_signature({
                 'razorpay_order_id': razorpay_order_id,
                 'razorpay_payment_id': razorpay_payment_id,
                 'razorpay_signature': razorpay_signature
             })
 
             # Step 2: Fetch order details
-            order = client.order.fetch(razorpay_order_id)
+            order = gateway.fetch_order(razorpay_order_id)
 
             investment_ids_str = order['notes'].get("investment_ids")
             if not investment_ids_str:
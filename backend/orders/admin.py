@@ -9,7 +9,13 @@ from .models import (
                 ReturnRequest,
                 ReturnRecoveryAccount,
                 ReturnRecoveryTransaction,
-                ReplacementRequest
+                ReplacementRequest,
+                PincodeServiceability,
+                DeliveryRateCard,
+                UnusedGatewayOrder,
+                StockReservation,
+                IdempotencyKey,
+                RazorpayWebhookEvent,
             )
 
 from django.contrib import admin
@@ -48,7 +54,7 @@ class OrderAdmin(admin.ModelAdmin):
         "tracking_link",
         "created_at",
     )
-    list_filter = ("status", "is_paid", "payment_method", "created_at")
+    list_filter = ("status", "is_paid", "payment_method", "created_at", "archived_at")
     search_fields = (
         "order_number",
         "user__email",
@@ -212,3 +218,52 @@ class ReplacementRequestAdmin(admin.ModelAdmin):
     )
     autocomplete_fields = ("order", "order_item", "user")
     readonly_fields = ("created_at", "updated_at", "shipped_at", "delivered_at")
+
+
+# -------------------- PINCODE DIRECTORY --------------------
+@admin.register(PincodeServiceability)
+class PincodeServiceabilityAdmin(admin.ModelAdmin):
+    list_display = ("pin", "city", "state_code", "zone", "prepaid", "cod", "pickup", "embargo", "tat_days", "refreshed_at")
+    list_filter = ("zone", "state_code", "prepaid", "cod", "embargo")
+    search_fields = ("pin", "city", "district")
+
+
+@admin.register(DeliveryRateCard)
+class DeliveryRateCardAdmin(admin.ModelAdmin):
+    list_display = ("kind", "zone", "base_charge", "additional_charge", "oda_charge", "is_active", "verified_at", "max_deviation")
+    list_filter = ("kind", "zone", "is_active")
+    readonly_fields = ("imported_at", "verified_at", "max_deviation")
+
+
+# -------------------- UNUSED GATEWAY ORDERS --------------------
+@admin.register(UnusedGatewayOrder)
+class UnusedGatewayOrderAdmin(admin.ModelAdmin):
+    list_display = ("razorpay_order_id", "receipt", "amount", "reason", "status", "refund_id", "created_at", "resolved_at")
+    list_filter = ("status",)
+    search_fields = ("razorpay_order_id", "receipt", "razorpay_payment_id", "refund_id")
+
+
+# -------------------- STOCK RESERVATIONS --------------------
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("id", "order", "product_variant", "quantity", "status", "expires_at", "updated_at")
+    list_filter = ("status",)
+    search_fields = ("order__order_number", "product_variant__sku")
+    raw_id_fields = ("order", "product_variant")
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "scope", "key", "status", "response_status", "created_at")
+    list_filter = ("scope", "status")
+    search_fields = ("key", "user__email")
+    raw_id_fields = ("user",)
+
+
+@admin.register(RazorpayWebhookEvent)
+class RazorpayWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event", "status", "attempts", "order", "received_at", "processed_at")
+    list_filter = ("event", "status")
+    search_fields = ("event_id", "order__order_number")
+    raw_id_fields = ("order",)
+    readonly_fields = ("payload",)
@@ -0,0 +1,102 @@
+"""
+Stored order aggregates.
+
+Order keeps the facts about its items that list, packing and shipping code
+read, filter and sort on, so none of them re-query `items`:
+
+    item_count            item lines
+    active_item_count     lines neither cancelled nor refunded
+    cancelled_item_count  cancelled lines
+    returned_item_count   lines in the return flow (initiated, at warehouse, refunded)
+    total_weight_grams    weight snapshot x quantity of the active lines
+    refundable_amount     paid value of the active lines not refunded yet
+
+Checkout fills them from the items it has in memory (item_aggregates).
+After that refresh_order_aggregates(order_ids) recomputes them for many
+orders in one UPDATE with correlated subqueries; the receivers in
+orders/signals.py call it in the same transaction whenever items are
+saved, deleted or transitioned, the order is paid or a return is refunded.
+"""
+from decimal import Decimal
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from .models import Order, OrderItem, OrderItemStatus, ReturnRequest
+
+INACTIVE_ITEM_STATUSES = [OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED]
+RETURNED_ITEM_STATUSES = [
+    OrderItemStatus.RETURN_INITIATED, OrderItemStatus.DELIVERED_TO_WAREHOUSE, OrderItemStatus.REFUNDED,
+]
+AGGREGATE_FIELDS = [
+    "item_count", "active_item_count", "cancelled_item_count", "returned_item_count",
+    "total_weight_grams", "refundable_amount",
+]
+# OrderItem fields the aggregates are computed from
+ITEM_SOURCE_FIELDS = {"order", "status", "quantity", "price", "weight_grams", "refund_amount"}
+
+_MONEY = DecimalField(max_digits=10, decimal_places=2)
+_ZERO = Decimal("0.00")
+
+
+def item_aggregates(items, is_paid=False):
+    """Aggregate values for in-memory `items` (checkout, before anything is saved)."""
+    items = list(items)
+    active = [item for item in items if item.status not in INACTIVE_ITEM_STATUSES]
+    refundable = sum((item.price * item.quantity - (item.refund_amount or 0) for item in active), _ZERO)
+    return {
+        "item_count": len(items),
+        "active_item_count": len(active),
+        "cancelled_item_count": sum(item.status == OrderItemStatus.CANCELLED for item in items),
+        "returned_item_count": sum(item.status in RETURNED_ITEM_STATUSES for item in items),
+        "total_weight_grams": sum(item.weight_grams * item.quantity for item in active),
+        "refundable_amount": max(refundable, _ZERO) if is_paid else _ZERO,
+    }
+
+
+def _per_order(queryset, aggregate, output_field):
+    value = queryset.order_by().values("order").annotate(value=aggregate).values("value")
+    return Coalesce(Subquery(value, output_field=output_field), Value(0), output_field=output_field)
+
+
+def aggregate_expressions():
+    """UPDATE expressions recomputing every aggregate column from the items."""
+    items = OrderItem.objects.filter(order=OuterRef("pk"))
+    active = items.exclude(status__in=INACTIVE_ITEM_STATUSES)
+    # returns refunded through ReturnRequest leave the item status alone
+    refunded_returns = ReturnRequest.objects.filter(order=OuterRef("pk"), status="refunded").exclude(
+        order_item__status__in=INACTIVE_ITEM_STATUSES
+    )
+    refundable = (
+        _per_order(active, Sum(F("price") * F("quantity") - F("refund_amount"), output_field=_MONEY), _MONEY)
+        - _per_order(refunded_returns, Sum("refund_amount"), _MONEY)
+    )
+    return {
+        "item_count": _per_order(items, Count("pk"), IntegerField()),
+        "active_item_count": _per_order(active, Count("pk"), IntegerField()),
+        "cancelled_item_count": _per_order(items.filter(status=OrderItemStatus.CANCELLED), Count("pk"), IntegerField()),
+        "returned_item_count": _per_order(items.filter(status__in=RETURNED_ITEM_STATUSES), Count("pk"), IntegerField()),
+        "total_weight_grams": _per_order(active, Sum(F("weight_grams") * F("quantity")), IntegerField()),
+        "refundable_amount": Case(
+            When(is_paid=True, then=Greatest(refundable, Value(_ZERO), output_field=_MONEY)),
+            default=Value(_ZERO),
+            output_field=_MONEY,
+        ),
+    }
+
+
+def refresh_order_aggregates(order_ids):
+    """Recompute the aggregates of many orders in one statement."""
+    order_ids = {pk for pk in order_ids if pk}
+    if not order_ids:
+        return 0
+    return Order.objects.filter(pk__in=order_ids).update(**aggregate_expressions())
+
+
+def refresh_item_order_aggregates(item_ids):
+    """refresh_order_aggregates for the orders of these items, still one statement."""
+    item_ids = list(item_ids)
+    if not item_ids:
+        return 0
+    orders = Order.objects.filter(pk__in=OrderItem.objects.filter(pk__in=item_ids).values("order_id"))
+    return orders.update(**aggregate_expressions())
@@ -0,0 +1,121 @@
+"""
+Hot / cold split for order history.
+
+Closed orders (delivered, cancelled, returned, replaced) with nothing left
+to settle are archived once they are older than ORDER_ARCHIVE_AFTER_DAYS:
+
+- Order / OrderItem rows stay where they are with `archived_at` set, so
+  every existing API, foreign key and report still reads them. Active
+  workflows use Order.objects.hot(), and the partial *_hot_* indexes only
+  cover unarchived rows, so their size tracks open work, not history.
+- Their Notification rows move to ArchivedNotification, so the table every
+  send de-duplicates against only holds recent orders.
+
+    python manage.py archive_orders               # closed > 180 days ago
+    python manage.py archive_orders --restore ORD-123456789012
+
+Rows are moved in batches of ORDER_ARCHIVE_BATCH_SIZE, one transaction per
+batch, so the command can be stopped and re-run at any point.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    ArchivedNotification, Notification, Order, OrderItem, OrderStatus, Refund, ReplacementRequest, ReturnRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = [
+    OrderStatus.DELIVERED, OrderStatus.CANCELLED, OrderStatus.DELIVERED_TO_WAREHOUSE, OrderStatus.REPL_COMPLETED,
+]
+RETURN_DONE = ["refunded", "canceled", "closed", "rejected", "pickup_failed"]
+REPLACEMENT_DONE = ["completed", "failed", "rejected", "cancelled"]
+
+
+def archive_cutoff(days=None, now=None):
+    days = getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 180) if days is None else days
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    """
+    Hot orders that closed before `cutoff` and have no open return,
+    replacement, pending refund or unsettled promoter commission.
+    """
+    open_returns = ReturnRequest.objects.filter(order=OuterRef("pk")).exclude(status__in=RETURN_DONE)
+    open_replacements = ReplacementRequest.objects.filter(order=OuterRef("pk")).exclude(status__in=REPLACEMENT_DONE)
+    pending_refunds = Refund.objects.filter(order=OuterRef("pk"), status="pending")
+    unpaid_commission = OrderItem.objects.filter(
+        order=OuterRef("pk"), promoter__isnull=False, is_commission_applied=False, status="delivered",
+    )
+    return (
+        Order.objects.hot()
+        .filter(status__in=CLOSED_STATUSES)
+        .annotate(closed_at=Coalesce("delivered_at", "cancelled_at", "updated_at", output_field=DateTimeField()))
+        .filter(closed_at__lt=cutoff)
+        .exclude(Exists(open_returns) | Exists(open_replacements) | Exists(pending_refunds) | Exists(unpaid_commission))
+    )
+
+
+def _archive_batch(order_ids, cutoff, now):
+    with transaction.atomic():
+        # re-check under the lock: a return may have been opened meanwhile
+        order_ids = list(
+            archivable_orders(cutoff).filter(pk__in=order_ids).select_for_update().values_list("pk", flat=True)
+        )
+        notifications = list(Notification.objects.filter(Q(order_id__in=order_ids) | Q(order_item__order_id__in=order_ids)))
+        ArchivedNotification.objects.bulk_create(
+            [ArchivedNotification.from_notification(n) for n in notifications], ignore_conflicts=True,
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in notifications]).delete()
+        OrderItem.objects.filter(order_id__in=order_ids).update(archived_at=now)
+        Order.objects.filter(pk__in=order_ids).update(archived_at=now)
+    return len(order_ids), len(notifications)
+
+
+def archive_orders(cutoff=None, batch_size=None, limit=None, dry_run=False):
+    """Archive every archivable order; returns counts."""
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or getattr(settings, "ORDER_ARCHIVE_BATCH_SIZE", 500)
+    candidates = archivable_orders(cutoff).order_by("pk").values_list("pk", flat=True)
+    if limit:
+        candidates = candidates[:limit]
+    candidates = list(candidates)
+
+    summary = {"cutoff": cutoff, "candidates": len(candidates), "orders": 0, "notifications": 0}
+    if dry_run:
+        return summary
+
+    now = timezone.now()
+    for start in range(0, len(candidates), batch_size):
+        orders, notifications = _archive_batch(candidates[start:start + batch_size], cutoff, now)
+        summary["orders"] += orders
+        summary["notifications"] += notifications
+    logger.info("Archived %s orders closed before %s", summary["orders"], cutoff)
+    return summary
+
+
+@transaction.atomic
+def restore_orders(orders):
+    """Bring archived orders (queryset or order numbers) back to the hot set, e.g. for a late claim."""
+    if not hasattr(orders, "filter"):
+        orders = Order.objects.filter(order_number__in=list(orders))
+    order_ids = list(orders.archived().select_for_update().values_list("pk", flat=True))
+
+    archived = list(ArchivedNotification.objects.filter(Q(order_id__in=order_ids) | Q(order_item__order_id__in=order_ids)))
+    if archived:
+        Notification.objects.bulk_create([a.to_notification() for a in archived], ignore_conflicts=True)
+        # auto_now_add stamped "now" on insert; put the original times back
+        Notification.objects.filter(pk__in=[a.original_id for a in archived]).update(
+            created_at=Case(*[When(pk=a.original_id, then=Value(a.created_at)) for a in archived])
+        )
+        ArchivedNotification.objects.filter(pk__in=[a.pk for a in archived]).delete()
+
+    OrderItem.objects.filter(order_id__in=order_ids).update(archived_at=None)
+    Order.objects.filter(pk__in=order_ids).update(archived_at=None)
+    return len(order_ids)
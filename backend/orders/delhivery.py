@@ -0,0 +1,176 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised without touching the network while the breaker is open. Subclasses
+    ConnectionError so existing `except RequestException` handlers cover it.
+    """
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After `failure_threshold` failures calls fail
+    fast for `reset_timeout` seconds, then one trial call is let through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half-open" and self._trial_in_flight):
+                raise CircuitOpenError("Delhivery circuit open, failing fast")
+            if state == "half-open":
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Delhivery circuit opened after %s failures", self._failures)
+                self._opened_at = time.monotonic()
+
+    def reset(self):
+        self.record_success()
+
+
+class DelhiveryClient:
+    """
+    One pooled, keep-alive session for every Delhivery API call.
+
+    - `path` may be relative to DELHIVERY_BASE_URL or an absolute URL
+    - GET-style calls are retried on connection errors, timeouts and
+      429/5xx with jittered exponential backoff; POSTs only when the caller
+      passes idempotent=True
+    - responses are returned as-is, callers keep their own status handling
+    """
+
+    def __init__(self, token=None, base_url=None, timeout=None, retries=None,
+                 backoff=None, breaker=None, pool_size=None):
+        self.base_url = (base_url or getattr(settings, "DELHIVERY_BASE_URL", "https://track.delhivery.com")).rstrip("/") + "/"
+        self.timeout = timeout or getattr(settings, "DELHIVERY_TIMEOUT", (3.05, 10))
+        self.retries = getattr(settings, "DELHIVERY_RETRIES", 2) if retries is None else retries
+        self.backoff = getattr(settings, "DELHIVERY_RETRY_BACKOFF", 0.3) if backoff is None else backoff
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=getattr(settings, "DELHIVERY_BREAKER_THRESHOLD", 5),
+            reset_timeout=getattr(settings, "DELHIVERY_BREAKER_RESET", 30),
+        )
+
+        pool_size = pool_size or getattr(settings, "DELHIVERY_POOL_SIZE", 20)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Token {token or settings.DELHIVERY_API_TOKEN}",
+            "Accept": "application/json",
+        })
+
+    def url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return urljoin(self.base_url, path.lstrip("/"))
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def request(self, method, path, idempotent=None, timeout=None, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if idempotent else 0)
+        url = self.url(path)
+
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                logger.info("Delhivery %s %s failed (%s), retrying", method, path, e)
+                self._sleep_before_retry(attempt)
+                continue
+            except Exception:
+                # Any other failure (bad encoding, invalid URL, ...) still
+                # counts, and always ends a half-open trial
+                self.breaker.record_failure()
+                raise
+
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+                if response.status_code in RETRY_STATUS_CODES and attempt + 1 < attempts:
+                    logger.info("Delhivery %s %s returned %s, retrying", method, path, response.status_code)
+                    self._sleep_before_retry(attempt)
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_delhivery_client():
+    """Process-wide client, built lazily so settings overrides apply."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DelhiveryClient()
+    return _client
+
+
+def reset_delhivery_client():
+    """Drop the shared client (tests, or after changing settings)."""
+    global _client
+    with _client_lock:
+        _client = None
@@ -0,0 +1,122 @@
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Delhivery bills forward/reverse shipments in 500 g slabs, so every weight
+# inside the same slab gets the same quote.
+WEIGHT_SLAB_GRAMS = getattr(settings, "DELHIVERY_WEIGHT_SLAB_GRAMS", 500)
+QUOTE_TTL = getattr(settings, "DELIVERY_QUOTE_TTL", 6 * 60 * 60)
+QUOTE_STALE_TTL = getattr(settings, "DELIVERY_QUOTE_STALE_TTL", 24 * 60 * 60)
+
+
+class DeliveryQuoteError(Exception):
+    """Delhivery did not return a usable answer (HTTP error, timeout, bad JSON)."""
+
+
+def weight_slab(weight_grams):
+    try:
+        grams = float(weight_grams or 0)
+    except (TypeError, ValueError):
+        grams = 0
+    return max(1, math.ceil(grams / WEIGHT_SLAB_GRAMS)) * WEIGHT_SLAB_GRAMS
+
+
+def normalize_pin(pin):
+    return str(pin or "").strip()
+
+
+def quote_key(kind, *parts):
+    return "delivery-quote:" + ":".join([kind] + [str(p).strip().lower() for p in parts])
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    """
+    TTL cache in front of Delhivery lookups.
+
+    - fresh hit (< ttl): returned as is
+    - stale hit (< ttl + stale_ttl): returned immediately, refreshed in the
+      background; if the refresh fails the stale value keeps being served
+    - miss: fetched once per key even when many requests miss together
+      (single-flight), the rest wait for that result
+
+    Failed fetches are never cached.
+    """
+
+    def __init__(self, ttl=QUOTE_TTL, stale_ttl=QUOTE_STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def get(self, key, fetch):
+        entry = cache.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < self.ttl:
+                return entry["value"]
+            self._refresh_in_background(key, fetch)
+            return entry["value"]
+        return self._single_flight(key, fetch)
+
+    def set(self, key, value):
+        cache.set(
+            key,
+            {"value": value, "fetched_at": time.time()},
+            timeout=self.ttl + self.stale_ttl,
+        )
+
+    def invalidate(self, key):
+        cache.delete(key)
+
+    def _single_flight(self, key, fetch):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+            self.set(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._flights:
+                return
+
+        def refresh():
+            try:
+                self._single_flight(key, fetch)
+            except Exception as e:
+                logger.warning("Delivery quote refresh failed for %s, serving stale: %s", key, e)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+quote_cache = QuoteCache()
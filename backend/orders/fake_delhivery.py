@@ -0,0 +1,150 @@
+"""
+Local stand-in for the Delhivery endpoints this project calls.
+
+    with FakeDelhiveryServer() as fake:
+        client = DelhiveryClient(token="test", base_url=fake.url)
+        fake.fail_next(2, status=503)
+        ...
+
+Also runnable standalone via `manage.py run_fake_delhivery` and pointing
+DELHIVERY_BASE_URL / DELHIVERY_API_URL at it.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+SAMPLE_PINCODES = Path(__file__).parent / "data" / "delhivery_pincodes_sample.json"
+
+
+class FakeDelhiveryServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+        self._waybills = itertools.count(1)
+        self._pincodes = json.loads(SAMPLE_PINCODES.read_text(encoding="utf-8"))["delivery_codes"]
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    # ---------------- lifecycle ----------------
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- failure injection ----------------
+    def fail_next(self, count, status=503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _next_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    # ---------------- canned responses ----------------
+    def route(self, method, path, query, body):
+        if method == "GET" and path.startswith("/api/kinko/v1/invoice/charges"):
+            weight = float(query.get("cgm", ["500"])[0] or 500)
+            slabs = max(1, -(-int(weight) // 500))
+            total = 40.0 + 30.0 * slabs + (20.0 if query.get("ss", [""])[0] == "DTO" else 0.0)
+            return 200, [{
+                "status": "Delivered",
+                "charged_weight": weight,
+                "gross_amount": round(total / 1.18, 2),
+                "total_amount": total,
+                "tax_data": {"IGST": round(total - total / 1.18, 2)},
+            }]
+
+        if method == "GET" and path == "/api/dc/expected_tat":
+            return 200, {"success": True, "msg": "", "data": {"tat": 3}}
+
+        if method == "GET" and path == "/c/api/pin-codes/json/":
+            wanted = set(filter(None, query.get("filter_codes", [""])[0].split(",")))
+            codes = [c for c in self._pincodes if not wanted or str(c["postal_code"]["pin"]) in wanted]
+            return 200, {"delivery_codes": codes}
+
+        if method == "POST" and path == "/api/cmu/create.json":
+            waybill = f"FAKE{next(self._waybills):010d}"
+            return 200, {"success": True, "packages": [{"waybill": waybill, "status": "Success"}]}
+
+        if method == "POST" and path == "/api/p/edit":
+            return 200, {"status": True, "remark": "Shipment has been cancelled."}
+
+        if method == "GET" and path == "/api/v1/packages/json/":
+            waybill = query.get("waybill", [""])[0]
+            return 200, {"ShipmentData": [{"Shipment": {
+                "AWB": waybill,
+                "Status": {"Status": "In Transit", "StatusType": "UD", "StatusDateTime": "2024-01-01T10:00:00"},
+                "Scans": [],
+            }}]}
+
+        if method == "GET" and path == "/api/p/packing_slip":
+            waybill = query.get("wbns", [""])[0]
+            return 200, {"packages": [{"waybill": waybill, "pdf_download_link": f"{self.url}/labels/{waybill}.pdf"}]}
+
+        if method == "POST" and path == "/fm/request/new/":
+            return 200, {"status": "OPEN", "pickup_id": next(self._waybills)}
+
+        return 404, {"error": f"no fake route for {method} {path}"}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                fake.requests.append({
+                    "method": method,
+                    "path": parsed.path,
+                    "query": parse_qs(parsed.query),
+                    "headers": dict(self.headers),
+                })
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                failure = fake._next_failure()
+                if failure:
+                    status, payload = failure, {"error": "injected failure"}
+                else:
+                    status, payload = fake.route(method, parsed.path, parse_qs(parsed.query), body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
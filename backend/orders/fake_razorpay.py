@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Razorpay REST API, backed by FakePaymentGateway.
+
+    with FakeRazorpayServer(key_secret=settings.RAZORPAY_KEY_SECRET) as fake:
+        # RAZORPAY_BASE_URL = fake.url (the client adds /v1)
+        callback = fake.gateway.pay(razorpay_order_id)   # what checkout.js posts back
+
+Signatures use `key_secret`, so the real razorpay client's
+verify_payment_signature() accepts them when it shares the secret.
+Also runnable standalone via `manage.py run_fake_services`.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import razorpay
+from .gateway import FakePaymentGateway
+
+
+class FakeRazorpayServer:
+    def __init__(self, host="127.0.0.1", port=0, key_secret="fake_secret", latency=0.0):
+        self.gateway = FakePaymentGateway(key_secret=key_secret)
+        self.latency = latency
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    # ---------------- lifecycle ----------------
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- failure injection ----------------
+    def fail_next(self, count, status=503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _next_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    # ---------------- routes ----------------
+    ROUTES = [
+        ("POST", re.compile(r"^/v1/orders/?$"), lambda g, m, q, b: g.create_order(b)),
+        ("GET", re.compile(r"^/v1/orders/([\w]+)/?$"), lambda g, m, q, b: g.fetch_order(m.group(1))),
+        ("GET", re.compile(r"^/v1/payments/?$"), lambda g, m, q, b: g.list_payments(
+            {k: int(v[0]) for k, v in q.items() if k in ("from", "to", "count", "skip")})),
+        ("GET", re.compile(r"^/v1/payments/([\w]+)/?$"), lambda g, m, q, b: g.fetch_payment(m.group(1))),
+        ("POST", re.compile(r"^/v1/payments/([\w]+)/refund/?$"), lambda g, m, q, b: g.refund_payment(m.group(1), b)),
+        ("GET", re.compile(r"^/v1/refunds/([\w]+)/?$"), lambda g, m, q, b: g.fetch_refund(m.group(1))),
+        # Test hook: the customer completes payment in checkout.js
+        ("POST", re.compile(r"^/_fake/pay/([\w]+)/?$"), lambda g, m, q, b: g.pay(m.group(1))),
+    ]
+
+    def route(self, method, path, query, body):
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                try:
+                    return 200, handler(self.gateway, match, query, body)
+                except razorpay.errors.BadRequestError as e:
+                    return 400, {"error": {"code": "BAD_REQUEST_ERROR", "description": str(e)}}
+        return 404, {"error": {"code": "BAD_REQUEST_ERROR", "description": f"no fake route for {method} {path}"}}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                fake.requests.append({"method": method, "path": parsed.path})
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                failure = fake._next_failure()
+                if failure:
+                    status, payload = failure, {"error": {"code": "SERVER_ERROR", "description": "injected failure"}}
+                else:
+                    status, payload = fake.route(method, parsed.path, parse_qs(parsed.query), body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,103 @@
+"""
+Minimal SMTP sink for local runs: accepts every message, keeps it in
+memory and never delivers anything. Enough of RFC 5321 for Django's SMTP
+backend (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT; no TLS/AUTH).
+
+    with FakeSMTPServer(port=1025) as smtp:
+        # EMAIL_BACKEND = smtp, EMAIL_HOST = 127.0.0.1, EMAIL_PORT = smtp.port
+        ...
+        smtp.messages  # [{"from": ..., "to": [...], "data": b"..."}]
+"""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        fake = self.server.fake
+        envelope = {"from": None, "to": []}
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 fake-smtp")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip("<> "), "to": []}
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command[8:].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    chunks.append(data_line)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                fake.store(dict(envelope, data=b"".join(chunks)))
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeSMTPServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, keep_messages=True):
+        self.latency = latency
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.count = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingSMTPServer((host, port), _SMTPHandler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def store(self, message):
+        with self._lock:
+            self.count += 1
+            if self.keep_messages:
+                self.messages.append(message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,249 @@
+"""
+Payment gateway adapter.
+
+    gateway = get_payment_gateway()
+    rzp_order = gateway.create_order({"amount": 25000, "currency": "INR", "receipt": "..."})
+    gateway.verify_payment_signature({...})
+    gateway.refund_payment(payment_id, {"amount": 25000})
+
+RazorpayGateway keeps one razorpay.Client per process on a pooled
+keep-alive session, with per-call timeouts and retry rules.
+FakePaymentGateway implements the same interface in memory for tests and
+load runs (PAYMENT_GATEWAY_BACKEND = "fake").
+Errors are razorpay.errors.* in both, so existing handlers keep working.
+"""
+import hashlib
+import hmac
+import itertools
+import logging
+import random
+import threading
+import time
+import razorpay
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Safe to repeat: lookups
+READ_RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, razorpay.errors.ServerError)
+# Creating an order twice only leaves an unused (unpayable) gateway order
+ORDER_RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout)
+# Refunds move money: only retry when the request never left
+REFUND_RETRY_ERRORS = (requests.exceptions.ConnectTimeout,)
+
+DEFAULT_TIMEOUTS = {
+    "create_order": (3.05, 10),
+    "fetch": (3.05, 10),
+    "refund": (3.05, 20),
+}
+
+
+class PaymentGateway:
+    """Interface used by checkout, verification, refunds and reconciliation."""
+
+    def create_order(self, payload):
+        raise NotImplementedError
+
+    def fetch_order(self, order_id):
+        raise NotImplementedError
+
+    def fetch_payment(self, payment_id):
+        raise NotImplementedError
+
+    def list_payments(self, params):
+        raise NotImplementedError
+
+    def refund_payment(self, payment_id, payload):
+        raise NotImplementedError
+
+    def fetch_refund(self, refund_id):
+        raise NotImplementedError
+
+    def verify_payment_signature(self, params):
+        raise NotImplementedError
+
+
+class RazorpayGateway(PaymentGateway):
+    def __init__(self, key_id=None, key_secret=None, base_url=None, timeouts=None,
+                 retries=None, backoff=None, pool_size=None):
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or getattr(settings, "RAZORPAY_TIMEOUTS", {})))
+        self.retries = getattr(settings, "RAZORPAY_RETRIES", 2) if retries is None else retries
+        self.backoff = getattr(settings, "RAZORPAY_RETRY_BACKOFF", 0.3) if backoff is None else backoff
+
+        pool_size = pool_size or getattr(settings, "RAZORPAY_POOL_SIZE", 20)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        options = {}
+        base_url = base_url or getattr(settings, "RAZORPAY_BASE_URL", None)
+        if base_url:
+            options["base_url"] = base_url.rstrip("/")
+        self.client = razorpay.Client(
+            session=self.session,
+            auth=(key_id or settings.RAZORPAY_KEY_ID, key_secret or settings.RAZORPAY_KEY_SECRET),
+            **options,
+        )
+
+    def _call(self, name, fn, *args, retry_on=READ_RETRY_ERRORS, timeout_key="fetch"):
+        attempts = 1 + self.retries
+        for attempt in range(attempts):
+            try:
+                return fn(*args, timeout=self.timeouts[timeout_key])
+            except retry_on as e:
+                if attempt + 1 >= attempts:
+                    raise
+                logger.info("Razorpay %s failed (%s), retrying", name, e)
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def create_order(self, payload):
+        return self._call("order.create", self.client.order.create, payload,
+                          retry_on=ORDER_RETRY_ERRORS, timeout_key="create_order")
+
+    def fetch_order(self, order_id):
+        return self._call("order.fetch", self.client.order.fetch, order_id)
+
+    def fetch_payment(self, payment_id):
+        return self._call("payment.fetch", self.client.payment.fetch, payment_id)
+
+    def list_payments(self, params):
+        return self._call("payment.all", self.client.payment.all, params)
+
+    def refund_payment(self, payment_id, payload):
+        return self._call("payment.refund", self.client.payment.refund, payment_id, payload,
+                          retry_on=REFUND_RETRY_ERRORS, timeout_key="refund")
+
+    def fetch_refund(self, refund_id):
+        return self._call("refund.fetch", self.client.refund.fetch, refund_id)
+
+    def verify_payment_signature(self, params):
+        return self.client.utility.verify_payment_signature(params)
+
+
+class FakePaymentGateway(PaymentGateway):
+    """
+    In-memory Razorpay. `pay()` plays the customer's side and returns the
+    fields the checkout widget would post back to verify.
+    """
+
+    def __init__(self, key_secret="fake_secret", latency=0.0):
+        self.key_secret = key_secret
+        self.latency = latency
+        self.orders, self.payments, self.refunds = {}, {}, {}
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _record(self, name):
+        self.calls.append(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _id(self, prefix):
+        with self._lock:
+            return f"{prefix}_fake{next(self._ids):08d}"
+
+    def _signature(self, order_id, payment_id):
+        return hmac.new(self.key_secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+    def _get(self, store, key):
+        if key not in store:
+            raise razorpay.errors.BadRequestError(f"The id provided does not exist: {key}")
+        return dict(store[key])
+
+    # ---------------- interface ----------------
+    def create_order(self, payload):
+        self._record("create_order")
+        order = {
+            "id": self._id("order"), "entity": "order", "status": "created",
+            "amount": payload["amount"], "currency": payload.get("currency", "INR"),
+            "receipt": payload.get("receipt"), "notes": payload.get("notes", {}),
+            "created_at": int(time.time()),
+        }
+        self.orders[order["id"]] = order
+        return dict(order)
+
+    def fetch_order(self, order_id):
+        self._record("fetch_order")
+        return self._get(self.orders, order_id)
+
+    def fetch_payment(self, payment_id):
+        self._record("fetch_payment")
+        return self._get(self.payments, payment_id)
+
+    def list_payments(self, params):
+        self._record("list_payments")
+        lo, hi = params.get("from", 0), params.get("to", float("inf"))
+        items = sorted(
+            (dict(p) for p in self.payments.values() if lo <= p["created_at"] <= hi),
+            key=lambda p: p["created_at"],
+        )
+        skip, count = params.get("skip", 0), params.get("count", 10)
+        page = items[skip:skip + count]
+        return {"entity": "collection", "count": len(page), "items": page}
+
+    def refund_payment(self, payment_id, payload):
+        self._record("refund_payment")
+        payment = self.payments.get(payment_id)
+        if payment is None:
+            raise razorpay.errors.BadRequestError(f"The id provided does not exist: {payment_id}")
+        amount = int(payload.get("amount", payment["amount"] - payment["amount_refunded"]))
+        if amount > payment["amount"] - payment["amount_refunded"]:
+            raise razorpay.errors.BadRequestError("The refund amount provided is greater than amount captured")
+        payment["amount_refunded"] += amount
+        refund = {"id": self._id("rfnd"), "entity": "refund", "payment_id": payment_id,
+                  "amount": amount, "status": "processed", "notes": payload.get("notes", {})}
+        self.refunds[refund["id"]] = refund
+        return dict(refund)
+
+    def fetch_refund(self, refund_id):
+        self._record("fetch_refund")
+        return self._get(self.refunds, refund_id)
+
+    def verify_payment_signature(self, params):
+        expected = self._signature(params.get("razorpay_order_id", ""), params.get("razorpay_payment_id", ""))
+        if not hmac.compare_digest(expected, params.get("razorpay_signature") or ""):
+            raise razorpay.errors.SignatureVerificationError("Razorpay Signature Verification Failed")
+        return True
+
+    # ---------------- customer side ----------------
+    def pay(self, order_id, amount=None, status="captured"):
+        order = self._get(self.orders, order_id)
+        payment = {
+            "id": self._id("pay"), "entity": "payment", "order_id": order_id, "status": status,
+            "amount": order["amount"] if amount is None else amount, "amount_refunded": 0,
+            "currency": order["currency"], "method": "upi", "created_at": int(time.time()),
+        }
+        self.payments[payment["id"]] = payment
+        if status == "captured":
+            self.orders[order_id]["status"] = "paid"
+        return {
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment["id"],
+            "razorpay_signature": self._signature(order_id, payment["id"]),
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_payment_gateway():
+    """Process-wide gateway, built lazily so settings overrides apply."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                backend = getattr(settings, "PAYMENT_GATEWAY_BACKEND", "razorpay")
+                _gateway = FakePaymentGateway() if backend == "fake" else RazorpayGateway()
+    return _gateway
+
+
+def set_payment_gateway(gateway):
+    """Install a specific gateway (tests, load runs); None resets to settings."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
@@ -1,17 +1,28 @@
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
-from .models import ShippingAddress,Order,OrderItemStatus
-from products.models import ProductVariant
+from .models import ShippingAddress,Order,UnusedGatewayOrder,generate_order_number,compute_order_fingerprint
 from promoter.models import Promoter
 from cart.models import CartItem
+from cart.services import revalidate_cart
 from .utils import  create_order_with_items,create_delhivery_shipment,get_delhivery_return_charge,apply_pending_recovery,get_delivery_charge
 from django.conf import settings
 import razorpay
 from django.utils import timezone
 from .signals import send_multichannel_notification
+from .pincodes import ensure_pincode_serviceable
+from .parallel import fetch_concurrently
+from .reservations import reserve_stock, refresh_reservations, commit_reservations
+from .quotes import read_quote_token
+from .gateway import get_payment_gateway
+from .models import OrderEvent
+from .timeline import record_event
 import uuid
 from django.db import transaction
+from django.db.models import Q
+import logging
+
+logger = logging.getLogger(__name__)
 
 def validate_shipping_address(user, shipping_input):
     """
@@ -98,26 +109,33 @@ def calculate_order_preview(items, postal_code=None, shipping_address_id=None):
     Items: list of dicts with 'product_variant_id' and 'quantity'.
     postal_code: optional string
     shipping_address_id: optional, use saved address if provided
+
+    The cart is revalidated in one pass; any stock / price / referral
+    changes are returned under "cart_changes".
     """
-    subtotal = Decimal("0.00")
+    revalidation = revalidate_cart(items)
 
-    for item in items:
-        try:
-            variant = ProductVariant.objects.get(id=item["product_variant_id"])
-        except ProductVariant.DoesNotExist:
-            raise ValidationError({
-                "items": f"ProductVariant with id {item['product_variant_id']} does not exist"
-            })
+    missing = [c["product_variant_id"] for c in revalidation["changes"] if c["type"] == "not_found"]
+    if missing:
+        raise ValidationError({
+            "items": f"ProductVariant with id {missing[0]} does not exist"
+        })
 
-        price = variant.offer_price or variant.base_price
-        subtotal += price * item["quantity"]
+    subtotal = Decimal("0.00")
+    total_weight_kg = Decimal("0.00")
+    for line in revalidation["lines"]:
+        subtotal += line["unit_price"] * line["quantity"]
+        total_weight_kg += Decimal(str(line["product_variant"].weight)) * line["quantity"]
 
     return {
         "subtotal": subtotal,
         "total": subtotal,
+        "weight_grams": total_weight_kg * 1000,
+        "cart_changes": revalidation["changes"],
+        "lines": revalidation["lines"],
     }
 
-def verify_razorpay_payment(order, razorpay_order_id, razorpay_payment_id, razorpay_signature, user, client):
+def verify_razorpay_payment(order, razorpay_order_id, razorpay_payment_id, razorpay_signature, user, gateway):
     """
     Verifies Razorpay payment, updates order status,
     creates Delhivery shipment, applies promoter commission,
@@ -133,7 +151,7 @@ def verify_razorpay_payment(order, razorpay_order_id, razorpay_payment_id, razor
 
     # --- Verify Razorpay signature ---
     try:
-        client.utility.verify_payment_signature({
+        gateway.verify_payment_signature({
             "razorpay_order_id": razorpay_order_id,
             "razorpay_payment_id": razorpay_payment_id,
             "razorpay_signature": razorpay_signature,
@@ -141,56 +159,197 @@ def verify_razorpay_payment(order, razorpay_order_id, razorpay_payment_id, razor
     except razorpay.errors.SignatureVerificationError:
         raise ValidationError("Invalid payment signature")
 
-    # --- Mark order as paid ---
-    order.razorpay_payment_id = razorpay_payment_id
-    order.razorpay_order_id = razorpay_order_id
-    order.is_paid = True
-    order.paid_at = timezone.now()
-    order.status = "processing"
-    order.payment_method = "Razorpay"
-    order.save(update_fields=[
-        "razorpay_payment_id", "razorpay_order_id", "is_paid",
-        "paid_at", "status", "payment_method"
-    ])
+    outcome = finalize_paid_order(order, razorpay_order_id, razorpay_payment_id)
+    order = outcome["order"]
+    if outcome["already_paid"]:
+        # A webhook got there first
+        return {
+            "message": "Order already marked as paid",
+            "order_number": order.order_number,
+            "status": order.status,
+            "is_paid": order.is_paid,
+        }
+
+    return {
+        "message": "Payment verified and order placed successfully. Shipment created (tracking available after pickup).",
+        "order_number": order.order_number,
+        "status": order.status,
+        "is_paid": order.is_paid,
+        "shipment": outcome["shipment"],
+        "applied_recoveries": outcome["applied_recoveries"],
+        "stock_shortfall_variant_ids": outcome["stock_shortfall"],
+    }
+
 
+def finalize_paid_order(order, razorpay_order_id, razorpay_payment_id):
+    """
+    Everything that follows a genuine payment: mark paid, keep the reserved
+    stock and apply pending recoveries under the order lock, then create
+    the Delhivery shipment, clear the cart and notify once that has
+    committed. Shared by the verify endpoint and the Razorpay webhook; the
+    lock makes whichever arrives second a no-op, and no HTTP call runs
+    while it is held.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.is_paid:
+            return {"already_paid": True, "order": order}
+
+        # --- Mark order as paid ---
+        previous_status = order.status
+        order.razorpay_payment_id = razorpay_payment_id
+        order.razorpay_order_id = razorpay_order_id
+        order.is_paid = True
+        order.paid_at = timezone.now()
+        order.status = "processing"
+        order.payment_method = "Razorpay"
+        order.save(update_fields=[
+            "razorpay_payment_id", "razorpay_order_id", "is_paid",
+            "paid_at", "status", "payment_method"
+        ])
+        record_event(
+            order, OrderEvent.PAYMENT, "captured", f"Payment received via {order.payment_method}",
+            payload={"payment_id": razorpay_payment_id, "amount": order.total},
+            source="razorpay", occurred_at=order.paid_at,
+        )
+        record_event(order, OrderEvent.STATUS, order.status, previous=previous_status, source="razorpay")
+
+        # --- Keep the stock reserved at checkout (re-takes it if the hold expired) ---
+        stock_shortfall = commit_reservations(order)
+
+        # --- Apply pending recovery dynamically for all types ---
+        applied_recoveries = {}
+        if hasattr(order.user, "recovery_account"):
+            delivery_charge = order.delivery_charge
+            for recovery_type in ["return", "replacement"]:
+                delivery_charge, applied = apply_pending_recovery(
+                    user=order.user,
+                    order=order,
+                    delivery_charge=delivery_charge,
+                    recovery_type=recovery_type
+                )
+                applied_recoveries[recovery_type] = float(applied)
+
+            order.delivery_charge = delivery_charge
+            order.total = (order.subtotal + delivery_charge).quantize(Decimal("0.01"))
+            order.save(update_fields=["delivery_charge", "total"])
+
+    # The payment is recorded; a slow or failing courier / mail call below
+    # can no longer undo it or hold the row lock.
+    return {
+        "already_paid": False,
+        "order": order,
+        "shipment": ship_paid_order(order),
+        "stock_shortfall": stock_shortfall,
+        "applied_recoveries": applied_recoveries,
+    }
+
+
+def ship_paid_order(order):
+    """Delhivery shipment, cart clear and confirmation for a paid order (outside any lock)."""
     # --- Try creating Delhivery shipment ---
-    shipment = create_delhivery_shipment(order)
+    try:
+        shipment = create_delhivery_shipment(order)
+    except Exception as e:
+        logger.exception("Shipment creation failed for paid order %s", order.order_number)
+        shipment = {"success": False, "error": str(e)}
     if shipment.get("success"):
         order.waybill = shipment.get("waybill")
         order.save(update_fields=["waybill"])
-    else:
-        # Log or handle shipment failure
-        pass
 
     # --- Clear user cart ---
-    CartItem.objects.filter(cart__user=user).delete()
+    CartItem.objects.filter(cart__user=order.user).delete()
     tracking_url = None
-    if shipment.get("success") and order.waybill:
-        tracking_url = f"https://www.delhivery.com/track/package/{order.waybill}/"
-    elif order.waybill:
+    if order.waybill:
         tracking_url = f"https://www.delhivery.com/track/package/{order.waybill}/"
-   
 
     # --- Send confirmation (no tracking yet) ---
-    send_multichannel_notification(
-        user=user,
-        order=order,
-        event="order_placed",
-        message=f"✅ Your order {order.order_number} has been placed successfully! We’ll notify you once it’s shipped.",
-        channels=["email"],
-        payload={
-            "shipment_created": shipment.get("success"),
-            "tracking_url": tracking_url,
+    try:
+        send_multichannel_notification(
+            user=order.user,
+            order=order,
+            event="order_placed",
+            message=f"✅ Your order {order.order_number} has been placed successfully! We’ll notify you once it’s shipped.",
+            channels=["email"],
+            payload={
+                "shipment_created": shipment.get("success"),
+                "tracking_url": tracking_url,
+            },
+        )
+    except Exception:
+        logger.exception("Order confirmation failed for %s", order.order_number)
+    return shipment
+
+def gateway_amount(total):
+    """Razorpay amount in paise."""
+    return int((Decimal(total) * 100).quantize(Decimal("1")))
+
+
+def create_gateway_order(gateway, order_number, total, notes=None):
+    payload = {
+        "amount": gateway_amount(total),
+        "currency": "INR",
+        "receipt": f"order_rcptid_{order_number}",
+        "payment_capture": 1,
+    }
+    if notes:
+        payload["notes"] = notes
+    try:
+        return gateway.create_order(payload)
+    except Exception as e:
+        raise ValidationError(f"Razorpay order creation failed: {str(e)}")
+
+
+def compensate_gateway_order(razorpay_order, reason):
+    """
+    Razorpay orders cannot be cancelled; record the unused one so that any
+    payment made against it is found and refunded by reconciliation.
+    """
+    if not razorpay_order or not razorpay_order.get("id"):
+        return None
+    logger.warning("Unused Razorpay order %s: %s", razorpay_order["id"], reason)
+    unused, _ = UnusedGatewayOrder.objects.get_or_create(
+        razorpay_order_id=razorpay_order["id"],
+        defaults={
+            "receipt": razorpay_order.get("receipt") or "",
+            "amount": Decimal(razorpay_order.get("amount") or 0) / 100,
+            "reason": reason[:255],
         },
     )
+    return unused
+
+
+def attach_gateway_order(order, gateway):
+    """
+    Make sure an unpaid order has a Razorpay order. The API call runs without
+    locks; the id is stored with a compare-and-set so concurrent retries
+    cannot overwrite each other (the loser is compensated).
+    """
+    if order.razorpay_order_id:
+        return {
+            "id": order.razorpay_order_id,
+            "amount": gateway_amount(order.total),
+            "currency": "INR",
+        }
+
+    razorpay_order = create_gateway_order(gateway, order.order_number, order.total)
+    claimed = (
+        Order.objects.filter(pk=order.pk, is_paid=False)
+        .filter(Q(razorpay_order_id__isnull=True) | Q(razorpay_order_id=""))
+        .update(razorpay_order_id=razorpay_order["id"])
+    )
+    if not claimed:
+        compensate_gateway_order(razorpay_order, f"order {order.order_number} already has a gateway order")
+        order.refresh_from_db(fields=["razorpay_order_id", "is_paid"])
+        return {
+            "id": order.razorpay_order_id,
+            "amount": gateway_amount(order.total),
+            "currency": "INR",
+        }
+
+    order.razorpay_order_id = razorpay_order["id"]
+    return razorpay_order
 
-    return {
-        "message": "Payment verified and order placed successfully. Shipment created (tracking available after pickup).",
-        "order_number": order.order_number,
-        "status": order.status,
-        "is_paid": order.is_paid,
-        "shipment": shipment,
-    }
 
 def process_checkout(
     user,
@@ -201,6 +360,7 @@ def process_checkout(
     is_cart=False,
     existing_order=None,
     checkout_session_id=None,
+    quote_token=None,
 ):
     """
     Unified checkout handler (Buy Now / Cart).
@@ -208,9 +368,16 @@ def process_checkout(
     - Accepts optional fallback promoter_code (used only when an item has no referral)
     - Reuses unpaid orders by session or identical items
     - Creates Razorpay order and returns prepared response
+
+    Runs in two phases so no row lock is held during Delhivery / Razorpay calls:
+      A. validate, quote delivery and create the Razorpay order (no transaction)
+      B. short atomic commit of the order + items
+    A gateway order that ends up unused is recorded via compensate_gateway_order().
+    A quote_token from preview that still matches the cart, prices and address
+    replaces the delivery quote, so Delhivery is not called a second time.
     """
     print("\n\n================= 🟦 CHECKOUT CLEAN START =================")
-    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+    gateway = get_payment_gateway()
     razorpay_order = None
 
     # ----------------------------
@@ -224,21 +391,8 @@ def process_checkout(
             order.save(update_fields=["payment_method"])
 
         if not order.is_paid:
-            if not order.razorpay_order_id:
-                razorpay_order = client.order.create({
-                    "amount": int(order.total * 100),
-                    "currency": "INR",
-                    "receipt": f"order_rcptid_{order.order_number}",
-                    "payment_capture": 1,
-                })
-                order.razorpay_order_id = razorpay_order["id"]
-                order.save(update_fields=["razorpay_order_id"])
-            else:
-                razorpay_order = {
-                    "id": order.razorpay_order_id,
-                    "amount": int(order.total * 100),
-                    "currency": "INR",
-                }
+            refresh_reservations(order)
+            razorpay_order = attach_gateway_order(order, gateway)
 
         return {"order": order, "response": prepare_order_response(order, razorpay_order)}
 
@@ -247,6 +401,7 @@ def process_checkout(
     # ----------------------------
     validate_payment_method(payment_method)
     shipping_address = validate_shipping_address(user, shipping_address_input)
+    ensure_pincode_serviceable(shipping_address.postal_code)
     checkout_session_id = checkout_session_id or str(uuid.uuid4())
 
     # ----------------------------
@@ -257,8 +412,7 @@ def process_checkout(
         normalized_items = []
         for ci in items:
             normalized_items.append({
-                "product_variant_id": ci.product_variant.id,
-                "product_variant": ci.product_variant,
+                "product_variant_id": ci.product_variant_id,
                 "quantity": int(ci.quantity),
                 "referral_code": getattr(ci, "referral_code", None),
             })
@@ -285,6 +439,16 @@ def process_checkout(
 
     normalized_new_items = _normalize_for_match(items)
 
+    # ----------------------------
+    # 2b. REVALIDATE WHOLE CART (stock / active / promoters in fixed queries)
+    # ----------------------------
+    revalidation = revalidate_cart(items, fallback_referral_code=promoter_code)
+    if not revalidation["is_valid"]:
+        raise ValidationError({
+            "detail": "Some items in your cart have changed. Please review before checkout.",
+            "cart_changes": revalidation["changes"],
+        })
+
     # ----------------------------
     # 3. MATCH UNPAID ORDER BY SESSION
     # ----------------------------
@@ -296,139 +460,114 @@ def process_checkout(
 
     if existing_by_session:
         order = existing_by_session
-        if not order.razorpay_order_id:
-            razorpay_order = client.order.create({
-                "amount": int(order.total * 100),
-                "currency": "INR",
-                "receipt": f"order_rcptid_{order.order_number}",
-                "payment_capture": 1,
-            })
-            order.razorpay_order_id = razorpay_order["id"]
-            order.save(update_fields=["razorpay_order_id"])
-        else:
-            razorpay_order = {
-                "id": order.razorpay_order_id,
-                "amount": int(order.total * 100),
-                "currency": "INR",
-            }
+        refresh_reservations(order)
+        razorpay_order = attach_gateway_order(order, gateway)
         return {"order": order, "response": prepare_order_response(order, razorpay_order)}
 
     # ----------------------------
-    # 4. FIND CANDIDATE ORDER WITH SAME ITEMS
+    # 4. FIND CANDIDATE ORDER WITH SAME ITEMS (indexed fingerprint lookup)
     # ----------------------------
+    fingerprint = compute_order_fingerprint(
+        [(line["product_variant_id"], line["quantity"], getattr(line["promoter"], "pk", None))
+         for line in revalidation["lines"]],
+        shipping_address.pk,
+    )
     candidate = (
-        Order.objects.filter(user=user, is_paid=False, cancelled_at__isnull=True)
+        Order.objects.filter(user=user, is_paid=False, order_fingerprint=fingerprint, cancelled_at__isnull=True)
         .exclude(status__in=["Cancelled", "Delivered"])
         .order_by("-id")
         .first()
     )
 
     if candidate:
-        with transaction.atomic():
-            candidate = Order.objects.select_for_update().get(pk=candidate.pk)
-            existing_items = list(candidate.items.exclude(
-                status__in=[OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED]
-            ).values_list("product_variant_id", "quantity"))
-            normalized_candidate = sorted([(int(a), int(b)) for a, b in existing_items])
-
-            if normalized_candidate == normalized_new_items:
-                if candidate.checkout_session_id != checkout_session_id:
-                    candidate.checkout_session_id = checkout_session_id
-                    candidate.save(update_fields=["checkout_session_id"])
-
-                order = candidate
-                if not order.razorpay_order_id:
-                    razorpay_order = client.order.create({
-                        "amount": int(order.total * 100),
-                        "currency": "INR",
-                        "receipt": f"order_rcptid_{order.order_number}",
-                        "payment_capture": 1,
-                    })
-                    order.razorpay_order_id = razorpay_order["id"]
-                    order.save(update_fields=["razorpay_order_id"])
-                else:
-                    razorpay_order = {
-                        "id": order.razorpay_order_id,
-                        "amount": int(order.total * 100),
-                        "currency": "INR",
-                    }
-
-                return {"order": order, "response": prepare_order_response(order, razorpay_order)}
+        # The gateway order is attached with a compare-and-set below,
+        # so no row lock is needed around the Razorpay call.
+        if candidate.checkout_session_id != checkout_session_id:
+            Order.objects.filter(pk=candidate.pk).update(checkout_session_id=checkout_session_id)
+            candidate.checkout_session_id = checkout_session_id
+
+        order = candidate
+        refresh_reservations(order)
+        razorpay_order = attach_gateway_order(order, gateway)
+        return {"order": order, "response": prepare_order_response(order, razorpay_order)}
 
     # ----------------------------
     # 5. PREPARE PER-ITEM PROMOTERS
     # ----------------------------
-    # We'll validate/promoter each item here. We inject `promoter` into each item dict
-    # so create_order_with_items() can simply use item['promoter'] as the single source of truth.
-    for itm in items:
-        ref = itm.get("referral_code")
-        if ref:
-            try:
-                itm["promoter"] = validate_promoter(ref)
-            except ValidationError:
-                # invalid referral -> treat as no promoter
-                itm["promoter"] = None
-        else:
-            # use the provided fallback promoter_code only if present (and item has no referral)
-            if promoter_code:
-                try:
-                    itm["promoter"] = validate_promoter(promoter_code)
-                except ValidationError:
-                    itm["promoter"] = None
-            else:
-                itm["promoter"] = None
-
-    # Debugging (optional)
-    # print("Per-item promoters:", [ (it.get('product_variant_id') or getattr(it.get('product_variant'), 'id', None), bool(it.get('promoter'))) for it in items ])
+    # Promoters were resolved by revalidate_cart() (item referral_code, else the
+    # fallback promoter_code; invalid codes -> None). Inject them into each item
+    # so create_order_with_items() can use item['promoter'] as the single source of truth.
+    for itm, line in zip(items, revalidation["lines"]):
+        itm["promoter"] = line["promoter"]
+        itm["product_variant"] = line["product_variant"]
 
     # ----------------------------
-    # 6. CREATE NEW ORDER
+    # 6A. QUOTE + GATEWAY ORDER (outside any transaction)
     # ----------------------------
-    with transaction.atomic():
-        order, _, order_items_data = create_order_with_items(
-            user=user,
-            items=items,
-            shipping_address=shipping_address,
-            payment_method=payment_method,
-            existing_order=None,
-            fallback_promoter_code=promoter_code,  # harmless — create_order will only use it if item lacks promoter
-        )
-        order.checkout_session_id = checkout_session_id
-        order.save(update_fields=["checkout_session_id"])
+    subtotal = sum((line["unit_price"] * line["quantity"] for line in revalidation["lines"]), Decimal("0.00"))
+    quote = read_quote_token(quote_token, user, shipping_address.postal_code, revalidation["lines"])
 
-        # Compute delivery charge & recovery
+    if quote:
+        base_delivery_charge = quote["delivery_charge"]
+    else:
         o_pin = getattr(shipping_address, "postal_code", None)
         d_pin = getattr(settings, "DELHIVERY_PICKUP", {}).get("pin")
-        delivery_info = get_delivery_charge(o_pin, d_pin, weight_grams=order.weight_total)
-        base_delivery_charge = Decimal(delivery_info.get("charge", 0))
-
-        recovery_for_payment = Decimal("0.00")
-        if hasattr(user, "recovery_account"):
-            pending = user.recovery_account.balance_due
-            if pending > 0:
-                if pending >= Decimal("5.00"):
-                    recovery_dynamic = (pending * Decimal("0.10")).quantize(Decimal("0.01"))
-                    recovery_for_payment = min(max(recovery_dynamic, Decimal("5.00")), Decimal("10.00"), pending)
-                else:
-                    recovery_for_payment = pending
-
-        delivery_charge_total = base_delivery_charge + recovery_for_payment
-        order.delivery_charge = base_delivery_charge
-        order.total = (order.subtotal + delivery_charge_total).quantize(Decimal("0.01"))
-        order.save(update_fields=["delivery_charge", "total"])
-
-        # Razorpay order creation
-        try:
-            razorpay_order = client.order.create({
-                "amount": int((order.total * 100).quantize(Decimal("1"))),
-                "currency": "INR",
-                "receipt": f"order_rcptid_{order.order_number}",
-                "payment_capture": 1,
-                "notes": {"Recovery charge": str(recovery_for_payment)},
-            })
+        weight_grams = sum(
+            line["product_variant"].get_weight_in_grams() * line["quantity"] for line in revalidation["lines"]
+        ) or 200
+        delivery_info = fetch_concurrently(
+            {"delivery": (get_delivery_charge, (o_pin, d_pin), {"weight_grams": weight_grams})},
+            defaults={"delivery": {"charge": 0}},
+        )["results"]["delivery"]
+        base_delivery_charge = Decimal(str(delivery_info.get("charge", 0)))
+
+    recovery_for_payment = Decimal("0.00")
+    if hasattr(user, "recovery_account"):
+        pending = user.recovery_account.balance_due
+        if pending > 0:
+            if quote:
+                # Keep the quoted amount, but never more than is still owed
+                recovery_for_payment = min(quote["recovery"], pending)
+            elif pending >= Decimal("5.00"):
+                recovery_dynamic = (pending * Decimal("0.10")).quantize(Decimal("0.01"))
+                recovery_for_payment = min(max(recovery_dynamic, Decimal("5.00")), Decimal("10.00"), pending)
+            else:
+                recovery_for_payment = pending
+
+    total = (subtotal + base_delivery_charge + recovery_for_payment).quantize(Decimal("0.01"))
+    order_number = generate_order_number()
+    razorpay_order = create_gateway_order(
+        gateway, order_number, total, notes={"Recovery charge": str(recovery_for_payment)}
+    )
+
+    # ----------------------------
+    # 6B. SHORT COMMIT PHASE
+    # ----------------------------
+    try:
+        with transaction.atomic():
+            order, _, order_items_data = create_order_with_items(
+                user=user,
+                items=items,
+                shipping_address=shipping_address,
+                payment_method=payment_method,
+                existing_order=None,
+                fallback_promoter_code=promoter_code,  # harmless — create_order will only use it if item lacks promoter
+                order_number=order_number,
+                delivery_charge=base_delivery_charge,
+            )
+            if order.subtotal != subtotal:
+                raise ValidationError({"detail": "Prices changed during checkout. Please try again."})
+
+            # Hold the stock for this order (conditional decrement, all or nothing)
+            reserve_stock(order, normalized_new_items)
+
+            order.checkout_session_id = checkout_session_id
+            order.order_fingerprint = fingerprint
+            order.total = total
             order.razorpay_order_id = razorpay_order.get("id")
-            order.save(update_fields=["razorpay_order_id"])
-        except Exception as e:
-            raise ValidationError(f"Razorpay order creation failed: {str(e)}")
+            order.save(update_fields=["checkout_session_id", "order_fingerprint", "total", "razorpay_order_id"])
+    except Exception as e:
+        compensate_gateway_order(razorpay_order, f"checkout commit failed: {e}")
+        raise
 
-    return {"order": order, "response": prepare_order_response(order, razorpay_order)}
\ No newline at end of file
+    return {"order": order, "response": prepare_order_response(order, razorpay_order)}
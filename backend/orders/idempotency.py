@@ -0,0 +1,158 @@
+"""
+Idempotency-Key support for mutating commerce endpoints.
+
+    class CartCheckoutAPIView(APIView):
+        @idempotent("checkout")
+        def post(self, request):
+            ...
+
+- no header: the view runs as before
+- first request with a key: runs the view and stores its response
+- same key + same request again: the stored response is replayed
+  (header `Idempotent-Replayed: true`), nothing is re-executed
+- same key while the first request is still running: waits for it
+- same key + different body: 422
+
+Applied on the view method rather than as Django middleware because DRF
+authenticates inside the view; keys are scoped per user.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def wait_seconds():
+    return getattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 15)
+
+
+def stale_after():
+    """An in-progress key older than this is assumed abandoned (worker died)."""
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCY_STALE_SECONDS", 120))
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    raw = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAY_HEADER] = "true"
+    return response
+
+
+def _claim(user, scope, key, fingerprint):
+    """Insert the in-progress row. Returns (record, created)."""
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, scope=scope, key=key, fingerprint=fingerprint), True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(user=user, scope=scope, key=key), False
+
+
+def _take_over(record):
+    """Claim an abandoned in-progress key; only one waiter can win."""
+    return IdempotencyKey.objects.filter(
+        pk=record.pk, status=IdempotencyKey.IN_PROGRESS, updated_at=record.updated_at
+    ).update(updated_at=timezone.now()) == 1
+
+
+def _await_first(record):
+    """
+    Poll until the original request finishes. Returns the finished record,
+    "take_over" when the original looks abandoned, "released" when it failed
+    and gave the key up, or None on timeout.
+    """
+    deadline = time.monotonic() + wait_seconds()
+    delay = 0.05
+    while True:
+        if record.status == IdempotencyKey.COMPLETED:
+            return record
+        if record.updated_at < timezone.now() - stale_after() and _take_over(record):
+            return "take_over"
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        try:
+            record.refresh_from_db()
+        except IdempotencyKey.DoesNotExist:
+            return "released"
+
+
+def idempotent(scope):
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+            if not key or not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > 255:
+                return Response({"detail": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+            fingerprint = request_fingerprint(request)
+            while True:
+                record, created = _claim(request.user, scope, key, fingerprint)
+                if created:
+                    break
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {"detail": "Idempotency-Key was already used with a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                outcome = _await_first(record)
+                if outcome is None:
+                    response = Response(
+                        {"detail": "A request with this Idempotency-Key is still being processed."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                    response["Retry-After"] = "1"
+                    return response
+                if outcome == "take_over":
+                    break
+                if outcome != "released":
+                    return _replay(outcome)
+                # First attempt failed and freed the key: race for it again
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                # Nothing worth replaying; free the key so a retry can run
+                IdempotencyKey.objects.filter(pk=record.pk).delete()
+                raise
+
+            if response.status_code >= 500:
+                IdempotencyKey.objects.filter(pk=record.pk).delete()
+                return response
+
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status=IdempotencyKey.COMPLETED,
+                response_status=response.status_code,
+                response_body=response.data,
+                updated_at=timezone.now(),
+            )
+            return response
+
+        return wrapper
+    return decorator
+
+
+def purge_idempotency_keys(older_than):
+    """Delete keys created before `older_than`. Returns the number removed."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=older_than).delete()
+    return deleted
@@ -0,0 +1,423 @@
+"""
+Checkout load harness.
+
+Drives preview -> buy-now checkout -> pay -> verify -> cancel for a set of
+virtual customers against the real views, with Razorpay, Delhivery and SMTP
+replaced by the local fakes. Per step it records latency, query count, DB
+time and time spent in locking statements (SELECT ... FOR UPDATE / UPDATE);
+on Postgres a sampler also counts sessions waiting on row locks.
+
+    with fake_services() as fakes:
+        fixtures = seed_loadtest_data(users=20)
+        result = run_checkout_load(fixtures, fakes, concurrency=8, iterations=5)
+    print(format_summary(result))
+
+Results are plain dicts so they can be written as JSON and compared with
+`compare_to_baseline` in CI (release-over-release regression gate).
+"""
+import contextlib
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test.utils import override_settings
+from .delhivery import reset_delhivery_client
+from .fake_delhivery import FakeDelhiveryServer
+from .fake_razorpay import FakeRazorpayServer
+from .fake_smtp import FakeSMTPServer
+from .gateway import set_payment_gateway
+from .models import Order, ShippingAddress
+
+logger = logging.getLogger(__name__)
+
+STEPS = ("preview", "checkout", "verify", "cancel")
+LOADTEST_EMAIL = "loadtest+{}@example.com"
+LOADTEST_SKU = "LOADTEST-1"
+LOADTEST_KEY_ID = "rzp_test_loadtest"
+LOADTEST_KEY_SECRET = "loadtest_secret"
+LOCKING_SQL = ("FOR UPDATE", "UPDATE ")
+
+
+# =====================================================
+# FAKE SERVICES
+# =====================================================
+@contextlib.contextmanager
+def fake_services(latency=0.0):
+    """
+    Start the three fakes and point settings / cached clients at them for
+    the duration of the block.
+    """
+    from . import utils
+
+    razorpay = FakeRazorpayServer(key_secret=LOADTEST_KEY_SECRET, latency=latency).start()
+    delhivery = FakeDelhiveryServer(latency=latency).start()
+    smtp = FakeSMTPServer(latency=latency, keep_messages=False).start()
+    charges_url = f"{delhivery.url}/api/kinko/v1/invoice/charges/.json"
+    overrides = override_settings(
+        PAYMENT_GATEWAY_BACKEND="razorpay",
+        RAZORPAY_BASE_URL=razorpay.url,
+        RAZORPAY_KEY_ID=LOADTEST_KEY_ID,
+        RAZORPAY_KEY_SECRET=LOADTEST_KEY_SECRET,
+        DELHIVERY_BASE_URL=delhivery.url,
+        DELHIVERY_API_URL=charges_url,
+        EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+        EMAIL_HOST=smtp.host,
+        EMAIL_PORT=smtp.port,
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+        EMAIL_HOST_USER="",
+        EMAIL_HOST_PASSWORD="",
+    )
+    live_charges_url = utils.DELHIVERY_API_URL
+    overrides.enable()
+    utils.DELHIVERY_API_URL = charges_url  # captured at import time
+    set_payment_gateway(None)
+    reset_delhivery_client()
+    try:
+        yield {"razorpay": razorpay, "delhivery": delhivery, "smtp": smtp}
+    finally:
+        utils.DELHIVERY_API_URL = live_charges_url
+        overrides.disable()
+        set_payment_gateway(None)
+        reset_delhivery_client()
+        for fake in (razorpay, delhivery, smtp):
+            fake.stop()
+
+
+# =====================================================
+# DATA
+# =====================================================
+def seed_loadtest_data(users=10, stock=1_000_000, postal_code="643001"):
+    """Create (or reuse) load-test customers, one address each, and one deep-stock variant."""
+    from products.models import Category, Product, ProductVariant
+
+    User = get_user_model()
+    category, _ = Category.objects.get_or_create(name="Load Test")
+    product, _ = Product.objects.get_or_create(
+        category=category, name="Load Test Product", defaults={"description": "Load test"}
+    )
+    variant, _ = ProductVariant.objects.get_or_create(
+        sku=LOADTEST_SKU,
+        defaults={"product": product, "variant_name": "Default", "stock": stock, "base_price": Decimal("199.00")},
+    )
+    ProductVariant.objects.filter(pk=variant.pk).update(stock=stock)
+
+    customers = []
+    for i in range(users):
+        email = LOADTEST_EMAIL.format(i)
+        user = User.objects.filter(email=email).first() or User.objects.create_user(
+            email, "Load", f"Test{i}", uuid.uuid4().hex
+        )
+        address = ShippingAddress.objects.filter(user=user).first() or ShippingAddress.objects.create(
+            user=user, full_name=f"Load Test {i}", phone_number="9876543210",
+            address=f"{i} Load Street", city="Ooty", state="Tamil Nadu", postal_code=postal_code,
+        )
+        customers.append({"user": user, "address": address})
+    return {"customers": customers, "variant": variant, "postal_code": postal_code}
+
+
+def cleanup_loadtest_data():
+    """Delete everything seed_loadtest_data and the runs created. Returns deleted row counts."""
+    from products.models import ProductVariant
+
+    User = get_user_model()
+    users = User.objects.filter(email__startswith="loadtest+", email__endswith="@example.com")
+    deleted = {"orders": Order.objects.filter(user__in=users).delete()[0]}
+    deleted["users"] = users.delete()[0]
+    deleted["variants"] = ProductVariant.objects.filter(sku=LOADTEST_SKU).delete()[0]
+    return deleted
+
+
+# =====================================================
+# MEASUREMENT
+# =====================================================
+class QueryProbe:
+    """execute_wrapper counting queries, DB time and time in locking statements."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.lock_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            if any(marker in sql.upper() for marker in LOCKING_SQL):
+                self.lock_time += elapsed
+
+
+class PostgresLockSampler:
+    """Polls pg_locks for ungranted locks from its own connection (Postgres only)."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = 0
+        self.samples_with_waiters = 0
+        self.max_waiters = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return connection.vendor == "postgresql"
+
+    def _run(self):
+        try:
+            with connections["default"].cursor() as cursor:
+                while not self._stop.wait(self.interval):
+                    cursor.execute("SELECT count(*) FROM pg_locks WHERE NOT granted")
+                    waiters = cursor.fetchone()[0]
+                    self.samples += 1
+                    self.samples_with_waiters += 1 if waiters else 0
+                    self.max_waiters = max(self.max_waiters, waiters)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def summary(self):
+        if not self.enabled:
+            return None
+        return {
+            "samples": self.samples,
+            "max_waiters": self.max_waiters,
+            "time_with_waiters_pct": round(100.0 * self.samples_with_waiters / self.samples, 1) if self.samples else 0.0,
+        }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+# =====================================================
+# FLOW
+# =====================================================
+class CheckoutFlow:
+    """One virtual customer walking through the checkout steps once per `run()`."""
+
+    def __init__(self, customer, variant, postal_code, razorpay, steps=STEPS, quantity=1):
+        from rest_framework.test import APIClient
+
+        self.user = customer["user"]
+        self.address = customer["address"]
+        self.variant = variant
+        self.postal_code = postal_code
+        self.razorpay = razorpay
+        self.steps = steps
+        self.quantity = quantity
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _items(self):
+        return [{"product_variant_id": self.variant.pk, "quantity": self.quantity}]
+
+    def _post(self, url, data, idempotent=False):
+        extra = {"HTTP_IDEMPOTENCY_KEY": uuid.uuid4().hex} if idempotent else {}
+        return self.client.post(url, data, format="json", **extra)
+
+    def run(self, probe, record):
+        state = {"checkout_session_id": uuid.uuid4().hex}
+
+        def step(name, call):
+            probe.reset()
+            start = time.perf_counter()
+            try:
+                response = call()
+                ok, code = 200 <= response.status_code < 300, response.status_code
+            except Exception as e:
+                logger.exception("Load test step %s failed", name)
+                response, ok, code = None, False, type(e).__name__
+            record(name, {
+                "latency": time.perf_counter() - start,
+                "queries": probe.queries,
+                "db_time": probe.db_time,
+                "lock_time": probe.lock_time,
+                "ok": ok,
+                "code": code,
+            })
+            return response.json() if ok else None
+
+        if "preview" in self.steps:
+            preview = step("preview", lambda: self._post(
+                "/api/checkout/preview/", {"items": self._items(), "postal_code": self.postal_code}
+            ))
+            state["quote_token"] = (preview or {}).get("quote_token")
+
+        if "checkout" not in self.steps:
+            return
+        checkout = step("checkout", lambda: self._post("/api/checkout/buy-now/", {
+            "items": self._items(),
+            "shipping_address_id": self.address.pk,
+            "payment_method": "Razorpay",
+            "checkout_session_id": state["checkout_session_id"],
+            "quote_token": state.get("quote_token"),
+        }, idempotent=True))
+        if not checkout:
+            return
+        order_number = checkout["order"]["order_number"]
+
+        if "verify" in self.steps:
+            # The customer pays in checkout.js; the widget posts these fields back
+            callback = self.razorpay.gateway.pay(checkout["razorpay_order_id"])
+            step("verify", lambda: self._post(
+                "/api/orders/razorpay/verify/", dict(callback, order_number=order_number), idempotent=True
+            ))
+
+        if "cancel" in self.steps:
+            step("cancel", lambda: self._post(
+                f"/api/orders/{order_number}/cancel/", {"cancel_reason": "load test"}, idempotent=True
+            ))
+
+
+def run_checkout_load(fixtures, fakes, concurrency=4, iterations=1, steps=STEPS):
+    """
+    Run every customer's flow `iterations` times on `concurrency` threads.
+    With concurrency=1 everything runs in the calling thread (and its
+    database connection / transaction).
+    """
+    samples = defaultdict(list)
+    samples_lock = threading.Lock()
+
+    def record(name, sample):
+        with samples_lock:
+            samples[name].append(sample)
+
+    flows = [
+        CheckoutFlow(customer, fixtures["variant"], fixtures["postal_code"], fakes["razorpay"], steps=steps)
+        for customer in fixtures["customers"]
+    ]
+
+    def worker(flow, inline=False):
+        probe = QueryProbe()
+        try:
+            with connection.execute_wrapper(probe):
+                for _ in range(iterations):
+                    flow.run(probe, record)
+        finally:
+            if not inline:
+                connection.close()
+
+    started = time.perf_counter()
+    with PostgresLockSampler() as sampler:
+        if concurrency <= 1:
+            for flow in flows:
+                worker(flow, inline=True)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest") as pool:
+                list(pool.map(worker, flows))
+    wall = time.perf_counter() - started
+
+    return summarize(samples, wall, concurrency, iterations, len(flows), sampler.summary(), fakes)
+
+
+def summarize(samples, wall, concurrency, iterations, users, pg_locks=None, fakes=None):
+    steps = {}
+    for name in STEPS:
+        rows = samples.get(name)
+        if not rows:
+            continue
+        latencies = [r["latency"] * 1000 for r in rows]
+        queries = [r["queries"] for r in rows]
+        errors = defaultdict(int)
+        for r in rows:
+            if not r["ok"]:
+                errors[str(r["code"])] += 1
+        steps[name] = {
+            "count": len(rows),
+            "errors": dict(errors),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "queries_avg": round(sum(queries) / len(queries), 1),
+            "queries_max": max(queries),
+            "db_ms_avg": round(sum(r["db_time"] for r in rows) * 1000 / len(rows), 2),
+            "lock_ms_avg": round(sum(r["lock_time"] for r in rows) * 1000 / len(rows), 2),
+        }
+
+    flows = users * iterations
+    result = {
+        "config": {"users": users, "concurrency": concurrency, "iterations": iterations},
+        "wall_seconds": round(wall, 3),
+        "flows_per_second": round(flows / wall, 2) if wall else None,
+        "steps": steps,
+        "pg_locks": pg_locks,
+    }
+    if fakes:
+        result["external_calls"] = {
+            "razorpay": len(fakes["razorpay"].requests),
+            "delhivery": len(fakes["delhivery"].requests),
+            "emails": fakes["smtp"].count,
+        }
+    return result
+
+
+# =====================================================
+# REPORTING / REGRESSION GATE
+# =====================================================
+def format_summary(result):
+    header = f"{'step':<10}{'n':>6}{'err':>6}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'q avg':>8}{'q max':>7}{'lock ms':>9}"
+    lines = [header, "-" * len(header)]
+    for name, s in result["steps"].items():
+        lines.append(
+            f"{name:<10}{s['count']:>6}{sum(s['errors'].values()):>6}{s['p50_ms']:>10}{s['p95_ms']:>10}"
+            f"{s['p99_ms']:>10}{s['queries_avg']:>8}{s['queries_max']:>7}{s['lock_ms_avg']:>9}"
+        )
+    lines.append(f"throughput: {result['flows_per_second']} flows/s over {result['wall_seconds']}s")
+    if result.get("pg_locks"):
+        locks = result["pg_locks"]
+        lines.append(f"lock waiters: max {locks['max_waiters']}, present {locks['time_with_waiters_pct']}% of samples")
+    return "\n".join(lines)
+
+
+def compare_to_baseline(result, baseline, max_regression_pct=10.0):
+    """
+    Return a list of regressions versus a previous result: p95 latency and
+    average query count per step, and overall throughput, beyond
+    `max_regression_pct`. Query-count increases are always reported.
+    """
+    problems = []
+    allowed = 1 + max_regression_pct / 100.0
+
+    for name, current in result["steps"].items():
+        before = baseline.get("steps", {}).get(name)
+        if not before:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * allowed:
+            problems.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["queries_avg"] > before["queries_avg"]:
+            problems.append(f"{name}: queries {before['queries_avg']} -> {current['queries_avg']}")
+        if sum(current["errors"].values()) > sum(before.get("errors", {}).values()):
+            problems.append(f"{name}: errors {before.get('errors', {})} -> {current['errors']}")
+
+    before_tp, current_tp = baseline.get("flows_per_second"), result.get("flows_per_second")
+    if before_tp and current_tp is not None and current_tp * allowed < before_tp:
+        problems.append(f"throughput {before_tp} -> {current_tp} flows/s")
+    return problems
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from orders.archive import archive_cutoff, archive_orders, restore_orders
+
+
+class Command(BaseCommand):
+    help = 'Moves closed orders older than ORDER_ARCHIVE_AFTER_DAYS out of the hot set (or restores some)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Override ORDER_ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--limit', type=int, default=None, help='Archive at most this many orders')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--restore', nargs='+', metavar='ORDER_NUMBER', help='Bring these orders back instead')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            restored = restore_orders(options['restore'])
+            self.stdout.write(self.style.SUCCESS(f"Restored {restored} archived orders."))
+            return
+
+        summary = archive_orders(
+            cutoff=archive_cutoff(options['days']),
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{summary['candidates']} orders closed before {summary['cutoff']:%Y-%m-%d} would be archived.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {summary['orders']} orders and {summary['notifications']} notifications "
+            f"closed before {summary['cutoff']:%Y-%m-%d}."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.ratecard import import_rate_card, load_rate_card_file, parse_rate_card
+
+
+class Command(BaseCommand):
+    help = 'Imports the Delhivery rate card (CSV or JSON, one row per kind and zone) used for local delivery pricing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', required=True, help='e.g. orders/data/delhivery_rate_card_sample.csv')
+
+    def handle(self, *args, **options):
+        try:
+            rows = parse_rate_card(load_rate_card_file(options['file']))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read rate card: {e}")
+        if not rows:
+            raise CommandError("Rate card is empty")
+
+        count = import_rate_card(rows)
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} rate card rows (unverified; run verify_rate_card)."))
@@ -0,0 +1,63 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from orders.loadtest import (
+    STEPS, cleanup_loadtest_data, compare_to_baseline, fake_services, format_summary,
+    run_checkout_load, seed_loadtest_data,
+)
+
+
+class Command(BaseCommand):
+    help = 'Load-tests preview → checkout → verify → cancel against local fake Razorpay/Delhivery/SMTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Virtual customers (one flow each per iteration)')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--steps', default=",".join(STEPS), help=f'Comma-separated subset of {",".join(STEPS)}')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds the fakes add to every response')
+        parser.add_argument('--output', help='Write the JSON result to this path')
+        parser.add_argument('--baseline', help='JSON result of a previous run to compare against')
+        parser.add_argument('--max-regression', type=float, default=10.0, help='Allowed p95/throughput regression in %%')
+        parser.add_argument('--cleanup', action='store_true', help='Delete load-test users, orders and product afterwards')
+        parser.add_argument('--force', action='store_true', help='Allow running with ENVIRONMENT=production')
+
+    def handle(self, *args, **options):
+        if os.getenv('ENVIRONMENT', 'local') == 'production' and not options['force']:
+            raise CommandError("Refusing to create load-test orders in production (use --force)")
+
+        steps = tuple(s.strip() for s in options['steps'].split(",") if s.strip())
+        unknown = set(steps) - set(STEPS)
+        if unknown:
+            raise CommandError(f"Unknown steps: {', '.join(sorted(unknown))}")
+
+        fixtures = seed_loadtest_data(users=options['users'])
+        try:
+            with fake_services(latency=options['latency']) as fakes:
+                result = run_checkout_load(
+                    fixtures, fakes,
+                    concurrency=options['concurrency'],
+                    iterations=options['iterations'],
+                    steps=steps,
+                )
+        finally:
+            if options['cleanup']:
+                self.stdout.write(f"Cleaned up: {cleanup_loadtest_data()}")
+
+        self.stdout.write(format_summary(result))
+        if result.get("external_calls"):
+            self.stdout.write(f"external calls: {result['external_calls']}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(result, fh, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as fh:
+                problems = compare_to_baseline(result, json.load(fh), options['max_regression'])
+            if problems:
+                for problem in problems:
+                    self.stderr.write(f"  REGRESSION {problem}")
+                raise CommandError(f"{len(problems)} regression(s) versus baseline")
+
+        self.stdout.write(self.style.SUCCESS("Load test finished"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from orders.webhooks import process_pending_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Processes stored Razorpay webhook events that were not handled yet (or failed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200)
+
+    def handle(self, *args, **options):
+        results = process_pending_webhook_events(limit=options['limit'])
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(results.items())) or "nothing to do"
+        self.stdout.write(self.style.SUCCESS(f"Webhook events — {summary}"))
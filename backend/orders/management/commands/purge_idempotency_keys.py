@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.idempotency import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored Idempotency-Key responses older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24),
+            help='Keep keys created within this many hours',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency keys."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from orders.models import Order
+from orders.search import refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the order search documents (all orders, or the given order numbers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_numbers', nargs='*', metavar='ORDER_NUMBER')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('pk')
+        if options['order_numbers']:
+            orders = orders.filter(order_number__in=options['order_numbers'])
+        order_ids = list(orders.values_list('pk', flat=True))
+
+        size = options['batch_size']
+        for start in range(0, len(order_ids), size):
+            refresh_search_documents(order_ids[start:start + size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search documents for {len(order_ids)} orders."))
@@ -0,0 +1,73 @@
+import csv
+import json
+import sys
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from orders.gateway import get_payment_gateway
+from orders.reconciliation import (
+    REPORT_FIELDS, RazorpayPaymentSource, StubPaymentSource, reconcile_payments,
+)
+
+
+class Command(BaseCommand):
+    help = 'Reconciles Razorpay payments against orders for a time window (dry run unless --apply)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Start date YYYY-MM-DD (default: --days ago)')
+        parser.add_argument('--until', help='End date YYYY-MM-DD, inclusive (default: now)')
+        parser.add_argument('--days', type=int, default=2)
+        parser.add_argument('--chunk-days', type=int, default=1, help='Query Razorpay one chunk of days at a time')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--apply', action='store_true', help='Mark paid orders and refund unused gateway payments')
+        parser.add_argument('--report', help='Write a CSV report to this path ("-" for stdout)')
+        parser.add_argument('--stub', help='JSON file with a list of Razorpay payment entities (local runs)')
+
+    def _day(self, value, end_of_day=False):
+        try:
+            day = datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
+        return timezone.make_aware(datetime.combine(day, time.max if end_of_day else time.min))
+
+    def handle(self, *args, **options):
+        end = self._day(options['until'], end_of_day=True) if options['until'] else timezone.now()
+        start = self._day(options['since']) if options['since'] else end - timedelta(days=options['days'])
+        if start >= end:
+            raise CommandError("--since must be before --until")
+
+        if options['stub']:
+            with open(options['stub'], encoding='utf-8') as fh:
+                source = StubPaymentSource(json.load(fh))
+        else:
+            source = RazorpayPaymentSource(get_payment_gateway())
+
+        report_file, writer = None, None
+        if options['report']:
+            report_file = sys.stdout if options['report'] == '-' else open(options['report'], 'w', newline='', encoding='utf-8')
+            writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+
+        mode = "APPLY" if options['apply'] else "DRY RUN"
+        self.stdout.write(f"Reconciling payments {start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M} ({mode})")
+
+        totals = {}
+        try:
+            chunk = timedelta(days=max(options['chunk_days'], 1))
+            chunk_start = start
+            while chunk_start < end:
+                chunk_end = min(chunk_start + chunk, end)
+                summary = reconcile_payments(
+                    chunk_start, chunk_end, source,
+                    apply=options['apply'], page_size=options['page_size'], report=writer,
+                )
+                for key, count in summary.items():
+                    totals[key] = totals.get(key, 0) + count
+                chunk_start = chunk_end
+        finally:
+            if report_file not in (None, sys.stdout):
+                report_file.close()
+
+        for key in sorted(totals):
+            self.stdout.write(f"  {key}: {totals[key]}")
+        self.stdout.write(self.style.SUCCESS("Reconciliation finished."))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import PincodeServiceability
+from orders.pincodes import (
+    fetch_delhivery_pincodes,
+    load_pincode_file,
+    parse_delhivery_pincodes,
+    upsert_pincodes,
+    pickup_pin,
+)
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the local pincode serviceability directory from Delhivery (or a local JSON file)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Read a Delhivery pin-codes JSON payload from this path instead of the API')
+        parser.add_argument('--pins', help='Comma separated pincodes to refresh (default: full directory)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--with-tat', action='store_true', help='Fill missing TAT for serviceable pincodes from Delhivery')
+        parser.add_argument('--tat-limit', type=int, default=500, help='Max TAT lookups per run')
+
+    def handle(self, *args, **options):
+        pins = [p.strip() for p in (options['pins'] or '').split(',') if p.strip()]
+
+        if options['file']:
+            payload = load_pincode_file(options['file'])
+        else:
+            if pins and pickup_pin() not in pins:
+                pins.append(pickup_pin())  # needed to compute zones
+            try:
+                payload = fetch_delhivery_pincodes(pins or None)
+            except Exception as e:
+                raise CommandError(f"Delhivery pincode fetch failed: {e}")
+
+        rows = parse_delhivery_pincodes(payload)
+        if pins:
+            rows = [r for r in rows if r['pin'] in pins]
+
+        count = upsert_pincodes(rows, batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"Upserted {count} pincodes."))
+
+        if options['with_tat']:
+            self.fill_tat(options['tat_limit'])
+
+    def fill_tat(self, limit):
+        from orders.utils import _fetch_expected_tat
+
+        origin = pickup_pin()
+        pending = list(
+            PincodeServiceability.objects.filter(tat_days__isnull=True, prepaid=True, embargo=False)
+            .only('id', 'pin')[:limit]
+        )
+        filled = []
+        for entry in pending:
+            try:
+                entry.tat_days = int(_fetch_expected_tat(origin, entry.pin, 'E', 'B2C')['tat_days'])
+                filled.append(entry)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"TAT lookup failed for {entry.pin}: {e}"))
+
+        PincodeServiceability.objects.bulk_update(filled, ['tat_days'], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Filled TAT for {len(filled)} of {len(pending)} pincodes."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from orders.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Returns stock held by unpaid orders whose reservation has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired stock reservations."))
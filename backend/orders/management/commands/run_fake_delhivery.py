@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.fake_delhivery import FakeDelhiveryServer
+
+
+class Command(BaseCommand):
+    help = 'Runs a local fake Delhivery API (point DELHIVERY_BASE_URL / DELHIVERY_API_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+
+    def handle(self, *args, **options):
+        fake = FakeDelhiveryServer(options['host'], options['port'], latency=options['latency']).start()
+        self.stdout.write(self.style.SUCCESS(f"Fake Delhivery listening on {fake.url}"))
+        self.stdout.write(f"  DELHIVERY_BASE_URL={fake.url}")
+        self.stdout.write(f"  DELHIVERY_API_URL={fake.url}/api/kinko/v1/invoice/charges/.json")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            fake.stop()
@@ -0,0 +1,39 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.fake_delhivery import FakeDelhiveryServer
+from orders.fake_razorpay import FakeRazorpayServer
+from orders.fake_smtp import FakeSMTPServer
+
+
+class Command(BaseCommand):
+    help = 'Runs local fake Razorpay, Delhivery and SMTP servers for load and integration runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--razorpay-port', type=int, default=8766)
+        parser.add_argument('--delhivery-port', type=int, default=8765)
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+
+    def handle(self, *args, **options):
+        host, latency = options['host'], options['latency']
+        razorpay = FakeRazorpayServer(
+            host, options['razorpay_port'], key_secret=settings.RAZORPAY_KEY_SECRET or "fake_secret", latency=latency
+        ).start()
+        delhivery = FakeDelhiveryServer(host, options['delhivery_port'], latency=latency).start()
+        smtp = FakeSMTPServer(host, options['smtp_port'], latency=latency, keep_messages=False).start()
+
+        self.stdout.write(self.style.SUCCESS("Fake services running"))
+        self.stdout.write(f"  RAZORPAY_BASE_URL={razorpay.url}")
+        self.stdout.write(f"  DELHIVERY_BASE_URL={delhivery.url}")
+        self.stdout.write(f"  DELHIVERY_API_URL={delhivery.url}/api/kinko/v1/invoice/charges/.json")
+        self.stdout.write(f"  EMAIL_HOST={smtp.host} EMAIL_PORT={smtp.port}")
+        self.stdout.write(f"  Pay an order: POST {razorpay.url}/_fake/pay/<razorpay_order_id>")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write(f"{smtp.count} emails received")
+            for fake in (razorpay, delhivery, smtp):
+                fake.stop()
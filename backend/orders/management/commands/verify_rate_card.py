@@ -0,0 +1,35 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from orders.ratecard import verify_rate_card
+
+
+class Command(BaseCommand):
+    help = 'Compares local rate-card pricing with the live Delhivery rate API for sample pincodes per zone'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-zone', type=int, default=2, help='Pincodes sampled per zone')
+        parser.add_argument('--weights', default='500,1500,5000', help='Comma separated weights in grams')
+        parser.add_argument('--tolerance', default='1.00', help='Allowed difference in rupees')
+        parser.add_argument('--apply', action='store_true', help='Deactivate rows outside tolerance (live pricing takes over)')
+
+    def handle(self, *args, **options):
+        weights = [int(w) for w in options['weights'].split(',') if w.strip()]
+        tolerance = Decimal(options['tolerance'])
+        findings = verify_rate_card(
+            per_zone=options['per_zone'], weights=weights, tolerance=tolerance, apply=options['apply'],
+        )
+
+        drifted = 0
+        for f in findings:
+            line = f"{f['kind']:<8} zone {f['zone']}: {f['checked']} quotes, max deviation ₹{f['max_deviation']}"
+            if f['deactivated']:
+                line += " → deactivated"
+            if f['checked'] and f['max_deviation'] > tolerance:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+            for error in f['errors'][:3]:
+                self.stdout.write(f"    live quote failed: {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Verified {len(findings)} rate card rows, {drifted} outside tolerance."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0041_remove_order_is_commission_applied_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PincodeServiceability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pin', models.CharField(max_length=6, unique=True)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('district', models.CharField(blank=True, max_length=100)),
+                ('state_code', models.CharField(blank=True, db_index=True, max_length=10)),
+                ('prepaid', models.BooleanField(default=False)),
+                ('cod', models.BooleanField(default=False)),
+                ('pickup', models.BooleanField(default=False)),
+                ('replacement', models.BooleanField(default=False)),
+                ('is_oda', models.BooleanField(default=False)),
+                ('embargo', models.BooleanField(default=False)),
+                ('zone', models.CharField(blank=True, choices=[('A', 'Within city'), ('B', 'Within state'), ('C', 'Metro to metro'), ('D', 'Rest of India'), ('E', 'Special (North-East / J&K)')], max_length=1)),
+                ('tat_days', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['pin'],
+            },
+        ),
+    ]
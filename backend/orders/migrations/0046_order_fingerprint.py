@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:27
+
+import hashlib
+from django.conf import settings
+from django.db import migrations, models
+
+
+def compute_order_fingerprint(lines, shipping_address_id):
+    """Frozen copy of orders.models.compute_order_fingerprint as of this migration."""
+    canonical = sorted((int(v), int(q), int(p or 0)) for v, q, p in lines)
+    raw = f"{int(shipping_address_id)}|" + ";".join(f"{v}:{q}:{p}" for v, q, p in canonical)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def backfill_pending_fingerprints(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    pending = Order.objects.filter(is_paid=False, cancelled_at__isnull=True).exclude(
+        status__in=["cancelled", "delivered"]
+    )
+    for order in pending.only("id", "shipping_address_id").iterator(chunk_size=500):
+        lines = (
+            OrderItem.objects.filter(order_id=order.id)
+            .exclude(status__in=["cancelled", "refunded"])
+            .values_list("product_variant_id", "quantity", "promoter_id")
+        )
+        Order.objects.filter(pk=order.id).update(
+            order_fingerprint=compute_order_fingerprint(lines, order.shipping_address_id)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0009_alter_contactmessage_options_and_more'),
+        ('orders', '0045_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_fingerprint',
+            field=models.CharField(blank=True, default='', help_text='compute_order_fingerprint() of items + address, used to reuse unpaid orders', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['user', 'order_fingerprint'], name='order_pending_fingerprint_idx'),
+        ),
+        migrations.RunPython(backfill_pending_fingerprints, migrations.RunPython.noop),
+    ]
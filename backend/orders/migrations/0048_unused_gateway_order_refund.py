@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0047_razorpay_webhook_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unusedgatewayorder',
+            name='razorpay_payment_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='unusedgatewayorder',
+            name='refund_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
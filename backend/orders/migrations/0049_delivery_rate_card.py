@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:42
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0048_unused_gateway_order_refund'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRateCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('forward', 'Forward (Delivered)'), ('return', 'Return / reverse pickup (DTO)')], max_length=10)),
+                ('zone', models.CharField(choices=[('A', 'Within city'), ('B', 'Within state'), ('C', 'Metro to metro'), ('D', 'Rest of India'), ('E', 'Special (North-East / J&K)')], max_length=1)),
+                ('base_weight_grams', models.PositiveIntegerField(default=500)),
+                ('base_charge', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('additional_weight_grams', models.PositiveIntegerField(default=500)),
+                ('additional_charge', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('oda_charge', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('fuel_surcharge_percent', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('gst_percent', models.DecimalField(decimal_places=2, default=Decimal('18.00'), max_digits=5)),
+                ('is_active', models.BooleanField(default=True)),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+                ('max_deviation', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+            ],
+            options={
+                'ordering': ['kind', 'zone'],
+                'unique_together': {('kind', 'zone')},
+            },
+        ),
+    ]
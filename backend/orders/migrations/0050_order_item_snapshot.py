@@ -0,0 +1,103 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_item_snapshots(apps, schema_editor):
+    """Existing items get today's catalog values; the closest we have."""
+    OrderItem = apps.get_model("orders", "OrderItem")
+    ProductVariantImage = apps.get_model("products", "ProductVariantImage")
+
+    first_image = (
+        ProductVariantImage.objects.filter(variant_id=OuterRef("product_variant_id"))
+        .exclude(image_url__isnull=True).exclude(image_url="")
+        .order_by("pk").values("image_url")[:1]
+    )
+    items = (
+        OrderItem.objects.filter(product_name="")
+        .select_related("product_variant__product")
+        .annotate(first_image_url=Subquery(first_image))
+    )
+    batch = []
+    for item in items.iterator(chunk_size=500):
+        variant = item.product_variant
+        image = item.first_image_url
+        item.product_name = variant.product.name
+        item.variant_name = variant.variant_name
+        item.sku = variant.sku
+        item.thumbnail_url = image or variant.product.image_url or ""
+        item.weight_grams = round(variant.weight * 1000) if variant.weight and variant.weight > 0 else 200
+        item.allow_return = variant.allow_return
+        item.return_days = variant.return_days
+        item.allow_replacement = variant.allow_replacement
+        item.replacement_days = variant.replacement_days
+        batch.append(item)
+        if len(batch) >= 500:
+            OrderItem.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+            batch = []
+    if batch:
+        OrderItem.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+
+
+SNAPSHOT_FIELDS = [
+    "product_name", "variant_name", "sku", "thumbnail_url", "weight_grams",
+    "allow_return", "return_days", "allow_replacement", "replacement_days",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0049_delivery_rate_card'),
+        ('products', '0011_delete_contactmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='allow_replacement',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='allow_return',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='replacement_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='return_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='thumbnail_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variant_name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='weight_grams',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_item_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0050_order_item_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delhivery_status',
+            field=models.TextField(blank=True, help_text='Last raw Delhivery scan status', null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delhivery_status_type',
+            field=models.CharField(blank=True, help_text='Last Delhivery scan type (UD, DL, ...)', max_length=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delhivery_status_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('in_transit', 'In Transit'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('return_initiated', 'Return Initiated'), ('delivered_to_warehouse', 'Delivered to Warehouse'), ('cancelled', 'Cancelled'), ('partially_cancelled', 'Partially Cancelled'), ('undelivered', 'Undelivered'), ('repl_scheduled', 'Replacement Scheduled'), ('repl_in_transit', 'Replacement In Transit'), ('repl_completed', 'Replacement Completed')], default='pending', max_length=50),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0009_alter_contactmessage_options_and_more'),
+        ('orders', '0051_order_status_transitions'),
+        ('products', '0011_delete_contactmessage'),
+        ('promoter', '0025_premiumsettings_singleton'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveBigIntegerField(unique=True)),
+                ('channel', models.CharField(max_length=20)),
+                ('event', models.CharField(max_length=50)),
+                ('message', models.TextField(blank=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(max_length=20)),
+                ('retries', models.PositiveIntegerField(default=0)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='Set when the closed order moved to the cold set (archive_orders)', null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['status', '-created_at'], name='order_hot_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['user', '-created_at'], name='order_hot_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['status'], name='orderitem_hot_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='order_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to='orders.orderitem'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:01
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timeline(apps, schema_editor):
+    """
+    Seed the timeline of existing orders from the timestamps and rows that
+    already exist; intermediate status changes were never recorded.
+    """
+    Order = apps.get_model("orders", "Order")
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+    Refund = apps.get_model("orders", "Refund")
+    ReturnRequest = apps.get_model("orders", "ReturnRequest")
+    ReplacementRequest = apps.get_model("orders", "ReplacementRequest")
+    Notification = apps.get_model("orders", "Notification")
+
+    events = []
+
+    def add(**fields):
+        events.append(OrderEvent(source="backfill", **fields))
+        if len(events) >= 1000:
+            OrderEvent.objects.bulk_create(events)
+            events.clear()
+
+    orders = Order.objects.values_list(
+        "pk", "order_number", "status", "created_at", "paid_at", "payment_method", "shipped_at", "delivered_at", "cancelled_at",
+    )
+    for pk, number, status, created_at, paid_at, method, shipped_at, delivered_at, cancelled_at in orders.iterator(chunk_size=1000):
+        add(order_id=pk, kind="placed", code="pending", message=f"Order {number} placed", occurred_at=created_at)
+        if paid_at:
+            add(order_id=pk, kind="payment", code="captured", message=f"Payment received via {method}", occurred_at=paid_at)
+        for code, moment in (("out_for_delivery", shipped_at), ("delivered", delivered_at), ("cancelled", cancelled_at)):
+            if moment:
+                add(order_id=pk, kind="status", code=code, occurred_at=moment)
+        if status not in ("pending", "delivered", "cancelled") and not (status == "out_for_delivery" and shipped_at):
+            add(order_id=pk, kind="status", code=status, occurred_at=delivered_at or shipped_at or paid_at or created_at)
+
+    for pk, order_id, refund_id, amount, status, created_at in Refund.objects.values_list(
+        "pk", "order_id", "refund_id", "amount", "status", "created_at"
+    ).iterator(chunk_size=1000):
+        add(order_id=order_id, kind="refund", code=status, occurred_at=created_at,
+            payload={"id": pk, "refund_id": refund_id, "amount": str(amount)})
+
+    for model, kind in ((ReturnRequest, "return"), (ReplacementRequest, "replacement")):
+        for pk, order_id, item_id, status, created_at in model.objects.values_list(
+            "pk", "order_id", "order_item_id", "status", "created_at"
+        ).iterator(chunk_size=1000):
+            add(order_id=order_id, order_item_id=item_id, kind=kind, code=status, occurred_at=created_at, payload={"id": pk})
+
+    for order_id, item_id, event, message, channel, created_at in Notification.objects.filter(order__isnull=False).values_list(
+        "order_id", "order_item_id", "event", "message", "channel", "created_at"
+    ).iterator(chunk_size=1000):
+        add(order_id=order_id, order_item_id=item_id, kind="notification", code=event, message=(message or "")[:255],
+            payload={"channel": channel}, internal=True, occurred_at=created_at)
+
+    OrderEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0052_order_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('placed', 'Order placed'), ('payment', 'Payment'), ('status', 'Order status'), ('item_status', 'Item status'), ('shipment_scan', 'Shipment scan'), ('refund', 'Refund'), ('return', 'Return'), ('replacement', 'Replacement'), ('notification', 'Notification')], max_length=20)),
+                ('code', models.CharField(help_text='New status / scan status / event name', max_length=50)),
+                ('previous', models.CharField(blank=True, default='', help_text='Status before the change, when known', max_length=50)),
+                ('message', models.CharField(blank=True, default='', max_length=255)),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('internal', models.BooleanField(default=False, help_text='Only shown to admins')),
+                ('source', models.CharField(blank=True, default='', max_length=30)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='orders.order')),
+                ('order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='orders.orderitem')),
+            ],
+            options={
+                'ordering': ['occurred_at', 'id'],
+                'indexes': [models.Index(fields=['order', 'occurred_at', 'id'], name='orderevent_timeline_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:05
+
+import re
+from django.db import migrations, models
+
+
+def _tokens(*values):
+    for value in values:
+        value = str(value or "").strip().lower()
+        if value:
+            yield value
+            digits = re.sub(r"\D", "", value)
+            if len(digits) > 10 and digits != value:
+                yield digits[-10:]
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Same document as orders.search.build_search_document, in batches."""
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    ReturnRequest = apps.get_model("orders", "ReturnRequest")
+
+    order_ids = list(Order.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(order_ids), 500):
+        batch = order_ids[start:start + 500]
+        items, waybills = {}, {}
+        for order_id, *values in OrderItem.objects.filter(order_id__in=batch).order_by("pk").values_list(
+            "order_id", "product_name", "variant_name", "sku"
+        ):
+            items.setdefault(order_id, []).extend(values)
+        for order_id, waybill in ReturnRequest.objects.filter(
+            order_id__in=batch, waybill__isnull=False
+        ).values_list("order_id", "waybill"):
+            waybills.setdefault(order_id, []).append(waybill)
+
+        orders = list(Order.objects.filter(pk__in=batch).select_related("user", "shipping_address"))
+        for order in orders:
+            user, address = order.user, order.shipping_address
+            parts = _tokens(
+                order.order_number, order.waybill, *waybills.get(order.pk, ()),
+                getattr(user, "first_name", ""), getattr(user, "last_name", ""),
+                getattr(user, "email", ""), getattr(user, "phone_number", ""),
+                getattr(address, "full_name", ""), getattr(address, "phone_number", ""),
+                *items.get(order.pk, ()),
+            )
+            order.search_document = " ".join(dict.fromkeys(parts))
+        Order.objects.bulk_update(orders, ["search_document"])
+
+
+def create_trigram_index(apps, schema_editor):
+    # LIKE '%term%' can only use an index through pg_trgm
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS order_search_trgm_idx ON orders_order USING gin (search_document gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS order_search_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0053_order_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Maintained by orders/search.py'),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
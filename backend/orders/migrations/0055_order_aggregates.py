@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:10
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+INACTIVE = ["cancelled", "refunded"]
+RETURNED = ["return_initiated", "delivered_to_warehouse", "refunded"]
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Same values as orders.aggregates.aggregate_expressions, in batches."""
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    ReturnRequest = apps.get_model("orders", "ReturnRequest")
+    money = DecimalField(max_digits=10, decimal_places=2)
+
+    def per_order(queryset, aggregate, output_field):
+        value = queryset.order_by().values("order").annotate(value=aggregate).values("value")
+        return Coalesce(Subquery(value, output_field=output_field), Value(0), output_field=output_field)
+
+    items = OrderItem.objects.filter(order=OuterRef("pk"))
+    active = items.exclude(status__in=INACTIVE)
+    refunded_returns = ReturnRequest.objects.filter(order=OuterRef("pk"), status="refunded").exclude(
+        order_item__status__in=INACTIVE
+    )
+    refundable = (
+        per_order(active, Sum(F("price") * F("quantity") - F("refund_amount"), output_field=money), money)
+        - per_order(refunded_returns, Sum("refund_amount"), money)
+    )
+    expressions = {
+        "item_count": per_order(items, Count("pk"), IntegerField()),
+        "active_item_count": per_order(active, Count("pk"), IntegerField()),
+        "cancelled_item_count": per_order(items.filter(status="cancelled"), Count("pk"), IntegerField()),
+        "returned_item_count": per_order(items.filter(status__in=RETURNED), Count("pk"), IntegerField()),
+        "total_weight_grams": per_order(active, Sum(F("weight_grams") * F("quantity")), IntegerField()),
+        "refundable_amount": Case(
+            When(is_paid=True, then=Greatest(refundable, Value(Decimal("0.00")), output_field=money)),
+            default=Value(Decimal("0.00")),
+            output_field=money,
+        ),
+    }
+
+    order_ids = list(Order.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(order_ids), 1000):
+        Order.objects.filter(pk__in=order_ids[start:start + 1000]).update(**expressions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0054_order_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='active_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cancelled_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='refundable_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='returned_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_weight_grams',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['active_item_count', 'total_weight_grams'], name='order_hot_shipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('refundable_amount__gt', 0)), fields=['-refundable_amount'], name='order_refundable_idx'),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -5,8 +5,10 @@ from django.contrib.auth import get_user_model
 from products.models import ProductVariant
 from decimal import Decimal
 from django.core.validators import RegexValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from promoter.models import Promoter
 import random
+import hashlib
 from .notificationModel import *
 import uuid
 from datetime import timedelta
@@ -48,6 +50,7 @@ class OrderStatus(models.TextChoices):
     RETURN_INITIATED = 'return_initiated', 'Return Initiated'
     DELIVERED_TO_WAREHOUSE = 'delivered_to_warehouse', 'Delivered to Warehouse'
     CANCELLED = 'cancelled', 'Cancelled'
+    PARTIALLY_CANCELLED = 'partially_cancelled', 'Partially Cancelled'
     UNDELIVERED = 'undelivered', 'Undelivered'
 
     # ---------- Replacement / REPL ----------
@@ -68,9 +71,35 @@ def generate_order_number():
         if not Order.objects.filter(order_number=number).exists():
             return number
 
+
+# ---------------- Order Fingerprint ----------------
+def compute_order_fingerprint(lines, shipping_address_id):
+    """
+    Stable hash of what is being bought and where it goes.
+    lines: iterable of (product_variant_id, quantity, promoter_id or None).
+    """
+    canonical = sorted((int(v), int(q), int(p or 0)) for v, q, p in lines)
+    raw = f"{int(shipping_address_id)}|" + ";".join(f"{v}:{q}:{p}" for v, q, p in canonical)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
 from admin_dashboard.warehouse import DelhiveryPickupRequest
 # ---------------- Order ----------------
+class OrderQuerySet(models.QuerySet):
+    """
+    hot(): orders that are not archived (see orders/archive.py). Active
+    workflows (packing, pickups, tracking, notifications) start from here
+    so they stay on the partial *_hot_* indexes.
+    """
+    def hot(self):
+        return self.filter(archived_at__isnull=True)
+
+    def archived(self):
+        return self.filter(archived_at__isnull=False)
+
+
 class Order(models.Model):
+    objects = OrderQuerySet.as_manager()
+
     # --- Basic Info ---
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     shipping_address = models.ForeignKey(ShippingAddress, on_delete=models.CASCADE)
@@ -98,6 +127,14 @@ class Order(models.Model):
     # --- Refund summary ---
     has_refund = models.BooleanField(default=False)  # auto-updated via signal
 
+    # --- Item aggregates (maintained by orders/aggregates.py) ---
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    active_item_count = models.PositiveIntegerField(default=0, editable=False)
+    cancelled_item_count = models.PositiveIntegerField(default=0, editable=False)
+    returned_item_count = models.PositiveIntegerField(default=0, editable=False)
+    total_weight_grams = models.PositiveIntegerField(default=0, editable=False)
+    refundable_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"), editable=False)
+
     # --- Shipping / Courier ---
     courier = models.CharField(max_length=50, blank=True, null=True)
     waybill = models.CharField(max_length=50, blank=True, null=True)
@@ -107,6 +144,9 @@ class Order(models.Model):
     shipped_at = models.DateTimeField(null=True, blank=True)
     handoff_timestamp = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
+    delhivery_status_type = models.CharField(max_length=5, null=True, blank=True, help_text="Last Delhivery scan type (UD, DL, ...)")
+    delhivery_status = models.TextField(null=True, blank=True, help_text="Last raw Delhivery scan status")
+    delhivery_status_updated_at = models.DateTimeField(null=True, blank=True)
     
     pickup_request = models.ForeignKey(
         DelhiveryPickupRequest,
@@ -119,8 +159,40 @@ class Order(models.Model):
     # --- Meta ---
     order_number = models.CharField(max_length=20, unique=True, editable=False, null=True, blank=True)
     checkout_session_id=models.CharField(max_length=100,null=True,blank=True,db_index=True,help_text="Unique identifier to link retries or failed payment sessions")
+    order_fingerprint = models.CharField(max_length=64, blank=True, default="", help_text="compute_order_fingerprint() of items + address, used to reuse unpaid orders")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    archived_at = models.DateTimeField(null=True, blank=True, help_text="Set when the closed order moved to the cold set (archive_orders)")
+    search_document = models.TextField(blank=True, default="", editable=False, help_text="Maintained by orders/search.py")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "order_fingerprint"],
+                condition=models.Q(is_paid=False),
+                name="order_pending_fingerprint_idx",
+            ),
+            models.Index(
+                fields=["status", "-created_at"],
+                condition=models.Q(archived_at__isnull=True),
+                name="order_hot_status_idx",
+            ),
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(archived_at__isnull=True),
+                name="order_hot_user_idx",
+            ),
+            models.Index(
+                fields=["active_item_count", "total_weight_grams"],
+                condition=models.Q(archived_at__isnull=True),
+                name="order_hot_shipment_idx",
+            ),
+            models.Index(
+                fields=["-refundable_amount"],
+                condition=models.Q(refundable_amount__gt=0),
+                name="order_refundable_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.order_number} ({self.user.email} — {self.status})"
@@ -134,23 +206,17 @@ class Order(models.Model):
     def weight_total(self):
         """
         Returns total weight of the order in grams.
-        Uses product_variant.get_weight_in_grams() for each item and multiplies by quantity.
+        Stored from each active item's weight snapshot multiplied by quantity.
         """
-        total_grams = 0
-        for item in self.items.all():
-            variant_weight_grams = item.product_variant.get_weight_in_grams()
-            total_grams += variant_weight_grams * item.quantity
-        return total_grams or 200  # default to 200g if nothing is found
+        return self.total_weight_grams or 200  # default to 200g if nothing is found
 
     @property
     def is_fully_cancelled(self):
-        return self.items.exclude(status="cancelled").count() == 0
+        return self.cancelled_item_count == self.item_count
 
     @property
     def is_partially_cancelled(self):
-        total_items = self.items.count()
-        cancelled_items = self.items.filter(status="cancelled").count()
-        return 0 < cancelled_items < total_items
+        return 0 < self.cancelled_item_count < self.item_count
 
     @property
     def delhivery_tracking_url(self):
@@ -197,9 +263,76 @@ class OrderItem(models.Model):
     packed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    # --- Catalog snapshot (taken at creation, never refreshed) ---
+    # `price` above is the unit price snapshot. Order reads use these instead
+    # of joining back into the live variant / product / images.
+    product_name = models.CharField(max_length=255, blank=True, default="")
+    variant_name = models.CharField(max_length=200, blank=True, default="")
+    sku = models.CharField(max_length=50, blank=True, default="")
+    thumbnail_url = models.URLField(max_length=500, blank=True, default="")
+    weight_grams = models.PositiveIntegerField(default=0)
+    allow_return = models.BooleanField(default=False)
+    return_days = models.PositiveIntegerField(null=True, blank=True)
+    allow_replacement = models.BooleanField(default=False)
+    replacement_days = models.PositiveIntegerField(null=True, blank=True)
+
+    SNAPSHOT_FIELDS = [
+        "product_name", "variant_name", "sku", "thumbnail_url", "weight_grams",
+        "allow_return", "return_days", "allow_replacement", "replacement_days",
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status"],
+                condition=models.Q(archived_at__isnull=True),
+                name="orderitem_hot_status_idx",
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.quantity} × {self.product_variant} (Order #{self.order.order_number})"
+        return f"{self.quantity} × {self.display_name} (Order #{self.order.order_number})"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.product_name and self.product_variant_id:
+            self.capture_snapshot()
+        super().save(*args, **kwargs)
+
+    @property
+    def display_name(self):
+        """Same text as str(variant), from the snapshot."""
+        return f"{self.product_name} - {self.variant_name}"
+
+    def capture_snapshot(self, variant=None, catalog=None):
+        """
+        Copy the catalog facts of `variant` onto this item. `catalog` is the
+        variant's row from catalog_snapshots(); a variant loaded with
+        select_related("product") and a `snapshot_image_url` annotation
+        needs neither.
+        """
+        variant = variant or self.product_variant
+        if catalog is None and hasattr(variant, "snapshot_image_url"):
+            catalog = {
+                "product_name": variant.product.name,
+                "thumbnail_url": variant.snapshot_image_url or variant.product.image_url or "",
+            }
+        catalog = catalog or catalog_snapshots([variant.pk]).get(variant.pk, {})
+        self.product_name = catalog.get("product_name", "")
+        self.thumbnail_url = catalog.get("thumbnail_url", "")
+        self.variant_name = variant.variant_name
+        self.sku = variant.sku
+        self.weight_grams = int(variant.get_weight_in_grams())
+        self.allow_return = variant.allow_return
+        self.return_days = variant.return_days
+        self.allow_replacement = variant.allow_replacement
+        self.replacement_days = variant.replacement_days
+        return self
+
+    def snapshot(self):
+        """Snapshot values, e.g. to carry them onto a replacement item."""
+        return {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
 
     @property
     def is_cancelled(self):
@@ -213,6 +346,33 @@ class OrderItem(models.Model):
         return self.status not in [OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED]
 
 
+def first_variant_image_url():
+    """Subquery: URL of a variant's first image, for annotating variant querysets."""
+    from products.models import ProductVariantImage
+
+    return models.Subquery(
+        ProductVariantImage.objects.filter(variant_id=models.OuterRef("pk"))
+        .exclude(image_url__isnull=True).exclude(image_url="")
+        .order_by("pk").values("image_url")[:1]
+    )
+
+
+def catalog_snapshots(variant_ids):
+    """{variant_id: {"product_name", "thumbnail_url"}} in one query."""
+    rows = (
+        ProductVariant.objects.filter(pk__in=variant_ids)
+        .annotate(snapshot_image_url=first_variant_image_url())
+        .values("pk", "product__name", "product__image_url", "snapshot_image_url")
+    )
+    return {
+        row["pk"]: {
+            "product_name": row["product__name"],
+            "thumbnail_url": row["snapshot_image_url"] or row["product__image_url"] or "",
+        }
+        for row in rows
+    }
+
+
 # ---------------- Refund ----------------
 class Refund(models.Model):
     order = models.ForeignKey(Order, related_name="refunds", on_delete=models.CASCADE)
@@ -755,3 +915,263 @@ class ReplacementRequest(models.Model):
             "shipped_at",
             "delivered_at",
         ])
+
+
+class PincodeServiceability(models.Model):
+    """
+    Local copy of Delhivery's pincode directory, refreshed in bulk by the
+    `refresh_pincodes` command. Serviceability / TAT checks read from here
+    instead of calling Delhivery per request.
+    """
+    ZONE_CHOICES = [
+        ("A", "Within city"),
+        ("B", "Within state"),
+        ("C", "Metro to metro"),
+        ("D", "Rest of India"),
+        ("E", "Special (North-East / J&K)"),
+    ]
+
+    pin = models.CharField(max_length=6, unique=True)
+    city = models.CharField(max_length=100, blank=True)
+    district = models.CharField(max_length=100, blank=True)
+    state_code = models.CharField(max_length=10, blank=True, db_index=True)
+    prepaid = models.BooleanField(default=False)
+    cod = models.BooleanField(default=False)
+    pickup = models.BooleanField(default=False)
+    replacement = models.BooleanField(default=False)
+    is_oda = models.BooleanField(default=False)
+    embargo = models.BooleanField(default=False)
+    zone = models.CharField(max_length=1, choices=ZONE_CHOICES, blank=True)
+    tat_days = models.PositiveSmallIntegerField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["pin"]
+
+    @property
+    def is_serviceable(self):
+        return (self.prepaid or self.cod) and not self.embargo
+
+    def __str__(self):
+        return f"{self.pin} ({self.city})"
+
+
+class DeliveryRateCard(models.Model):
+    """
+    Imported Delhivery rate card: one row per shipment kind and zone.
+    Charges are computed locally from this and the pincode zone; the live
+    rate API is only used as a fallback and by `verify_rate_card`.
+    """
+    FORWARD = "forward"
+    RETURN = "return"
+    KIND_CHOICES = [
+        (FORWARD, "Forward (Delivered)"),
+        (RETURN, "Return / reverse pickup (DTO)"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    zone = models.CharField(max_length=1, choices=PincodeServiceability.ZONE_CHOICES)
+    base_weight_grams = models.PositiveIntegerField(default=500)
+    base_charge = models.DecimalField(max_digits=8, decimal_places=2)
+    additional_weight_grams = models.PositiveIntegerField(default=500)
+    additional_charge = models.DecimalField(max_digits=8, decimal_places=2)
+    oda_charge = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    fuel_surcharge_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("0.00"))
+    gst_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("18.00"))
+    is_active = models.BooleanField(default=True)
+    imported_at = models.DateTimeField(auto_now=True)
+    verified_at = models.DateTimeField(null=True, blank=True)
+    max_deviation = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        unique_together = ("kind", "zone")
+        ordering = ["kind", "zone"]
+
+    def __str__(self):
+        return f"{self.kind} zone {self.zone}"
+
+
+class UnusedGatewayOrder(models.Model):
+    """
+    Razorpay order created during checkout that never got attached to an
+    Order (commit failed, lost a race, prices changed). Razorpay orders cannot
+    be deleted, so they are recorded here and any payment captured on them
+    must be refunded by reconciliation.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending check"),
+        ("no_payment", "No payment captured"),
+        ("refunded", "Payment refunded"),
+    ]
+
+    razorpay_order_id = models.CharField(max_length=100, unique=True)
+    receipt = models.CharField(max_length=100, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    reason = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+    razorpay_payment_id = models.CharField(max_length=100, blank=True, default="")
+    refund_id = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.razorpay_order_id} ({self.status})"
+
+
+class StockReservation(models.Model):
+    """
+    Units held for an unpaid order. Stock is taken from ProductVariant.stock
+    when the reservation is made (conditional UPDATE), kept on payment
+    (committed) and given back on cancel or expiry (released / expired).
+    """
+    ACTIVE = "active"
+    COMMITTED = "committed"
+    RELEASED = "released"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (ACTIVE, "Active"),
+        (COMMITTED, "Committed"),
+        (RELEASED, "Released"),
+        (EXPIRED, "Expired"),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="stock_reservations")
+    product_variant = models.ForeignKey("products.ProductVariant", on_delete=models.CASCADE, related_name="stock_reservations")
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("product_variant", "order")
+        indexes = [models.Index(fields=["status", "expires_at"])]
+
+    def __str__(self):
+        return f"{self.quantity} × {self.product_variant_id} for order {self.order_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Client-supplied Idempotency-Key for a mutating endpoint. Holds the request
+    fingerprint and, once the first request finishes, its response so that
+    retries get the same answer without running the work again.
+    """
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    STATUS_CHOICES = [
+        (IN_PROGRESS, "In progress"),
+        (COMPLETED, "Completed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "scope", "key")
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.status})"
+
+
+class RazorpayWebhookEvent(models.Model):
+    """
+    Raw Razorpay webhook delivery, stored before any processing so that a
+    crash or a slow Delhivery call never loses a captured payment.
+    Razorpay retries deliveries; event_id makes them idempotent.
+    """
+    RECEIVED = "received"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    IGNORED = "ignored"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (RECEIVED, "Received"),
+        (PROCESSING, "Processing"),
+        (PROCESSED, "Processed"),
+        (IGNORED, "Ignored"),
+        (FAILED, "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=64, db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RECEIVED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name="webhook_events")
+    received_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-received_at"]
+        indexes = [models.Index(fields=["status", "received_at"])]
+
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
+
+
+class OrderEvent(models.Model):
+    """
+    One entry of an order's timeline (see orders/timeline.py). Rows are
+    written as things happen and never changed; the (order, occurred_at, id)
+    index serves the whole history of an order as one range scan.
+    """
+    PLACED = "placed"
+    PAYMENT = "payment"
+    STATUS = "status"
+    ITEM_STATUS = "item_status"
+    SHIPMENT_SCAN = "shipment_scan"
+    REFUND = "refund"
+    RETURN = "return"
+    REPLACEMENT = "replacement"
+    NOTIFICATION = "notification"
+    KIND_CHOICES = [
+        (PLACED, "Order placed"),
+        (PAYMENT, "Payment"),
+        (STATUS, "Order status"),
+        (ITEM_STATUS, "Item status"),
+        (SHIPMENT_SCAN, "Shipment scan"),
+        (REFUND, "Refund"),
+        (RETURN, "Return"),
+        (REPLACEMENT, "Replacement"),
+        (NOTIFICATION, "Notification"),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="events")
+    order_item = models.ForeignKey(OrderItem, on_delete=models.SET_NULL, null=True, blank=True, related_name="events")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    code = models.CharField(max_length=50, help_text="New status / scan status / event name")
+    previous = models.CharField(max_length=50, blank=True, default="", help_text="Status before the change, when known")
+    message = models.CharField(max_length=255, blank=True, default="")
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    internal = models.BooleanField(default=False, help_text="Only shown to admins")
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    source = models.CharField(max_length=30, blank=True, default="")
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["occurred_at", "id"]
+        indexes = [models.Index(fields=["order", "occurred_at", "id"], name="orderevent_timeline_idx")]
+
+    def __str__(self):
+        return f"{self.order_id} {self.kind}:{self.code} @ {self.occurred_at:%Y-%m-%d %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not kwargs.get("force_insert"):
+            raise ValueError("OrderEvent is append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("OrderEvent is append-only")
@@ -104,3 +104,42 @@ class Notification(models.Model):
         email.attach_alternative(html_content, "text/html")
         email.send(fail_silently=False)
 
+
+
+class ArchivedNotification(models.Model):
+    """
+    Cold copy of a Notification whose order was archived (orders/archive.py).
+    Keeps the hot table, which every send de-duplicates against, small.
+    """
+    original_id = models.PositiveBigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_notifications")
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, null=True, blank=True, related_name='archived_notifications')
+    order_item = models.ForeignKey('orders.OrderItem', on_delete=models.CASCADE, null=True, blank=True, related_name='archived_notifications')
+
+    channel = models.CharField(max_length=20)
+    event = models.CharField(max_length=50)
+    message = models.TextField(blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20)
+    retries = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    COPIED_FIELDS = [
+        "user_id", "order_id", "order_item_id", "channel", "event", "message",
+        "payload", "status", "retries", "sent_at", "created_at",
+    ]
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"[archived] {self.event} - {self.channel} - {self.status}"
+
+    @classmethod
+    def from_notification(cls, notification):
+        return cls(original_id=notification.pk, **{f: getattr(notification, f) for f in cls.COPIED_FIELDS})
+
+    def to_notification(self):
+        return Notification(pk=self.original_id, **{f: getattr(self, f) for f in self.COPIED_FIELDS})
@@ -0,0 +1,80 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Outbound calls (Delhivery quotes, TAT) are I/O bound, so a small shared
+# pool per process is enough under WSGI.
+EXTERNAL_CALL_WORKERS = getattr(settings, "EXTERNAL_CALL_WORKERS", 16)
+EXTERNAL_CALL_DEADLINE = getattr(settings, "EXTERNAL_CALL_DEADLINE", 8)
+
+_executor = ThreadPoolExecutor(max_workers=EXTERNAL_CALL_WORKERS, thread_name_prefix="external-call")
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # Worker threads must not keep DB connections open between tasks
+        connections.close_all()
+
+
+def submit_calls(calls):
+    """
+    Start every call in `calls` ({name: (fn, args, kwargs)}) on the shared
+    pool and return {name: future} without waiting.
+    """
+    futures = {}
+    for name, (fn, args, kwargs) in calls.items():
+        futures[name] = _executor.submit(_run, fn, args or (), kwargs or {})
+    return futures
+
+
+def collect(futures, deadline=None, defaults=None):
+    """
+    Wait for submitted calls until `deadline` seconds have passed in total.
+    Calls that time out or raise get their value from `defaults`.
+
+    Returns {"results": {name: value}, "timed_out": [...], "failed": [...]}.
+    """
+    deadline = EXTERNAL_CALL_DEADLINE if deadline is None else deadline
+    defaults = defaults or {}
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    results, timed_out, failed = {}, [], []
+    for name, future in futures.items():
+        if future not in done:
+            future.cancel()
+            timed_out.append(name)
+            results[name] = defaults.get(name)
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.warning("External call %s failed: %s", name, e)
+            failed.append(name)
+            results[name] = defaults.get(name)
+
+    if timed_out:
+        logger.warning("External calls timed out after %ss: %s", deadline, ", ".join(timed_out))
+
+    return {"results": results, "timed_out": timed_out, "failed": failed}
+
+
+def fetch_concurrently(calls, deadline=None, defaults=None):
+    """
+    Run independent outbound calls in parallel with one overall deadline, so
+    latency is the slowest call (capped) instead of the sum of all of them.
+
+        fetch_concurrently({
+            "charge": (get_delivery_charge, (o_pin, d_pin), {"weight_grams": 900}),
+            "tat": (get_expected_tat, (o_pin, d_pin), {}),
+        }, deadline=5, defaults={"tat": {"tat_days": None}})
+    """
+    started = time.monotonic()
+    outcome = collect(submit_calls(calls), deadline=deadline, defaults=defaults)
+    outcome["elapsed"] = time.monotonic() - started
+    return outcome
@@ -0,0 +1,174 @@
+import json
+import logging
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from .models import PincodeServiceability
+from .delhivery import get_delhivery_client
+
+logger = logging.getLogger(__name__)
+
+DELHIVERY_PINCODE_PATH = "/c/api/pin-codes/json/"
+
+# Delhivery's special-rate zone (North-East, J&K, Ladakh)
+SPECIAL_ZONE_STATES = {"AS", "AR", "MN", "ML", "MZ", "NL", "TR", "SK", "JK", "LA"}
+METRO_CITIES = {
+    "delhi", "new delhi", "mumbai", "kolkata", "chennai",
+    "bengaluru", "bangalore", "hyderabad", "ahmedabad", "pune",
+}
+
+UPDATE_FIELDS = [
+    "city", "district", "state_code", "prepaid", "cod", "pickup",
+    "replacement", "is_oda", "embargo", "zone",
+]
+
+
+def _flag(value):
+    return str(value or "").strip().upper() == "Y"
+
+
+def pickup_pin():
+    return str(getattr(settings, "DELHIVERY_PICKUP", {}).get("pin") or "")
+
+
+# =====================================================
+# PARSING
+# =====================================================
+def parse_delhivery_pincodes(payload):
+    """
+    Turn a Delhivery pin-codes API payload
+        {"delivery_codes": [{"postal_code": {...}}, ...]}
+    into plain dicts matching PincodeServiceability fields.
+    """
+    rows = []
+    for entry in (payload or {}).get("delivery_codes", []):
+        pc = entry.get("postal_code") or {}
+        if not pc.get("pin"):
+            continue
+        row = {
+            "pin": str(pc["pin"]).strip(),
+            "city": (pc.get("city") or "").strip(),
+            "district": (pc.get("district") or "").strip(),
+            "state_code": (pc.get("state_code") or "").strip().upper(),
+            "prepaid": _flag(pc.get("pre_paid")),
+            "cod": _flag(pc.get("cod")),
+            "pickup": _flag(pc.get("pickup")),
+            "replacement": _flag(pc.get("repl")),
+            "is_oda": _flag(pc.get("is_oda")),
+            "embargo": "embargo" in (pc.get("remarks") or "").lower(),
+        }
+        # Local stand-in files may carry a typical TAT as well
+        if pc.get("tat_days") is not None:
+            row["tat_days"] = int(pc["tat_days"])
+        rows.append(row)
+    return rows
+
+
+def compute_zone(row, origin):
+    """Delhivery-style zone of `row` relative to the pickup `origin` row."""
+    if origin:
+        if row["city"] and row["city"].lower() == origin["city"].lower():
+            return "A"
+        if row["state_code"] and row["state_code"] == origin["state_code"]:
+            return "B"
+    if row["state_code"] in SPECIAL_ZONE_STATES:
+        return "E"
+    if origin and origin["city"].lower() in METRO_CITIES and row["city"].lower() in METRO_CITIES:
+        return "C"
+    return "D"
+
+
+# =====================================================
+# FETCH + STORE
+# =====================================================
+def fetch_delhivery_pincodes(pins=None, timeout=60):
+    """
+    Download the pincode directory from Delhivery. Without `pins` the full
+    directory is returned (one large response).
+    """
+    params = {"filter_codes": ",".join(pins)} if pins else {}
+    response = get_delhivery_client().get(DELHIVERY_PINCODE_PATH, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def load_pincode_file(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _origin_row(rows):
+    origin_pin = pickup_pin()
+    for row in rows:
+        if row["pin"] == origin_pin:
+            return row
+    origin = PincodeServiceability.objects.filter(pin=origin_pin).values("city", "state_code").first()
+    return origin
+
+
+def upsert_pincodes(rows, batch_size=1000):
+    """
+    Insert or update directory rows in batches. Zones are computed against
+    the pickup pincode. Stored TAT is only overwritten when the row has one.
+    """
+    origin = _origin_row(rows)
+    with_tat = [r for r in rows if "tat_days" in r]
+    without_tat = [r for r in rows if "tat_days" not in r]
+
+    for group, fields in ((without_tat, UPDATE_FIELDS), (with_tat, UPDATE_FIELDS + ["tat_days"])):
+        for start in range(0, len(group), batch_size):
+            objs = []
+            for row in group[start:start + batch_size]:
+                row["zone"] = compute_zone(row, origin)
+                objs.append(PincodeServiceability(**row))
+            PincodeServiceability.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=["pin"],
+                update_fields=fields,
+            )
+    return len(rows)
+
+
+# =====================================================
+# LOOKUPS
+# =====================================================
+def lookup_pincode(pin):
+    pin = str(pin or "").strip()
+    if not pin:
+        return None
+    return PincodeServiceability.objects.filter(pin=pin).first()
+
+
+def serviceability_payload(entry):
+    """Same shape as Delhivery's pin-codes API so clients need no changes."""
+    yn = lambda flag: "Y" if flag else "N"
+    return {
+        "delivery_codes": [{
+            "postal_code": {
+                "pin": int(entry.pin) if entry.pin.isdigit() else entry.pin,
+                "city": entry.city,
+                "district": entry.district,
+                "state_code": entry.state_code,
+                "pre_paid": yn(entry.prepaid),
+                "cod": yn(entry.cod),
+                "pickup": yn(entry.pickup),
+                "repl": yn(entry.replacement),
+                "is_oda": yn(entry.is_oda),
+                "remarks": "Embargo" if entry.embargo else "",
+                "zone": entry.zone,
+                "tat_days": entry.tat_days,
+            }
+        }],
+        "source": "local",
+    }
+
+
+def ensure_pincode_serviceable(pin):
+    """
+    Reject checkout for pincodes the directory knows are not serviceable.
+    Unknown pincodes are let through; Delhivery has the final say there.
+    """
+    entry = lookup_pincode(pin)
+    if entry is not None and not entry.is_serviceable:
+        raise ValidationError({"shipping_address": f"Delivery is not available for pincode {pin}."})
+    return entry
@@ -0,0 +1,53 @@
+"""
+Order list projections.
+
+List pages need a handful of facts per order (what the first item is,
+where the latest refund stands). These are computed in the orders query
+itself with correlated subqueries (item counts are stored on Order, see
+orders/aggregates.py), and the rows the nested
+serializers do need are prefetched, so a page costs the same number of
+queries whatever the customer's order history looks like.
+
+    orders = with_list_summary(Order.objects.filter(user=user))
+    orders = prefetch_list_items(orders)   # only if items are serialized
+"""
+from django.db.models import OuterRef, Prefetch, Subquery
+from .models import OrderItem, Refund
+
+
+def with_list_summary(queryset):
+    """
+    Annotate first_item_* (lowest id, from the item snapshot) and
+    latest_refund_status.
+    """
+    items = OrderItem.objects.filter(order=OuterRef("pk"))
+    first_item = items.order_by("pk")
+
+    latest_refund = Refund.objects.filter(order=OuterRef("pk")).order_by("-created_at", "-pk")
+
+    return queryset.annotate(
+        first_item_id=Subquery(first_item.values("pk")[:1]),
+        first_item_name=Subquery(first_item.values("product_name")[:1]),
+        first_item_variant_name=Subquery(first_item.values("variant_name")[:1]),
+        first_item_image=Subquery(first_item.values("thumbnail_url")[:1]),
+        latest_refund_status=Subquery(latest_refund.values("status")[:1]),
+    )
+
+
+def prefetch_list_items(queryset):
+    """Everything CustomerOrderListSerializer touches, in one query per relation."""
+    return queryset.select_related("shipping_address").prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.order_by("pk")),
+        Prefetch("refunds", queryset=Refund.objects.order_by("pk")),
+    )
+
+
+def first_item_summary(order):
+    """first_item payload from the annotations (None for an order without items)."""
+    if order.first_item_id is None:
+        return None
+    return {
+        "product_name": order.first_item_name,
+        "variant_name": order.first_item_variant_name,
+        "image": order.first_item_image or None,
+    }
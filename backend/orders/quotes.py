@@ -0,0 +1,66 @@
+import logging
+from decimal import Decimal
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+QUOTE_SALT = "orders.checkout-quote"
+
+
+def quote_token_ttl():
+    return getattr(settings, "QUOTE_TOKEN_TTL_SECONDS", 15 * 60)
+
+
+def _priced_lines(lines):
+    """Canonical [[variant_id, qty, unit_price], ...] from revalidate_cart() lines."""
+    return sorted(
+        [int(line["product_variant_id"]), int(line["quantity"]), str(line["unit_price"])]
+        for line in lines
+    )
+
+
+def issue_quote_token(user, postal_code, lines, delivery_charge, recovery, tat_days):
+    """
+    Sign what preview showed the customer: priced lines, base delivery
+    charge, recovery amount and TAT for one user + pincode. Checkout can
+    then reuse the quote instead of calling Delhivery again.
+    """
+    payload = {
+        "u": user.pk,
+        "pin": str(postal_code).strip(),
+        "lines": _priced_lines(lines),
+        "delivery": str(delivery_charge),
+        "recovery": str(recovery),
+        "tat": tat_days,
+    }
+    return signing.dumps(payload, salt=QUOTE_SALT, compress=True)
+
+
+def read_quote_token(token, user, postal_code, lines):
+    """
+    Return the quote (Decimals for money) when `token` is genuine, unexpired
+    and still matches this user, pincode, cart and current prices.
+    Anything else returns None and checkout falls back to a fresh quote.
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=QUOTE_SALT, max_age=quote_token_ttl())
+    except signing.SignatureExpired:
+        logger.info("Quote token expired for user %s", user.pk)
+        return None
+    except signing.BadSignature:
+        logger.warning("Rejected tampered quote token for user %s", user.pk)
+        return None
+
+    if payload.get("u") != user.pk or payload.get("pin") != str(postal_code).strip():
+        return None
+    if payload.get("lines") != _priced_lines(lines):
+        return None
+
+    return {
+        "delivery_charge": Decimal(payload["delivery"]),
+        "recovery": Decimal(payload["recovery"]),
+        "tat_days": payload.get("tat"),
+    }
@@ -0,0 +1,228 @@
+"""
+Local delivery pricing from an imported Delhivery rate card.
+
+Delhivery prices a shipment from the zone between pickup and customer pin
+and the weight slab, so with the card in DeliveryRateCard and zones in the
+pincode directory forward / return (and therefore replacement) charges are
+computed in-process:
+
+    quote = local_delivery_quote(DeliveryRateCard.FORWARD, pickup, pin, 1200)
+    if quote is None:
+        ...  # no zone / no card / COD: use the live rate API
+
+`verify_rate_card` compares the card against the live API for a sample of
+pincodes per zone and can switch rows that drifted back to live pricing.
+"""
+import csv
+import json
+import logging
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import DeliveryRateCard, PincodeServiceability
+from .pincodes import lookup_pincode, pickup_pin
+
+logger = logging.getLogger(__name__)
+
+RATE_CARD_CACHE_KEY = "delivery-ratecard:active"
+RATE_FIELDS = [
+    "base_weight_grams", "base_charge", "additional_weight_grams", "additional_charge",
+    "oda_charge", "fuel_surcharge_percent", "gst_percent",
+]
+SERVICE_NAMES = {DeliveryRateCard.FORWARD: "Delivered", DeliveryRateCard.RETURN: "DTO"}
+CENTS = Decimal("0.01")
+
+
+def local_pricing_enabled():
+    return getattr(settings, "DELIVERY_PRICING", "ratecard") == "ratecard"
+
+
+# =====================================================
+# IMPORT
+# =====================================================
+def load_rate_card_file(path):
+    """CSV with a header row, or JSON (a list of rows or {"rates": [...]})."""
+    with open(path, encoding="utf-8", newline="") as fh:
+        if str(path).lower().endswith(".json"):
+            payload = json.load(fh)
+            return payload.get("rates", []) if isinstance(payload, dict) else payload
+        return list(csv.DictReader(fh))
+
+
+def parse_rate_card(rows):
+    """Validate raw rows into DeliveryRateCard field dicts. Raises ValueError naming the bad row."""
+    kinds = dict(DeliveryRateCard.KIND_CHOICES)
+    zones = dict(PincodeServiceability.ZONE_CHOICES)
+    parsed, seen = [], set()
+
+    for number, raw in enumerate(rows, start=1):
+        kind = str(raw.get("kind") or "").strip().lower()
+        zone = str(raw.get("zone") or "").strip().upper()
+        if kind not in kinds or zone not in zones:
+            raise ValueError(f"Row {number}: unknown kind/zone {kind!r}/{zone!r}")
+        if (kind, zone) in seen:
+            raise ValueError(f"Row {number}: duplicate {kind} zone {zone}")
+        seen.add((kind, zone))
+
+        row = {"kind": kind, "zone": zone}
+        try:
+            for field in RATE_FIELDS:
+                value = raw.get(field)
+                if value in (None, ""):
+                    continue
+                row[field] = int(value) if field.endswith("_grams") else Decimal(str(value))
+        except (ArithmeticError, ValueError):
+            raise ValueError(f"Row {number}: invalid number in {field}")
+        if "base_charge" not in row or "additional_charge" not in row:
+            raise ValueError(f"Row {number}: base_charge and additional_charge are required")
+        if row.get("base_weight_grams", 1) <= 0 or row.get("additional_weight_grams", 1) <= 0:
+            raise ValueError(f"Row {number}: weights must be positive")
+        parsed.append(row)
+    return parsed
+
+
+@transaction.atomic
+def import_rate_card(rows):
+    """
+    Replace the card: upsert every (kind, zone) in `rows`, deactivate the
+    rest. Imported rows start unverified.
+    """
+    defaults = {f.name: f.get_default() for f in DeliveryRateCard._meta.fields if f.name in RATE_FIELDS}
+    objs = [
+        DeliveryRateCard(**dict(defaults, **row, is_active=True, verified_at=None, max_deviation=None))
+        for row in rows
+    ]
+    DeliveryRateCard.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=["kind", "zone"],
+        update_fields=RATE_FIELDS + ["is_active", "verified_at", "max_deviation", "imported_at"],
+    )
+    keep = {(row["kind"], row["zone"]) for row in rows}
+    stale = [r.pk for r in DeliveryRateCard.objects.all() if (r.kind, r.zone) not in keep]
+    DeliveryRateCard.objects.filter(pk__in=stale).update(is_active=False)
+    transaction.on_commit(invalidate_rate_card)
+    return len(objs)
+
+
+def invalidate_rate_card():
+    cache.delete(RATE_CARD_CACHE_KEY)
+
+
+# =====================================================
+# PRICING
+# =====================================================
+def rate_table():
+    """Active rows keyed by (kind, zone); cached, the card changes rarely."""
+    table = cache.get(RATE_CARD_CACHE_KEY)
+    if table is None:
+        table = {
+            (row["kind"], row["zone"]): row
+            for row in DeliveryRateCard.objects.filter(is_active=True).values("kind", "zone", *RATE_FIELDS)
+        }
+        cache.set(RATE_CARD_CACHE_KEY, table, getattr(settings, "RATE_CARD_CACHE_SECONDS", 300))
+    return table
+
+
+def price_shipment(rate, kind, weight_grams, is_oda=False):
+    """Charge for one shipment; same shape as the live rate API result."""
+    try:
+        grams = max(float(weight_grams or 0), 1)
+    except (TypeError, ValueError):
+        grams = 1
+    extra_slabs = max(0, math.ceil((grams - rate["base_weight_grams"]) / rate["additional_weight_grams"]))
+    charged_weight = rate["base_weight_grams"] + extra_slabs * rate["additional_weight_grams"]
+
+    freight = rate["base_charge"] + extra_slabs * rate["additional_charge"]
+    if is_oda:
+        freight += rate["oda_charge"]
+    gross = (freight * (1 + rate["fuel_surcharge_percent"] / 100)).quantize(CENTS, ROUND_HALF_UP)
+    tax = (gross * rate["gst_percent"] / 100).quantize(CENTS, ROUND_HALF_UP)
+
+    return {
+        "charge": float(gross + tax),
+        "service": SERVICE_NAMES[kind],
+        "gross": float(gross),
+        "taxes": {"GST": float(tax)},
+        "charged_weight": charged_weight,
+        "source": "ratecard",
+    }
+
+
+def local_delivery_quote(kind, o_pin, d_pin, weight_grams, payment_type="Pre-paid"):
+    """
+    Price a shipment between the pickup pin and a customer pin from the
+    card, or None when it cannot be priced locally (pricing switched to
+    live, COD, neither pin is the pickup, pin/zone unknown, no active row).
+    """
+    if not local_pricing_enabled() or payment_type != "Pre-paid":
+        return None
+
+    origin = pickup_pin()
+    customer_pin = d_pin if o_pin == origin else o_pin if d_pin == origin else None
+    entry = lookup_pincode(customer_pin) if customer_pin else None
+    if entry is None or not entry.zone:
+        return None
+
+    rate = rate_table().get((kind, entry.zone))
+    if rate is None:
+        return None
+    return price_shipment(rate, kind, weight_grams, is_oda=entry.is_oda)
+
+
+# =====================================================
+# VERIFICATION AGAINST THE LIVE API
+# =====================================================
+def _live_charge(kind, pin, weight_grams):
+    from .utils import _fetch_delivery_charge, _fetch_return_charge
+
+    origin = pickup_pin()
+    if kind == DeliveryRateCard.FORWARD:
+        return Decimal(str(_fetch_delivery_charge(origin, pin, weight_grams, "Pre-paid")["charge"]))
+    return Decimal(str(_fetch_return_charge(pin, origin, weight_grams, "Pre-paid")))
+
+
+def verify_rate_card(per_zone=2, weights=(500, 1500, 5000), tolerance=Decimal("1.00"), apply=False):
+    """
+    Quote a few serviceable pincodes per zone both ways and record the
+    largest deviation on each row. With apply=True rows off by more than
+    `tolerance` are deactivated so those zones fall back to live pricing.
+    Returns a list of per-row findings.
+    """
+    findings = []
+    for card in DeliveryRateCard.objects.filter(is_active=True):
+        pins = list(
+            PincodeServiceability.objects.filter(zone=card.zone, prepaid=True, embargo=False)
+            .exclude(pin=pickup_pin()).values_list("pin", "is_oda")[:per_zone]
+        )
+        rate = {field: getattr(card, field) for field in RATE_FIELDS}
+        deviation, checked, errors = Decimal("0.00"), 0, []
+
+        for pin, is_oda in pins:
+            for grams in weights:
+                local = Decimal(str(price_shipment(rate, card.kind, grams, is_oda=is_oda)["charge"]))
+                try:
+                    live = _live_charge(card.kind, pin, grams)
+                except Exception as e:
+                    errors.append(f"{pin}/{grams}g: {e}")
+                    continue
+                checked += 1
+                deviation = max(deviation, abs(local - live))
+
+        finding = {"kind": card.kind, "zone": card.zone, "checked": checked,
+                   "max_deviation": deviation, "errors": errors, "deactivated": False}
+        if checked:
+            card.verified_at = timezone.now()
+            card.max_deviation = deviation
+            if apply and deviation > tolerance:
+                card.is_active = False
+                finding["deactivated"] = True
+                logger.warning("Rate card %s zone %s off by %s, using live pricing", card.kind, card.zone, deviation)
+            card.save(update_fields=["verified_at", "max_deviation", "is_active"])
+        findings.append(finding)
+
+    invalidate_rate_card()
+    return findings
@@ -0,0 +1,227 @@
+"""
+Razorpay payment reconciliation.
+
+Pages through Razorpay payments for a time window and compares each page
+against our orders with two bulk queries (orders + unused gateway orders),
+so memory stays at one page regardless of the window length. Findings are
+streamed to the report writer as they are found; only counters are kept.
+
+    source = RazorpayPaymentSource(get_payment_gateway())
+    summary = reconcile_payments(start, end, source, apply=True, report=writer)
+
+Categories:
+  ok                  captured payment on a paid order with the same payment id
+  paid_not_marked     captured payment, order still unpaid     -> finalize_paid_order
+  amount_mismatch     captured amount differs from the unpaid order total (report only)
+  unused_gateway      payment on an UnusedGatewayOrder          -> refund
+  duplicate_payment   order already paid by another payment     (report only)
+  orphan              no order and no unused gateway record     (report only)
+  not_captured        authorized / failed / refunded payments   (skipped)
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+from django.utils import timezone
+from .models import Order, UnusedGatewayOrder
+
+logger = logging.getLogger(__name__)
+
+REPORT_FIELDS = ["category", "payment_id", "razorpay_order_id", "order_number", "amount", "action", "detail"]
+
+
+# =====================================================
+# PAYMENT SOURCES
+# =====================================================
+class RazorpayPaymentSource:
+    """Pages GET /payments with from/to/count/skip through the payment gateway."""
+
+    max_page_size = 100
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def pages(self, start, end, page_size=100):
+        page_size = min(page_size, self.max_page_size)
+        skip = 0
+        while True:
+            response = self.gateway.list_payments({
+                "from": int(start.timestamp()),
+                "to": int(end.timestamp()),
+                "count": page_size,
+                "skip": skip,
+            })
+            items = response.get("items", [])
+            if not items:
+                return
+            yield items
+            if len(items) < page_size:
+                return
+            skip += len(items)
+
+    def refund(self, payment_id, amount_paise, notes=None):
+        return self.gateway.refund_payment(payment_id, {"amount": amount_paise, "notes": notes or {}})
+
+
+class StubPaymentSource:
+    """In-memory payments for tests and dry runs; records refunds issued."""
+
+    def __init__(self, payments):
+        self.payments = list(payments)
+        self.refunds = []
+
+    def pages(self, start, end, page_size=100):
+        lo, hi = int(start.timestamp()), int(end.timestamp())
+        window = [p for p in self.payments if lo <= p.get("created_at", lo) <= hi]
+        for i in range(0, len(window), page_size):
+            yield window[i:i + page_size]
+
+    def refund(self, payment_id, amount_paise, notes=None):
+        refund = {"id": f"rfnd_stub_{len(self.refunds) + 1}", "payment_id": payment_id, "amount": amount_paise}
+        self.refunds.append(refund)
+        return refund
+
+
+# =====================================================
+# RECONCILIATION
+# =====================================================
+def _classify_page(payments):
+    """Yield (category, payment, order_row, unused) for one page, two queries total."""
+    from .helpers import gateway_amount
+
+    def is_captured(p):
+        return p.get("status") == "captured" and bool(p.get("order_id"))
+
+    order_ids = {p["order_id"] for p in payments if is_captured(p)}
+
+    orders = {
+        row["razorpay_order_id"]: row
+        for row in Order.objects.filter(razorpay_order_id__in=order_ids).values(
+            "pk", "order_number", "razorpay_order_id", "razorpay_payment_id", "is_paid", "total"
+        )
+    } if order_ids else {}
+    unused = {
+        u.razorpay_order_id: u
+        for u in UnusedGatewayOrder.objects.filter(razorpay_order_id__in=order_ids - orders.keys())
+    } if order_ids - orders.keys() else {}
+
+    for payment in payments:
+        if not is_captured(payment):
+            yield "not_captured", payment, None, None
+            continue
+        order = orders.get(payment["order_id"])
+        if order is None:
+            if payment["order_id"] in unused:
+                yield "unused_gateway", payment, None, unused[payment["order_id"]]
+            else:
+                yield "orphan", payment, None, None
+        elif not order["is_paid"] and int(payment.get("amount") or 0) != gateway_amount(order["total"]):
+            yield "amount_mismatch", payment, order, None
+        elif not order["is_paid"]:
+            yield "paid_not_marked", payment, order, None
+        elif order["razorpay_payment_id"] == payment["id"]:
+            yield "ok", payment, order, None
+        else:
+            yield "duplicate_payment", payment, order, None
+
+
+def _fix_unpaid_orders(rows):
+    from .helpers import finalize_paid_order
+
+    orders = Order.objects.in_bulk([order["pk"] for _, order in rows])
+    done = []
+    for payment, order in rows:
+        try:
+            finalize_paid_order(orders[order["pk"]], payment["order_id"], payment["id"])
+            done.append((payment, "marked_paid", ""))
+        except Exception as e:
+            logger.exception("Reconciliation could not finalize %s", order["order_number"])
+            done.append((payment, "error", str(e)))
+    return done
+
+
+def _refund_unused(rows, source):
+    done, refunded_ids = [], []
+    for payment, unused in rows:
+        if unused.status == "refunded":
+            done.append((payment, "already_refunded", unused.refund_id))
+            continue
+        try:
+            refund = source.refund(payment["id"], int(payment["amount"]), notes={"reason": "unused gateway order"})
+        except Exception as e:
+            logger.exception("Refund of unused gateway payment %s failed", payment["id"])
+            done.append((payment, "error", str(e)))
+            continue
+        unused.status = "refunded"
+        unused.razorpay_payment_id = payment["id"]
+        unused.refund_id = refund.get("id", "")
+        unused.resolved_at = timezone.now()
+        refunded_ids.append(unused)
+        done.append((payment, "refunded", unused.refund_id))
+
+    if refunded_ids:
+        UnusedGatewayOrder.objects.bulk_update(
+            refunded_ids, ["status", "razorpay_payment_id", "refund_id", "resolved_at"]
+        )
+    return done
+
+
+def reconcile_payments(start, end, source, apply=False, page_size=100, report=None, grace=timedelta(hours=1)):
+    """
+    Reconcile Razorpay payments created in [start, end]. With apply=False
+    nothing is changed and the report lists what would be done.
+
+    `report` is anything with writerow(dict) (e.g. csv.DictWriter).
+    Returns a Counter of categories / actions.
+    """
+    summary = Counter()
+
+    def emit(category, payment, order_number="", action="", detail=""):
+        summary[category] += 1
+        if action:
+            summary[f"action:{action}"] += 1
+        if report is not None:
+            report.writerow({
+                "category": category,
+                "payment_id": payment.get("id", ""),
+                "razorpay_order_id": payment.get("order_id") or "",
+                "order_number": order_number,
+                "amount": payment.get("amount", ""),
+                "action": action,
+                "detail": detail,
+            })
+
+    for page in source.pages(start, end, page_size=page_size):
+        summary["payments"] += len(page)
+        to_finalize, to_refund = [], []
+
+        for category, payment, order, unused in _classify_page(page):
+            if category == "paid_not_marked" and apply:
+                to_finalize.append((payment, order))
+            elif category == "unused_gateway" and apply:
+                to_refund.append((payment, unused))
+            elif category == "not_captured":
+                summary[category] += 1
+            else:
+                pending_action = {"paid_not_marked": "would_mark_paid", "unused_gateway": "would_refund"}
+                emit(category, payment, (order or {}).get("order_number", ""), pending_action.get(category, ""))
+
+        order_numbers = {order["razorpay_order_id"]: order["order_number"] for _, order in to_finalize}
+        for payment, action, detail in _fix_unpaid_orders(to_finalize):
+            emit("paid_not_marked", payment, order_numbers[payment["order_id"]], action, detail)
+        for payment, action, detail in _refund_unused(to_refund, source):
+            emit("unused_gateway", payment, "", action, detail)
+
+    # Unpaid orders / unused gateway orders in the window that no captured
+    # payment matched. Counted in the database, not held in memory (in a dry
+    # run these still include the rows reported above as would_*).
+    cutoff = min(end, timezone.now() - grace)
+    summary["pending_without_payment"] = Order.objects.filter(
+        is_paid=False, razorpay_order_id__isnull=False, created_at__gte=start, created_at__lt=cutoff,
+    ).exclude(razorpay_order_id="").count()
+    stale_unused = UnusedGatewayOrder.objects.filter(status="pending", created_at__gte=start, created_at__lt=cutoff)
+    if apply:
+        summary["unused_no_payment"] = stale_unused.update(status="no_payment", resolved_at=timezone.now())
+    else:
+        summary["unused_no_payment"] = stale_unused.count()
+
+    return summary
@@ -0,0 +1,195 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from products.models import ProductVariant
+from .models import StockReservation, OrderItemStatus
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL_MINUTES = getattr(settings, "STOCK_RESERVATION_TTL_MINUTES", 30)
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(minutes=RESERVATION_TTL_MINUTES)
+
+
+def _quantities(lines):
+    """{variant_id: qty} from (variant_id, qty) pairs, merged per variant."""
+    totals = defaultdict(int)
+    for variant_id, quantity in lines:
+        totals[int(variant_id)] += int(quantity)
+    return totals
+
+
+def _take_stock(variant_id, quantity):
+    """UPDATE ... SET stock = stock - qty WHERE id = ? AND stock >= qty"""
+    return ProductVariant.objects.filter(pk=variant_id, stock__gte=quantity).update(stock=F("stock") - quantity)
+
+
+def _return_stock(variant_id, quantity):
+    ProductVariant.objects.filter(pk=variant_id).update(stock=F("stock") + quantity)
+
+
+@transaction.atomic
+def reserve_stock(order, lines):
+    """
+    Reserve every (variant_id, qty) line for `order` or nothing at all.
+    Each line is a conditional decrement, so concurrent buyers can never take
+    the same last unit and no read-modify-write is involved. Variants are
+    processed in id order to keep lock ordering consistent.
+    """
+    wanted = _quantities(lines)
+    short = []
+    for variant_id in sorted(wanted):
+        if not _take_stock(variant_id, wanted[variant_id]):
+            short.append(variant_id)
+
+    if short:
+        # Raising out of the atomic block undoes the decrements already made
+        raise ValidationError({
+            "detail": "Some items went out of stock while you were checking out.",
+            "out_of_stock_variant_ids": short,
+        })
+
+    expires_at = reservation_expiry()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_variant_id=variant_id, quantity=qty, expires_at=expires_at)
+        for variant_id, qty in wanted.items()
+    ])
+    return expires_at
+
+
+@transaction.atomic
+def refresh_reservations(order):
+    """
+    Called when an unpaid order is reused for another payment attempt:
+    extends active reservations and re-reserves lines whose reservation was
+    released or expired in the meantime.
+    """
+    expires_at = reservation_expiry()
+    wanted = _quantities(
+        order.items.exclude(status__in=[OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED])
+        .values_list("product_variant_id", "quantity")
+    )
+    active = dict(
+        StockReservation.objects.filter(order=order, status=StockReservation.ACTIVE)
+        .values_list("product_variant_id", "quantity")
+    )
+    StockReservation.objects.filter(order=order, status=StockReservation.ACTIVE).update(expires_at=expires_at)
+
+    missing = {vid: qty for vid, qty in wanted.items() if vid not in active}
+    if not missing:
+        return expires_at
+
+    short = [vid for vid in sorted(missing) if not _take_stock(vid, missing[vid])]
+    if short:
+        raise ValidationError({
+            "detail": "Some items in this order are no longer in stock.",
+            "out_of_stock_variant_ids": short,
+        })
+
+    StockReservation.objects.filter(order=order, product_variant_id__in=missing).delete()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_variant_id=vid, quantity=qty, expires_at=expires_at)
+        for vid, qty in missing.items()
+    ])
+    return expires_at
+
+
+@transaction.atomic
+def commit_reservations(order):
+    """
+    Payment verified: keep the reserved units. Lines whose reservation had
+    already expired are taken again if possible; any shortfall is returned
+    (and logged) rather than failing a payment that was already captured.
+    """
+    now = timezone.now()
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(order=order)
+        .values_list("id", "product_variant_id", "quantity", "status")
+    )
+    if not rows:
+        return []
+
+    shortfall = []
+    for res_id, variant_id, quantity, status in rows:
+        if status in (StockReservation.RELEASED, StockReservation.EXPIRED):
+            if not _take_stock(variant_id, quantity):
+                shortfall.append(variant_id)
+                continue
+        if status != StockReservation.COMMITTED:
+            StockReservation.objects.filter(pk=res_id).update(status=StockReservation.COMMITTED, updated_at=now)
+
+    if shortfall:
+        logger.error("Order %s paid but stock short for variants %s", order.order_number, shortfall)
+    return shortfall
+
+
+@transaction.atomic
+def release_for_items(order, items):
+    """
+    Give stock back for cancelled order items. Uses the reservation when there
+    is one (active or committed); orders placed before reservations existed
+    fall back to the item quantity. Always an F() increment.
+    """
+    by_variant = defaultdict(int)
+    for item in items:
+        by_variant[item.product_variant_id] += item.quantity
+
+    reservations = {
+        r.product_variant_id: r
+        for r in StockReservation.objects.select_for_update().filter(
+            order=order, product_variant_id__in=by_variant
+        )
+    }
+    now = timezone.now()
+    for variant_id, quantity in by_variant.items():
+        reservation = reservations.get(variant_id)
+        if reservation is None:
+            _return_stock(variant_id, quantity)
+            continue
+        if reservation.status not in (StockReservation.ACTIVE, StockReservation.COMMITTED):
+            continue  # already given back
+
+        quantity = min(quantity, reservation.quantity)
+        _return_stock(variant_id, quantity)
+        if quantity == reservation.quantity:
+            reservation.status = StockReservation.RELEASED
+        else:
+            reservation.quantity -= quantity
+        reservation.updated_at = now
+        reservation.save(update_fields=["quantity", "status", "updated_at"])
+
+
+def release_expired_reservations(now=None, batch_size=500):
+    """
+    Sweeper: return stock held by unpaid orders whose reservation expired.
+    Works in short batches and skips rows locked by an in-flight payment.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(status=StockReservation.ACTIVE, expires_at__lt=now, order__is_paid=False)
+                .order_by("id")
+                .values_list("id", "product_variant_id", "quantity")[:batch_size]
+            )
+            if not batch:
+                break
+
+            totals = _quantities((variant_id, qty) for _, variant_id, qty in batch)
+            for variant_id in sorted(totals):
+                _return_stock(variant_id, totals[variant_id])
+            StockReservation.objects.filter(id__in=[row[0] for row in batch]).update(
+                status=StockReservation.EXPIRED, updated_at=timezone.now()
+            )
+        released += len(batch)
+    return released
@@ -11,6 +11,7 @@ from decimal import Decimal
 from django.db import transaction
 from .signals import send_multichannel_notification
 from .models import ReturnRequest, ReplacementRequest, Order, OrderStatus, OrderItem,Refund,ReturnRecoveryAccount,ReturnRecoveryTransaction,OrderItemStatus
+from .idempotency import idempotent
 from .returnReplacementSerializer import ReturnRequestSerializer, ReplacementRequestSerializer
 from accounts.permissions import IsCustomer, IsAdmin, IsAdminOrCustomer
 from .utils import process_refund, check_refund_status,create_reverse_pickup,get_delhivery_return_charge,calculate_replacement_delivery,create_repl_shipment
@@ -139,6 +140,7 @@ class ReturnRequestRefundAPIView(APIView):
     """
     permission_classes = [IsAdmin]
 
+    @idempotent("refund")
     def post(self, request):
         return_ids = request.data.get("return_ids")
         if not return_ids or not isinstance(return_ids, list):
@@ -183,7 +185,7 @@ class ReturnRequestRefundAPIView(APIView):
                 refund_already_done = rr.status == "refunded"
 
                 # --- Compute reverse pickup charge ---
-                correct_weight = rr.order_item.product_variant.get_weight_in_grams() * rr.order_item.quantity
+                correct_weight = rr.order_item.weight_grams * rr.order_item.quantity
                 correct_return_charge = get_delhivery_return_charge(
                     o_pin=settings.DELHIVERY_PICKUP.get("pin"),
                     d_pin=rr.order.shipping_address.postal_code,
@@ -439,10 +441,9 @@ class ReplacementRequestUpdateAPIView(UpdateAPIView):
         # ------------------ APPROVAL FLOW ------------------
         order = instance.order
         item = instance.order_item
-        variant = item.product_variant
 
         days_passed = (timezone.now().date() - order.created_at.date()).days
-        if not variant.allow_replacement or days_passed > variant.replacement_days:
+        if not item.allow_replacement or days_passed > (item.replacement_days or 0):
             raise ValidationError("Replacement period has expired.")
 
         if not order.waybill:
@@ -486,6 +487,7 @@ class ReplacementRequestUpdateAPIView(UpdateAPIView):
                     product_variant=item.product_variant,
                     quantity=item.quantity,
                     price=item.price,
+                    **item.snapshot(),
                 )
                 instance.new_order = new_order
             else:
@@ -118,19 +118,19 @@ class ReturnRequestSerializer(serializers.ModelSerializer):
                     {"order_item_list": f"Item {item.id} does not belong to this order."}
                 )
 
-            variant = item.product_variant
-            if not variant.allow_return:
+            # Policy as it was when the order was placed
+            if not item.allow_return:
                 raise serializers.ValidationError(
-                    f"Product {variant.product.name} is not eligible for return."
+                    f"Product {item.product_name} is not eligible for return."
                 )
 
             if not order.delivered_at:
                 raise serializers.ValidationError("Delivery date not available.")
 
             days_passed = (timezone.now().date() - order.delivered_at.date()).days
-            if days_passed > variant.return_days:
+            if days_passed > (item.return_days or 0):
                 raise serializers.ValidationError(
-                    f"Return window expired for item {item.id}. Allowed {variant.return_days} days."
+                    f"Return window expired for item {item.id}. Allowed {item.return_days} days."
                 )
 
             if ReturnRequest.objects.filter(
@@ -181,42 +181,28 @@ class ReturnRequestSerializer(serializers.ModelSerializer):
             return ShippingAddressSerializer(order.shipping_address).data
         return None
 
+    # Item details come from the order-time snapshot, not the live catalog
     def get_product(self, obj):
         item = getattr(obj, "order_item", None)
-        if not item or not getattr(item, "product_variant", None):
-            return None
-        product = getattr(item.product_variant, "product", None)
-        return getattr(product, "name", None) if product else None
+        return (item.product_name or None) if item else None
 
     def get_variant(self, obj):
         item = getattr(obj, "order_item", None)
-        if not item or not getattr(item, "product_variant", None):
-            return None
-        return getattr(item.product_variant, "variant_name", None)
+        return (item.variant_name or None) if item else None
 
     def get_variant_images(self, obj):
         item = getattr(obj, "order_item", None)
-        if not item or not getattr(item, "product_variant", None):
-            return []
-        images = getattr(item.product_variant, "images", None)
-        if not images:
-            return []
-        return [img.url for img in images.all() if getattr(img, "url", None)]
+        return [item.thumbnail_url] if item and item.thumbnail_url else []
 
     def get_product_image(self, obj):
         item = getattr(obj, "order_item", None)
-        if not item or not getattr(item, "product_variant", None):
-            return None
-        product = getattr(item.product_variant, "product", None)
-        if not product:
-            return None
-        return product.image_url or (product.image.url if product.image else None)
+        return (item.thumbnail_url or None) if item else None
 
     def get_return_days_remaining(self, obj):
         item = getattr(obj, "order_item", None)
         if not item or not getattr(item.order, "delivered_at", None):
             return 0
-        allowed_days = getattr(item.product_variant, "return_days", 0) or 0
+        allowed_days = item.return_days or 0
         delivered_date = item.order.delivered_at.date()
         days_passed = (timezone.now().date() - delivered_date).days
         return max(0, allowed_days - days_passed)
@@ -308,11 +294,10 @@ class ReplacementRequestSerializer(serializers.ModelSerializer):
                     "Replacement requests can only be created for delivered orders."
                 )
 
-            variant = order_item.product_variant
             days_since_order = (timezone.now().date() - order.created_at.date()).days
 
-            # ---- New replacement period check ----
-            if not variant.allow_replacement or days_since_order > variant.replacement_days:
+            # ---- Replacement period check (policy snapshot from order time) ----
+            if not order_item.allow_replacement or days_since_order > (order_item.replacement_days or 0):
                 raise serializers.ValidationError(
                     "Replacement period has expired. Cannot create a replacement request."
                 )
@@ -334,10 +319,9 @@ class ReplacementRequestSerializer(serializers.ModelSerializer):
         order_item = validated_data.pop("order_item_id")
         reason = validated_data.pop("reason")
 
-        variant = order_item.product_variant
         validated_data["variant_policy_snapshot"] = {
-            "allow_replacement": variant.allow_replacement,
-            "replacement_days": variant.replacement_days,
+            "allow_replacement": order_item.allow_replacement,
+            "replacement_days": order_item.replacement_days,
         }
 
         # Create ReplacementRequest
@@ -362,7 +346,8 @@ class ReplacementRequestSerializer(serializers.ModelSerializer):
             order=new_order,
             product_variant=order_item.product_variant,
             quantity=order_item.quantity,
-            price=order_item.price
+            price=order_item.price,
+            **order_item.snapshot(),
         )
 
         instance.new_order = new_order
@@ -374,25 +359,25 @@ class ReplacementRequestSerializer(serializers.ModelSerializer):
         return ShippingAddressSerializer(obj.order.shipping_address).data if obj.order.shipping_address else None
 
     def get_product(self, obj):
-        return getattr(obj.order_item.product_variant.product, "name", None)
+        return obj.order_item.product_name or None
 
     def get_variant(self, obj):
-        return getattr(obj.order_item.product_variant, "variant_name", None)
+        return obj.order_item.variant_name or None
 
     def get_variant_images(self, obj):
-        if obj.order_item and obj.order_item.product_variant:
-            # First try the property .url on each image object
-            return [img.url for img in obj.order_item.product_variant.images.all() if img.url]
+        # Snapshot thumbnail taken when the order was placed
+        if obj.order_item and obj.order_item.thumbnail_url:
+            return [obj.order_item.thumbnail_url]
         return []
 
     def get_replacement_days_remaining(self, obj):
-        variant = obj.order_item.product_variant
-        allowed_days = variant.replacement_days or 0
+        item = obj.order_item
+        allowed_days = item.replacement_days or 0
         delta = (timezone.now().date() - obj.order.created_at.date()).days
-        return max(allowed_days - delta, 0) if variant.allow_replacement else 0
+        return max(allowed_days - delta, 0) if item.allow_replacement else 0
 
     def get_is_replacement_eligible(self, obj):
-        variant = obj.order_item.product_variant
-        allowed_days = variant.replacement_days or 0
+        item = obj.order_item
+        allowed_days = item.replacement_days or 0
         delta = (timezone.now().date() - obj.order.created_at.date()).days
-        return variant.allow_replacement and delta <= allowed_days
+        return item.allow_replacement and delta <= allowed_days
@@ -0,0 +1,116 @@
+"""
+Order search.
+
+Every order carries `search_document`: one lowercased line made of its
+order number, waybills (forward and return), customer name / email /
+phone, shipping name / phone and each item's product name, variant and
+SKU (from the item snapshot). A search is one substring match per term:
+
+    search_orders(Order.objects.filter(user=user), "pepper 643")
+
+On PostgreSQL the column has a pg_trgm GIN index (migration 0054), so
+`LIKE '%term%'` is an index scan instead of a join across items, address
+and user. OrderSearchFilter serves the customer and admin order lists
+with ?search=.
+
+Documents are rebuilt set-based after commit when something they contain
+changes (schedule_search_refresh); checkout builds the first one in memory.
+"""
+import re
+import threading
+from django.db import transaction
+from rest_framework.filters import BaseFilterBackend
+from .models import Order, OrderItem, ReturnRequest
+
+MAX_TERMS = 6
+_pending = threading.local()
+
+
+def _tokens(*values):
+    for value in values:
+        value = str(value or "").strip().lower()
+        if value:
+            yield value
+            digits = re.sub(r"\D", "", value)
+            if len(digits) > 10 and digits != value:
+                yield digits[-10:]  # +91 98765 43210 -> 9876543210
+
+
+def build_search_document(order, items, address=None, user=None, waybills=()):
+    """Document text for `order` from objects already in memory."""
+    address = address or order.shipping_address
+    user = user or order.user
+    parts = list(_tokens(
+        order.order_number, order.waybill, *waybills,
+        getattr(user, "first_name", ""), getattr(user, "last_name", ""),
+        getattr(user, "email", ""), getattr(user, "phone_number", ""),
+        getattr(address, "full_name", ""), getattr(address, "phone_number", ""),
+    ))
+    for item in items:
+        parts.extend(_tokens(item.product_name, item.variant_name, item.sku))
+    return " ".join(dict.fromkeys(parts))
+
+
+def refresh_search_documents(order_ids):
+    """Rebuild the documents of many orders: three reads and one bulk UPDATE."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    orders = list(Order.objects.filter(pk__in=order_ids).select_related("user", "shipping_address"))
+
+    items = {}
+    for item in OrderItem.objects.filter(order_id__in=order_ids).only(
+        "order_id", "product_name", "variant_name", "sku"
+    ).order_by("pk"):
+        items.setdefault(item.order_id, []).append(item)
+    waybills = {}
+    for order_id, waybill in ReturnRequest.objects.filter(
+        order_id__in=order_ids, waybill__isnull=False
+    ).values_list("order_id", "waybill"):
+        waybills.setdefault(order_id, []).append(waybill)
+
+    for order in orders:
+        order.search_document = build_search_document(order, items.get(order.pk, []), waybills=waybills.get(order.pk, ()))
+    Order.objects.bulk_update(orders, ["search_document"], batch_size=500)
+    return len(orders)
+
+
+def schedule_search_refresh(order_ids):
+    """
+    Rebuild these documents once the current transaction commits. Calls in
+    the same transaction share one refresh.
+    """
+    order_ids = {pk for pk in order_ids if pk}
+    if not order_ids:
+        return
+    pending = getattr(_pending, "ids", None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(order_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    pending = getattr(_pending, "ids", None)
+    if pending:
+        _pending.ids = set()
+        refresh_search_documents(pending)
+
+
+def search_terms(query):
+    return str(query or "").lower().split()[:MAX_TERMS]
+
+
+def search_orders(queryset, query):
+    """Orders whose document contains every term of `query`."""
+    for term in search_terms(query):
+        queryset = queryset.filter(search_document__contains=term)
+    return queryset
+
+
+class OrderSearchFilter(BaseFilterBackend):
+    """?search= over the order search document."""
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        return search_orders(queryset, request.query_params.get(self.search_param, ""))
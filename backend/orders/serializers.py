@@ -1,6 +1,6 @@
-from .models import Order, OrderItem, ShippingAddress,Refund
+from .models import Order, OrderItem, ShippingAddress,Refund,OrderEvent
+from .projections import first_item_summary
 from rest_framework import serializers
-from products.serializers import ProductVariantSerializer
 from products.models import ProductVariant
 from promoter.serializers import PromoterSerializer
 from rest_framework.validators import UniqueTogetherValidator
@@ -34,8 +34,33 @@ class ShippingAddressSerializer(serializers.ModelSerializer):
         ]
 
 
+def variant_snapshot(item):
+    """
+    `product_variant` block for order items, built from the item's snapshot
+    (same keys clients used from ProductVariantSerializer for history).
+    """
+    return {
+        "id": item.product_variant_id,
+        "product_name": item.product_name,
+        "variant_name": item.variant_name,
+        "sku": item.sku,
+        "primary_image_url": item.thumbnail_url or None,
+        "final_price": item.price,
+        "weight": item.weight_grams / 1000,
+        "allow_return": item.allow_return,
+        "return_days": item.return_days,
+        "allow_replacement": item.allow_replacement,
+        "replacement_days": item.replacement_days,
+        "is_returnable": item.allow_return,
+        "is_replaceable": item.allow_replacement,
+    }
+
+
+ORDER_ITEM_SNAPSHOT_FIELDS = ['product_name', 'variant_name', 'sku', 'thumbnail_url', 'weight_grams']
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_variant = ProductVariantSerializer(read_only=True)
+    product_variant = serializers.SerializerMethodField()
     product_variant_id = serializers.PrimaryKeyRelatedField(
         queryset=ProductVariant.objects.all(), write_only=True
     )
@@ -45,9 +70,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = [
             'id',
             'product_variant', 'product_variant_id',
-            'quantity', 'price', 'status','referral_code'
+            'quantity', 'price', 'status','referral_code',
+            *ORDER_ITEM_SNAPSHOT_FIELDS,
         ]
-        read_only_fields = ['status']
+        read_only_fields = ['status', *ORDER_ITEM_SNAPSHOT_FIELDS]
+
+    def get_product_variant(self, obj):
+        return variant_snapshot(obj)
 
     def create(self, validated_data):
         product_variant = validated_data['product_variant_id']
@@ -200,7 +229,7 @@ class OrderPaymentSerializer(serializers.Serializer):
         return attrs
 
 class OrderItemSimpleSerializer(serializers.ModelSerializer):
-    product_variant = ProductVariantSerializer(read_only=True)
+    product_variant = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderItem
@@ -209,12 +238,16 @@ class OrderItemSimpleSerializer(serializers.ModelSerializer):
             'product_variant',
             'quantity',
             'price',
-            'status','referral_code'
+            'status','referral_code',
+            *ORDER_ITEM_SNAPSHOT_FIELDS,
         ]
         read_only_fields = [
             'status',
         ]
 
+    def get_product_variant(self, obj):
+        return variant_snapshot(obj)
+
 class OrderDetailSerializer(serializers.ModelSerializer):
     shipping_address = ShippingAddressSerializer(read_only=True)
     promoter = PromoterSerializer(read_only=True)
@@ -263,22 +296,20 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         replacement_requests = {rr.order_item_id: rr for rr in obj.replacement_requests.all()}
 
         for item in obj.items.all():
-            variant = item.product_variant
-
             # ✅ Use the parent order’s shipped_at timestamp
-            delivered_at = item.order.shipped_at  
+            delivered_at = obj.shipped_at
             return_remaining_days = None
             replacement_remaining_days = None
 
-            # 🕒 Calculate remaining days for return/replacement
+            # 🕒 Remaining days for return/replacement (policy snapshot)
             if delivered_at:
                 now = timezone.now()
-                if variant.allow_return and (variant.return_days or 0) > 0:
-                    end_date = delivered_at + timedelta(days=variant.return_days)
+                if item.allow_return and (item.return_days or 0) > 0:
+                    end_date = delivered_at + timedelta(days=item.return_days)
                     return_remaining_days = max((end_date - now).days, 0)
 
-                if variant.allow_replacement and (variant.replacement_days or 0) > 0:
-                    end_date = delivered_at + timedelta(days=variant.replacement_days)
+                if item.allow_replacement and (item.replacement_days or 0) > 0:
+                    end_date = delivered_at + timedelta(days=item.replacement_days)
                     replacement_remaining_days = max((end_date - now).days, 0)
 
             # 🧾 Attach existing request data
@@ -308,8 +339,11 @@ class OrderDetailSerializer(serializers.ModelSerializer):
 
 
 class OrderSummarySerializer(serializers.ModelSerializer):
+    """Flat list row; expects projections.with_list_summary() annotations."""
     shipping_address = ShippingAddressSummarySerializer(read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
     first_item = serializers.SerializerMethodField()
+    latest_refund_status = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = Order
@@ -317,18 +351,12 @@ class OrderSummarySerializer(serializers.ModelSerializer):
             "order_number", "shipping_address", "status",
             "subtotal", "total", "payment_method", "is_paid",
             "created_at", "updated_at",
-            "waybill", "courier", "delhivery_tracking_url","first_item"
+            "waybill", "courier", "delhivery_tracking_url",
+            "item_count", "first_item", "latest_refund_status",
         ]
 
     def get_first_item(self, obj):
-        item = obj.items.first()
-        if not item:
-            return None
-        return {
-            "product_name": item.product_variant.product_name,
-            "variant_name": item.product_variant.variant_name,
-            "image": item.product_variant.images.first().image if item.product_variant.images.exists() else None,
-        }
+        return first_item_summary(obj)
 
 
 
@@ -336,6 +364,9 @@ class CustomerOrderListSerializer(serializers.ModelSerializer):
     shipping_address = ShippingAddressSerializer(read_only=True)
     items = OrderItemSimpleSerializer( many=True, read_only=True)
     refund_info = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
+    first_item = serializers.SerializerMethodField()
+    latest_refund_status = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = Order
@@ -344,10 +375,15 @@ class CustomerOrderListSerializer(serializers.ModelSerializer):
             'subtotal', 'total', 'payment_method', 'is_paid',
             'created_at', 'updated_at', 'items',
             'waybill', 'courier', 'delhivery_tracking_url', 'refund_info',
+            'item_count', 'first_item', 'latest_refund_status',
         ]
 
+    def get_first_item(self, obj):
+        return first_item_summary(obj)
+
     def get_refund_info(self, obj):
-        refund = obj.refunds.last()
+        refunds = list(obj.refunds.all())  # prefetched oldest first by the list view
+        refund = refunds[-1] if refunds else None
         if not refund:
             return None
         return {
@@ -388,6 +424,11 @@ class OrderPreviewOutputSerializer(serializers.Serializer):
     total = serializers.DecimalField(max_digits=10, decimal_places=2)
     delivery_charge = serializers.DecimalField(max_digits=10, decimal_places=2)
     estimated_delivery_days = serializers.IntegerField(allow_null=True)
+    is_serviceable = serializers.BooleanField(allow_null=True, required=False)
+    partial = serializers.BooleanField(required=False)
+    cart_changes = serializers.ListField(child=serializers.DictField(), required=False)
+    quote_token = serializers.CharField(required=False)
+    quote_expires_in = serializers.IntegerField(required=False)
 
 class OrderLightSerializer(serializers.ModelSerializer):
     class Meta:
@@ -396,7 +437,7 @@ class OrderLightSerializer(serializers.ModelSerializer):
 
 
 class OrderItemLightSerializer(serializers.ModelSerializer):
-    product_variant = ProductVariantSerializer(read_only=True)
+    product_variant = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderItem
@@ -405,6 +446,9 @@ class OrderItemLightSerializer(serializers.ModelSerializer):
             'status','referral_code'
         ]
 
+    def get_product_variant(self, obj):
+        return variant_snapshot(obj)
+
 
 class ShipmentTrackingSerializer(serializers.Serializer):
     waybill = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -416,4 +460,20 @@ class ShipmentTrackingSerializer(serializers.Serializer):
     origin = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     destination = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     pickup_date = serializers.DateTimeField(required=False, allow_null=True)
-    delivered_date = serializers.DateTimeField(required=False, allow_null=True)
\ No newline at end of file
+    delivered_date = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    item_id = serializers.IntegerField(source="order_item_id", read_only=True, allow_null=True)
+
+    class Meta:
+        model = OrderEvent
+        fields = ["id", "kind", "code", "previous", "message", "item_id", "payload", "source", "occurred_at"]
+
+
+class AdminOrderEventSerializer(OrderEventSerializer):
+    actor = serializers.EmailField(source="actor.email", read_only=True, default=None)
+
+    class Meta(OrderEventSerializer.Meta):
+        fields = OrderEventSerializer.Meta.fields + ["internal", "actor"]
+
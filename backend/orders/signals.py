@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from django.conf import settings
 from django.db import transaction
-from .models import Order, OrderItem, Notification
+from .models import Order, OrderItem, Notification, OrderEvent, Refund, ReturnRequest, ReplacementRequest, ShippingAddress
+from .search import schedule_search_refresh
+from .aggregates import ITEM_SOURCE_FIELDS, refresh_item_order_aggregates, refresh_order_aggregates
+from .timeline import record_event, record_status_changes
+from .transitions import status_transitioned
 
 def send_multichannel_notification(user,
                                    order=None,
@@ -56,6 +61,9 @@ def handle_order_notifications(sender, instance, created, **kwargs):
     - Refunded
     """
 
+    if instance.archived_at:
+        return  # history: its notifications live in ArchivedNotification
+
     user = instance.user
     order_number = instance.order_number
 
@@ -166,8 +174,8 @@ def handle_order_item_notifications(sender, instance, created, **kwargs):
     Sends notifications when an item is refunded, replaced, or progresses through fulfillment stages.
     """
 
-    if created:
-        return  # only handle updates
+    if created or instance.archived_at:
+        return  # only handle updates of hot items
 
     # 💵 Item Refunded
     if instance.status == "refunded" and not Notification.objects.filter(order_item=instance, event="refunded").exists():
@@ -176,7 +184,7 @@ def handle_order_item_notifications(sender, instance, created, **kwargs):
             order=instance.order,
             order_item=instance,
             event="refunded",
-            message=f"💵 Your item '{instance.product_variant}' has been refunded.",
+            message=f"💵 Your item '{instance.display_name}' has been refunded.",
             channels=["email"],
         )
 
@@ -187,7 +195,7 @@ def handle_order_item_notifications(sender, instance, created, **kwargs):
             order=instance.order,
             order_item=instance,
             event="replaced",
-            message=f"🔄 Your item '{instance.product_variant}' has been replaced with a new one.",
+            message=f"🔄 Your item '{instance.display_name}' has been replaced with a new one.",
             channels=["email"],
         )
 
@@ -200,6 +208,225 @@ def handle_order_item_notifications(sender, instance, created, **kwargs):
                 order=instance.order,
                 order_item=instance,
                 event=event,
-                message=f"📦 Your item '{instance.product_variant}' is now {instance.status}.",
+                message=f"📦 Your item '{instance.display_name}' is now {instance.status}.",
                 channels=["email"],
             )
+
+
+# -------------------------
+# BULK STATUS TRANSITIONS
+# -------------------------
+ORDER_TRANSITION_EVENTS = {
+    "processing": ("order_processing", "🧑‍🏭 Your order {number} is now being processed and packed for shipment."),
+    "in_transit": ("order_shipped", (
+        "🚚 Your order {number} has been shipped via Delhivery.\n"
+        "Tracking ID: {waybill}\n"
+        "Track here: https://www.delhivery.com/track/package/{waybill}/"
+    )),
+    "delivered": ("order_delivered", "✅ Your order {number} has been delivered successfully."),
+    "cancelled": ("order_cancelled", "❌ Your order {number} has been cancelled.\nReason: {reason}"),
+}
+
+# Same events as the per-item post_save receiver above; of its
+# picked / packed / shipped / delivered group only "delivered" is an
+# OrderItemStatus (shipping is announced by the order-level order_shipped)
+ITEM_TRANSITION_EVENTS = {
+    "delivered": ("item_delivered", "📦 Your item '{name}' is now delivered."),
+    "refunded": ("refunded", "💵 Your item '{name}' has been refunded."),
+    "repl_completed": ("replaced", "🔄 Your item '{name}' has been replaced with a new one."),
+}
+
+
+def _notify_once(objects, event, build_message, lookup):
+    """One email per object that has not had `event` yet (one query to check)."""
+    already = set(
+        Notification.objects.filter(event=event, **{f"{lookup}__in": objects})
+        .values_list(f"{lookup}_id", flat=True)
+    )
+    for obj in objects:
+        if obj.pk in already:
+            continue
+        order = obj if lookup == "order" else obj.order
+        send_multichannel_notification(
+            user=order.user,
+            order=order,
+            order_item=None if lookup == "order" else obj,
+            event=event,
+            message=build_message(obj),
+            channels=["email"],
+        )
+
+
+@receiver(status_transitioned, sender=Order)
+def handle_order_transitions(sender, changes, to_status, **kwargs):
+    """Order notifications for a bulk transition, sent after it commits."""
+    if to_status not in ORDER_TRANSITION_EVENTS:
+        return
+    event, template = ORDER_TRANSITION_EVENTS[to_status]
+    ids = [pk for pk, _ in changes]
+
+    def notify():
+        orders = list(Order.objects.hot().filter(pk__in=ids).select_related("user"))
+        _notify_once(
+            orders, event,
+            lambda o: template.format(
+                number=o.order_number, waybill=o.waybill, reason=o.cancel_reason or "No reason provided.",
+            ),
+            "order",
+        )
+
+    transaction.on_commit(notify)
+
+
+@receiver(status_transitioned, sender=OrderItem)
+def handle_order_item_transitions(sender, changes, to_status, **kwargs):
+    """Item notifications for a bulk transition, sent after it commits."""
+    if to_status not in ITEM_TRANSITION_EVENTS:
+        return
+    event, template = ITEM_TRANSITION_EVENTS[to_status]
+    ids = [pk for pk, _ in changes]
+
+    def notify():
+        items = list(OrderItem.objects.filter(pk__in=ids, archived_at__isnull=True).select_related("order__user"))
+        _notify_once(items, event, lambda i: template.format(name=i.display_name), "order_item")
+
+    transaction.on_commit(notify)
+
+
+# -------------------------
+# ORDER TIMELINE
+# -------------------------
+@receiver(status_transitioned, sender=Order)
+@receiver(status_transitioned, sender=OrderItem)
+def record_transitions(sender, changes, to_status, actor=None, source="", **kwargs):
+    record_status_changes(sender, changes, to_status, actor=actor, source=source)
+
+
+@receiver(post_save, sender=Order)
+def record_order_placed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_event(instance, OrderEvent.PLACED, instance.status, f"Order {instance.order_number} placed",
+                     payload={"total": instance.total})
+
+
+TIMELINE_KINDS = {Refund: OrderEvent.REFUND, ReturnRequest: OrderEvent.RETURN, ReplacementRequest: OrderEvent.REPLACEMENT}
+
+
+@receiver(post_init, sender=Refund)
+@receiver(post_init, sender=ReturnRequest)
+@receiver(post_init, sender=ReplacementRequest)
+def remember_timeline_status(sender, instance, **kwargs):
+    instance._timeline_status = instance.status if instance.pk else None
+
+
+@receiver(post_save, sender=Refund)
+@receiver(post_save, sender=ReturnRequest)
+@receiver(post_save, sender=ReplacementRequest)
+def record_request_status(sender, instance, created, raw=False, **kwargs):
+    """One event when a refund / return / replacement is created or its status changes."""
+    previous = getattr(instance, "_timeline_status", None)
+    if raw or not instance.order_id or (not created and previous == instance.status):
+        return
+    instance._timeline_status = instance.status
+
+    payload = {"id": instance.pk}
+    if sender is Refund:
+        payload.update(refund_id=instance.refund_id, amount=instance.amount)
+    elif getattr(instance, "refund_amount", None) is not None:
+        payload["refund_amount"] = instance.refund_amount
+    record_event(
+        instance.order_id, TIMELINE_KINDS[sender], instance.status,
+        order_item=getattr(instance, "order_item_id", None), previous=previous or "", payload=payload,
+    )
+
+
+@receiver(post_save, sender=Notification)
+def record_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.order_id:
+        record_event(
+            instance.order_id, OrderEvent.NOTIFICATION, instance.event, instance.message,
+            order_item=instance.order_item_id, payload={"channel": instance.channel}, internal=True,
+        )
+
+
+# -------------------------
+# ORDER SEARCH DOCUMENTS
+# -------------------------
+SEARCHED_ORDER_FIELDS = {"order_number", "waybill", "user", "shipping_address"}
+SEARCHED_USER_FIELDS = {"first_name", "last_name", "email", "phone_number"}
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # a new order has no items yet; they schedule it
+    if created or raw:
+        return
+    if update_fields is None or SEARCHED_ORDER_FIELDS & set(update_fields):
+        schedule_search_refresh([instance.pk])
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_item_order_search(sender, instance, created, raw=False, **kwargs):
+    # checkout builds the document itself and marks its items
+    if created and not raw and not getattr(instance, "_search_indexed", False):
+        schedule_search_refresh([instance.order_id])
+
+
+@receiver(post_save, sender=ShippingAddress)
+def refresh_address_order_search(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        schedule_search_refresh(Order.objects.filter(shipping_address=instance).values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=ReturnRequest)
+def refresh_return_order_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and instance.waybill and (update_fields is None or "waybill" in update_fields):
+        schedule_search_refresh([instance.order_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_customer_order_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # logins save last_login only; skip those
+    if created or raw or (update_fields is not None and not SEARCHED_USER_FIELDS & set(update_fields)):
+        return
+    schedule_search_refresh(Order.objects.filter(user=instance).values_list("pk", flat=True))
+
+
+# -------------------------
+# ORDER AGGREGATES
+# -------------------------
+# Refreshed in the same transaction, so the order row is right as soon as
+# the item change is visible.
+@receiver(status_transitioned, sender=OrderItem)
+def refresh_transitioned_aggregates(sender, changes, **kwargs):
+    refresh_item_order_aggregates([pk for pk, _ in changes])
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_item_aggregates(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # checkout computes the aggregates itself and marks its items
+    if raw or (created and getattr(instance, "_aggregated", False)):
+        return
+    if update_fields is None or ITEM_SOURCE_FIELDS & set(update_fields):
+        refresh_order_aggregates([instance.order_id])
+
+
+@receiver(post_delete, sender=OrderItem)
+def refresh_deleted_item_aggregates(sender, instance, **kwargs):
+    refresh_order_aggregates([instance.order_id])
+
+
+@receiver(post_save, sender=Order)
+def refresh_paid_order_aggregates(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # refundable_amount follows is_paid; a full save may also have written
+    # stale aggregates back from memory
+    if created or raw:
+        return
+    if update_fields is None or "is_paid" in update_fields:
+        refresh_order_aggregates([instance.pk])
+
+
+@receiver(post_save, sender=ReturnRequest)
+def refresh_refunded_return_aggregates(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and instance.status == "refunded" and (update_fields is None or "status" in update_fields):
+        refresh_order_aggregates([instance.order_id])
@@ -1,15 +1,35 @@
 import time
+from collections import defaultdict
 import logging
 from rest_framework import status
 from django.conf import settings
 from django.db import transaction
-from orders.models import Order, OrderItem,OrderItemStatus
+from orders.models import Order, OrderItem,OrderItemStatus,OrderStatus
+from orders.transitions import transition_items, transition_orders
 from orders.utils import track_delhivery_shipment
 from promoter.utils import apply_promoter_commission
 from django.http import JsonResponse
 from datetime import date, timedelta
 logger = logging.getLogger(__name__)
 
+# 🧭 Map Delhivery → internal system status
+TRACKING_STATUS_MAP = {
+    "pickup pending": OrderStatus.PROCESSING,
+    "manifested": OrderStatus.PROCESSING,
+    "in transit": OrderStatus.IN_TRANSIT,
+    "out for delivery": OrderStatus.OUT_FOR_DELIVERY,
+    "delivered": OrderStatus.DELIVERED,
+    "rto delivered": OrderStatus.CANCELLED,
+    "undelivered": OrderStatus.UNDELIVERED,
+    "cancelled": OrderStatus.CANCELLED,
+}
+
+ACTIVE_TRACKING_STATUSES = [
+    OrderStatus.PROCESSING, OrderStatus.PARTIALLY_CANCELLED, OrderStatus.IN_TRANSIT,
+    OrderStatus.OUT_FOR_DELIVERY, OrderStatus.UNDELIVERED,
+]
+
+
 def auto_update_tracking():
     """
     Periodically checks Delhivery tracking info and auto-updates
@@ -21,11 +41,13 @@ def auto_update_tracking():
             logger.info("🔁 Checking Delhivery shipment statuses (per order)...")
 
             # Get orders that are still active and have a waybill
-            active_orders = Order.objects.filter(
-                status__in=["processing", "shipped"],
+            active_orders = Order.objects.hot().filter(
+                status__in=ACTIVE_TRACKING_STATUSES,
                 waybill__isnull=False
-            ).prefetch_related("items")
+            ).only("pk", "order_number", "status", "waybill")
 
+            # Collect orders per new status, then move each group at once
+            moves = defaultdict(list)
             for order in active_orders:
                 tracking_info = track_delhivery_shipment(waybill=order.waybill)
                 if not tracking_info.get("success"):
@@ -34,38 +56,21 @@ def auto_update_tracking():
                 summary = tracking_info.get("summary", {})
                 new_status_text = (summary.get("status") or "").lower()
 
-                # 🧭 Map Delhivery → internal system status
-                status_map = {
-                    "pickup pending": "processing",
-                    "manifested": "processing",
-                    "in transit": "shipped",
-                    "out for delivery": "shipped",
-                    "delivered": "delivered",
-                    "rto delivered": "cancelled",
-                    "undelivered": "cancelled",
-                    "cancelled": "cancelled",
-                }
-
-                mapped_status = status_map.get(new_status_text)
-                if not mapped_status or mapped_status == order.status:
-                    continue  # no change
-
-                old_status = order.status
-                with transaction.atomic():
-                    # Update all items under this order
-                    order.items.update(status=mapped_status)
-
-                    # Update order status
-                    order.status = mapped_status
-                    order.save(update_fields=["status"])
-
-                    logger.info(
-                        f"✅ Order {order.order_number} {old_status} → {mapped_status}"
-                    )
+                mapped_status = TRACKING_STATUS_MAP.get(new_status_text)
+                if mapped_status and mapped_status != order.status:
+                    moves[mapped_status].append(order.pk)
 
                 # Delay slightly between tracking calls (avoid rate-limit)
                 time.sleep(1)
 
+            for mapped_status, order_ids in moves.items():
+                with transaction.atomic():
+                    moved = transition_orders(order_ids, mapped_status, source="tracking")
+                    transition_items(
+                        OrderItem.objects.filter(order_id__in=order_ids), mapped_status, source="tracking"
+                    )
+                logger.info(f"✅ {len(moved)} orders → {mapped_status}")
+
             logger.info("✅ Shipment status update cycle completed.")
 
         except Exception as e:
@@ -86,12 +91,13 @@ def apply_commission_cron(request):
 
     # 2️⃣ Fetch eligible ORDER ITEMS
     items = OrderItem.objects.select_related(
-        "order", "product_variant", "promoter"
+        "order", "promoter"
     ).filter(
         order__is_paid=True,
         promoter__isnull=False,
         is_commission_applied=False,
-        status=OrderItemStatus.DELIVERED
+        status=OrderItemStatus.DELIVERED,
+        archived_at__isnull=True,
     )
 
     logger.warning(f"[CRON] Found {items.count()} items pending commission")
@@ -100,7 +106,6 @@ def apply_commission_cron(request):
 
     for item in items:
         order = item.order
-        pv = item.product_variant
         promoter = item.promoter
 
         logger.warning(f"[ITEM] Checking item {item.id} (Order {order.id})")
@@ -108,14 +113,14 @@ def apply_commission_cron(request):
         # 3️⃣ Check return eligibility
         commission_due = False
 
-        if not pv.allow_return:
+        if not item.allow_return:
             commission_due = True
         else:
             if not order.delivered_at:
                 continue
 
             delivered_date = order.delivered_at.date()
-            return_days = pv.return_days or 0
+            return_days = item.return_days or 0
             return_end_date = delivered_date + timedelta(days=return_days)
 
             if date.today() >= return_end_date:
@@ -146,3 +151,31 @@ def apply_commission_cron(request):
         "status": "success",
         "applied_items": applied_count
     })
+
+
+def release_reservations_cron(request):
+    """Cron hook for the stock reservation sweeper (same X-CRON-KEY as above)."""
+    from orders.reservations import release_expired_reservations
+
+    secret = request.headers.get("X-CRON-KEY")
+    if secret != settings.CRON_SECRET_KEY:
+        logger.warning("[CRON] Unauthorized request")
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+
+    released = release_expired_reservations()
+    logger.warning(f"[CRON] Released {released} expired stock reservations")
+    return JsonResponse({"status": "success", "released": released})
+
+
+def process_webhooks_cron(request):
+    """Cron hook that retries Razorpay webhook events left unprocessed."""
+    from orders.webhooks import process_pending_webhook_events
+
+    secret = request.headers.get("X-CRON-KEY")
+    if secret != settings.CRON_SECRET_KEY:
+        logger.warning("[CRON] Unauthorized request")
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+
+    results = process_pending_webhook_events()
+    logger.warning(f"[CRON] Webhook events processed: {results}")
+    return JsonResponse({"status": "success", "results": results})
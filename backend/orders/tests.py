@@ -1,3 +1,1155 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .delivery_cache import QuoteCache, DeliveryQuoteError, weight_slab
+from .delhivery import DelhiveryClient, CircuitBreaker, CircuitOpenError
+from .fake_delhivery import FakeDelhiveryServer
+from .gateway import FakePaymentGateway, RazorpayGateway, set_payment_gateway
+from .models import PincodeServiceability, Order, ShippingAddress, UnusedGatewayOrder, StockReservation, IdempotencyKey, RazorpayWebhookEvent
+from .parallel import fetch_concurrently
+
+
+# =====================================================
+# SHARED FIXTURES
+# =====================================================
+def make_user(email, first_name="Test", last_name="Buyer", role=None):
+    user = get_user_model().objects.create_user(email, first_name, last_name, "pass1234")
+    if role:
+        get_user_model().objects.filter(pk=user.pk).update(role=role)
+        user.refresh_from_db()
+    return user
+
+
+def make_address(user, **fields):
+    """An Ooty (643001) address for `user`; pass fields to change any of it."""
+    fields = {
+        "full_name": user.first_name, "phone_number": "9876543210",
+        "address": "1 Main Road", "city": "Ooty", "state": "Tamil Nadu", "postal_code": "643001", **fields,
+    }
+    return ShippingAddress.objects.create(user=user, **fields)
+
+
+def make_product(name, category="Tea"):
+    from products.models import Category, Product
+
+    return Product.objects.create(category=Category.objects.get_or_create(name=category)[0], name=name, description=name)
+
+
+def make_variant(product, sku, base_price, variant_name="250g", stock=10, **fields):
+    from products.models import ProductVariant
+
+    return ProductVariant.objects.create(
+        product=product, variant_name=variant_name, sku=sku, stock=stock, base_price=Decimal(base_price), **fields
+    )
+
+
+def make_customer_order(user, address, variants, order_number, quantity=1):
+    """Order for one of each variant (x quantity), built by checkout's create_order_with_items."""
+    from .utils import create_order_with_items
+
+    order, _, _ = create_order_with_items(
+        user=user, items=[{"product_variant_id": v.id, "quantity": quantity} for v in variants],
+        shipping_address=address, payment_method="Razorpay",
+        order_number=order_number, delivery_charge=Decimal("0.00"),
+    )
+    return order
+
+
+class DeliveryQuoteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_weight_is_normalized_to_billing_slab(self):
+        self.assertEqual(weight_slab(1), 500)
+        self.assertEqual(weight_slab(500), 500)
+        self.assertEqual(weight_slab(501), 1000)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        quotes = QuoteCache(ttl=60, stale_ttl=60)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"charge": 80}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(quotes.get("k", fetch)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"charge": 80}] * 5)
+
+    def test_stale_value_served_when_refresh_fails(self):
+        quotes = QuoteCache(ttl=0, stale_ttl=60)
+        quotes.set("k", {"charge": 80})
+
+        def failing_fetch():
+            raise DeliveryQuoteError("down")
+
+        self.assertEqual(quotes.get("k", failing_fetch), {"charge": 80})
+
+    def test_empty_delhivery_reply_is_not_cached_as_free_delivery(self):
+        from .utils import _fetch_return_charge, get_delivery_charge
+
+        client = mock.Mock()
+        client.get.return_value = mock.Mock(status_code=200, json=lambda: [])
+        with mock.patch("orders.utils.get_delhivery_client", return_value=client), \
+                mock.patch("orders.utils.local_delivery_quote", return_value=None):
+            self.assertEqual(get_delivery_charge("643212", "600001", 500)["charge"], 0)  # fallback
+            with self.assertRaises(DeliveryQuoteError):
+                _fetch_return_charge("600001", "643212", 500, "Pre-paid")
+
+            client.get.return_value = mock.Mock(status_code=200, json=lambda: [{"total_amount": 80}])
+            self.assertEqual(get_delivery_charge("643212", "600001", 500)["charge"], 80)
+
+
+class ConcurrentFetchTests(SimpleTestCase):
+    def test_calls_overlap_and_slow_ones_fall_back(self):
+        def slow(value, delay):
+            time.sleep(delay)
+            return value
+
+        outcome = fetch_concurrently(
+            {
+                "charge": (slow, ("charge", 0.1), {}),
+                "tat": (slow, ("tat", 0.1), {}),
+                "stuck": (slow, ("stuck", 1), {}),
+            },
+            deadline=0.3,
+            defaults={"stuck": None},
+        )
+
+        self.assertLess(outcome["elapsed"], 0.5)
+        self.assertEqual(outcome["results"], {"charge": "charge", "tat": "tat", "stuck": None})
+        self.assertEqual(outcome["timed_out"], ["stuck"])
+
+
+class PincodeDirectoryTests(TestCase):
+    sample = Path(__file__).parent / "data" / "delhivery_pincodes_sample.json"
+
+    def setUp(self):
+        call_command("refresh_pincodes", file=str(self.sample), stdout=StringIO())
+
+    def test_refresh_stores_flags_zones_and_tat(self):
+        ooty = PincodeServiceability.objects.get(pin="643001")
+        self.assertEqual((ooty.zone, ooty.tat_days), ("B", 2))
+        self.assertEqual(PincodeServiceability.objects.get(pin="781001").zone, "E")
+        self.assertEqual(PincodeServiceability.objects.get(pin="110001").zone, "D")
+        self.assertFalse(PincodeServiceability.objects.get(pin="194101").is_serviceable)
+
+    def test_check_pincode_is_answered_locally(self):
+        client = APIClient()
+        client.force_authenticate(make_user("pin@example.com"))
+        with mock.patch("orders.delhivery.DelhiveryClient.request") as live:
+            response = client.get("/api/check-pincode/643001/")
+        live.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        code = response.json()["delivery_codes"][0]["postal_code"]
+        self.assertEqual((code["pre_paid"], code["tat_days"]), ("Y", 2))
+
+    def test_checkout_rejects_non_serviceable_pincode(self):
+        from rest_framework.exceptions import ValidationError
+        from .pincodes import ensure_pincode_serviceable
+
+        with self.assertRaises(ValidationError):
+            ensure_pincode_serviceable("194101")
+        self.assertIsNone(ensure_pincode_serviceable("999999"))
+
+
+
+class RateCardPricingTests(TestCase):
+    pincodes = Path(__file__).parent / "data" / "delhivery_pincodes_sample.json"
+    rate_card = Path(__file__).parent / "data" / "delhivery_rate_card_sample.csv"
+
+    def setUp(self):
+        cache.clear()
+        call_command("refresh_pincodes", file=str(self.pincodes), stdout=StringIO())
+        call_command("import_rate_card", file=str(self.rate_card), stdout=StringIO())
+
+    def test_forward_return_and_oda_priced_locally(self):
+        from .utils import get_delivery_charge, get_delhivery_return_charge
+
+        with mock.patch("orders.utils._fetch_delivery_charge") as live, \
+                mock.patch("orders.utils._fetch_return_charge") as live_return:
+            # Ooty is zone B from the Gudalur pickup: 36 + 2 x 33, plus 18% GST
+            forward = get_delivery_charge("643212", "643001", weight_grams=1200)
+            returned = get_delhivery_return_charge("643001", "643212", weight_grams=1200)
+            oda = get_delivery_charge("643212", "781001", weight_grams=400)
+
+        live.assert_not_called()
+        live_return.assert_not_called()
+        self.assertEqual((forward["charge"], forward["charged_weight"], forward["source"]), (120.36, 1500, "ratecard"))
+        self.assertEqual(returned, Decimal("136.88"))
+        self.assertEqual(oda["charge"], 118.0)
+
+    def test_falls_back_to_live_when_not_priceable(self):
+        from .utils import get_delivery_charge
+
+        with mock.patch("orders.utils._fetch_delivery_charge", return_value={"charge": 99}) as live:
+            self.assertEqual(get_delivery_charge("643212", "999999", weight_grams=500)["charge"], 99)
+            self.assertEqual(get_delivery_charge("643212", "643001", payment_type="COD")["charge"], 99)
+            with override_settings(DELIVERY_PRICING="live"):
+                get_delivery_charge("643212", "560001", weight_grams=500)
+        self.assertEqual(live.call_count, 3)
+
+    def test_verification_deactivates_drifted_rows(self):
+        from .models import DeliveryRateCard
+        from .ratecard import verify_rate_card
+
+        def live(kind, pin, grams):
+            from .ratecard import price_shipment, RATE_FIELDS
+            entry = PincodeServiceability.objects.get(pin=pin)
+            card = DeliveryRateCard.objects.get(kind=kind, zone=entry.zone)
+            rate = {f: getattr(card, f) for f in RATE_FIELDS}
+            exact = Decimal(str(price_shipment(rate, kind, grams, is_oda=entry.is_oda)["charge"]))
+            return exact + (Decimal("5.00") if card.zone == "D" and kind == "forward" else 0)
+
+        with mock.patch("orders.ratecard._live_charge", side_effect=live):
+            findings = verify_rate_card(per_zone=1, weights=(500,), apply=True)
+
+        self.assertEqual([(f["kind"], f["zone"]) for f in findings if f["deactivated"]], [("forward", "D")])
+        self.assertFalse(DeliveryRateCard.objects.get(kind="forward", zone="D").is_active)
+        self.assertIsNotNone(DeliveryRateCard.objects.get(kind="forward", zone="B").verified_at)
+
+
+class DelhiveryClientTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = FakeDelhiveryServer().start()
+        self.addCleanup(self.fake.stop)
+
+    def client_for_fake(self, **kwargs):
+        kwargs.setdefault("backoff", 0)
+        return DelhiveryClient(token="test-token", base_url=self.fake.url, **kwargs)
+
+    def test_get_retries_transient_errors_over_one_session(self):
+        client = self.client_for_fake(retries=2)
+        self.fake.fail_next(2, status=503)
+
+        response = client.get("/api/dc/expected_tat", params={"origin_pin": "643212"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.fake.requests), 3)
+        self.assertEqual(self.fake.requests[-1]["headers"]["Authorization"], "Token test-token")
+
+    def test_post_is_not_retried_unless_idempotent(self):
+        client = self.client_for_fake(retries=2)
+        self.fake.fail_next(1, status=503)
+
+        self.assertEqual(client.post("/api/cmu/create.json", data={"format": "json"}).status_code, 503)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_breaker_fails_fast_once_open(self):
+        client = self.client_for_fake(retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        self.fake.fail_next(2, status=500)
+        client.get("/api/dc/expected_tat")
+        client.get("/api/dc/expected_tat")
+
+        with self.assertRaises(CircuitOpenError):
+            client.get("/api/dc/expected_tat")
+        self.assertEqual(len(self.fake.requests), 2)
+
+    def test_failed_half_open_trial_of_any_kind_releases_the_breaker(self):
+        import requests
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        client = self.client_for_fake(retries=0, breaker=breaker)
+        breaker.record_failure()  # open; half-open right away with reset_timeout=0
+
+        with mock.patch.object(client.session, "request", side_effect=requests.exceptions.ChunkedEncodingError("cut")):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                client.get("/api/dc/expected_tat")
+
+        self.assertEqual(client.get("/api/dc/expected_tat").status_code, 200)
+        self.assertEqual(breaker.state, "closed")
+
+
+class TwoPhaseCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = make_user("buyer@example.com", "Buyer")
+        self.address = make_address(self.user)
+        self.variant = make_variant(make_product("Green Tea"), "GT-250", "100.00")
+        self.gateway = FakePaymentGateway()
+        set_payment_gateway(self.gateway)
+        self.addCleanup(set_payment_gateway, None)
+        patches = [
+            mock.patch("orders.helpers.get_delivery_charge", return_value={"charge": 50}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def checkout(self, **kwargs):
+        from .helpers import process_checkout
+
+        kwargs.setdefault("shipping_address_input", self.address.id)
+        return process_checkout(
+            user=self.user,
+            items=[{"product_variant_id": self.variant.id, "quantity": 2}],
+            payment_method="Razorpay",
+            **kwargs,
+        )
+
+    def quote(self, quantity=2, pin="643001"):
+        from .quotes import issue_quote_token
+
+        lines = [{"product_variant_id": self.variant.id, "quantity": quantity, "unit_price": Decimal("100.00")}]
+        return issue_quote_token(self.user, pin, lines, Decimal("70.00"), Decimal("0.00"), 4)
+
+    def test_gateway_order_created_before_commit_and_attached(self):
+        result = self.checkout()
+
+        order = Order.objects.get(pk=result["order"].pk)
+        self.assertEqual(order.total, Decimal("250.00"))
+        gateway_order = self.gateway.orders[order.razorpay_order_id]
+        self.assertEqual(gateway_order["receipt"], f"order_rcptid_{order.order_number}")
+        self.assertEqual(gateway_order["amount"], 25000)
+        self.assertFalse(UnusedGatewayOrder.objects.exists())
+
+    def test_matching_quote_token_skips_delivery_call(self):
+        from . import helpers
+
+        result = self.checkout(quote_token=self.quote())
+
+        self.assertFalse(helpers.get_delivery_charge.called)
+        self.assertEqual(result["order"].total, Decimal("270.00"))
+
+    def test_stale_or_tampered_quote_token_is_ignored(self):
+        from . import helpers
+
+        for token in (self.quote(quantity=3), self.quote(pin="560001"), self.quote()[:-2] + "xx"):
+            Order.objects.all().delete()
+            result = self.checkout(quote_token=token)
+            self.assertEqual(result["order"].total, Decimal("250.00"))
+        self.assertEqual(helpers.get_delivery_charge.call_count, 3)
+
+    def test_unpaid_order_reused_by_fingerprint(self):
+        first = self.checkout(checkout_session_id="tab-1")["order"]
+        again = self.checkout(checkout_session_id="tab-2")["order"]
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(len(Order.objects.get(pk=first.pk).order_fingerprint), 64)
+
+        other_address = make_address(self.user, address="9 Hill Road")
+        elsewhere = self.checkout(checkout_session_id="tab-3", shipping_address_input=other_address.id)
+        self.assertNotEqual(elsewhere["order"].pk, first.pk)
+
+    def test_failed_commit_records_unused_gateway_order(self):
+        with mock.patch("orders.helpers.create_order_with_items", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.checkout()
+
+        self.assertFalse(Order.objects.exists())
+        unused = UnusedGatewayOrder.objects.get()
+        self.assertEqual(unused.amount, Decimal("250.00"))
+        self.assertIn("db down", unused.reason)
+
+
+class BulkOrderBuildTests(TestCase):
+    def setUp(self):
+        self.user = make_user("bulk@example.com", "Bulk")
+        self.address = make_address(self.user)
+        product = make_product("Pepper", "Spices")
+        self.variants = [make_variant(product, f"PP-{n}", 10 * n, f"{n}g") for n in range(1, 9)]
+
+    def build(self, count):
+        from .utils import create_order_with_items
+
+        items = [{"product_variant_id": v.id, "quantity": 1} for v in self.variants[:count]]
+        return create_order_with_items(
+            user=self.user, items=items, shipping_address=self.address,
+            payment_method="Razorpay", order_number=f"ORD-BULK-{count}", delivery_charge=Decimal("0.00"),
+        )
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # order insert, timeline "placed" event, variant lookup, items bulk insert, totals update
+        with self.assertNumQueries(5):
+            order, _, _ = self.build(2)
+        with self.assertNumQueries(5):
+            big_order, _, data = self.build(8)
+
+        self.assertEqual(big_order.items.count(), 8)
+        self.assertEqual(big_order.subtotal, Decimal("360.00"))
+        self.assertEqual(len(data), 8)
+
+    def test_items_keep_catalog_snapshot(self):
+        from products.models import ProductVariantImage
+        from .serializers import OrderItemSerializer
+
+        ProductVariantImage.objects.create(variant=self.variants[0], image_url="https://img.example.com/pp-1.jpg")
+        order, _, _ = self.build(1)
+
+        variant = self.variants[0]
+        variant.product.name = "Black Pepper"
+        variant.product.save()
+        variant.variant_name, variant.sku, variant.allow_return = "1 gram", "PP-ONE", not variant.allow_return
+        variant.save()
+
+        item = order.items.get()
+        self.assertEqual(
+            (item.product_name, item.variant_name, item.sku, item.thumbnail_url),
+            ("Pepper", "1g", "PP-1", "https://img.example.com/pp-1.jpg"),
+        )
+        self.assertEqual(item.allow_return, not variant.allow_return)
+        with self.assertNumQueries(0):
+            data = OrderItemSerializer(item).data
+        self.assertEqual(data["product_variant"]["product_name"], "Pepper")
+        self.assertEqual(data["product_variant"]["variant_name"], "1g")
+
+
+class OrderAggregateTests(TestCase):
+    def setUp(self):
+        self.user = make_user("sums@example.com", "Sums")
+        product = make_product("Wild Honey", "Honey")
+        variants = [
+            make_variant(product, f"WH-{n}", Decimal(n) / 2, f"{n}g", weight=Decimal(n) / 1000)
+            for n in (250, 500, 1000)
+        ]
+        self.order = make_customer_order(self.user, make_address(self.user), variants, "ORD-SUMS-1", quantity=2)
+
+    def aggregates(self):
+        from .aggregates import AGGREGATE_FIELDS
+
+        return Order.objects.filter(pk=self.order.pk).values(*AGGREGATE_FIELDS).get()
+
+    def test_checkout_stores_aggregates(self):
+        self.assertEqual(self.aggregates(), {
+            "item_count": 3, "active_item_count": 3, "cancelled_item_count": 0, "returned_item_count": 0,
+            "total_weight_grams": 3500, "refundable_amount": Decimal("0.00"),
+        })
+        order = Order.objects.get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.weight_total, 3500)
+            self.assertFalse(order.is_partially_cancelled)
+            self.assertFalse(order.is_fully_cancelled)
+
+    def test_item_changes_keep_aggregates_current(self):
+        from .aggregates import refresh_order_aggregates
+        from .transitions import transition_items
+
+        Order.objects.filter(pk=self.order.pk).update(is_paid=True)
+        refresh_order_aggregates([self.order.pk])
+        self.assertEqual(self.aggregates()["refundable_amount"], Decimal("1750.00"))
+
+        small, medium, large = self.order.items.order_by("pk")
+        transition_items([small.pk], "cancelled", fields={"refund_amount": Decimal("250.00")})
+        transition_items([medium.pk, large.pk], "delivered")
+        transition_items([medium.pk], "return_initiated")
+        self.assertEqual(self.aggregates(), {
+            "item_count": 3, "active_item_count": 2, "cancelled_item_count": 1, "returned_item_count": 1,
+            "total_weight_grams": 3000, "refundable_amount": Decimal("1500.00"),
+        })
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(order.is_partially_cancelled)
+        self.assertEqual(Order.objects.filter(cancelled_item_count__gt=0, refundable_amount__gte=1000).count(), 1)
+
+        large.delete()
+        self.assertEqual(self.aggregates()["item_count"], 2)
+        self.assertEqual(self.aggregates()["total_weight_grams"], 1000)
+
+
+class OrderStateMachineTests(TestCase):
+    def setUp(self):
+        from .models import OrderItem
+
+        self.user = make_user("fsm@example.com", "Fsm")
+        address = make_address(self.user)
+        variant = make_variant(make_product("Green Tea"), "GT-100", "80.00", "100g", stock=100)
+        self.orders = []
+        for n in range(12):
+            order = Order.objects.create(
+                user=self.user, shipping_address=address, status="processing", is_paid=True,
+                order_number=f"ORD-FSM-{n}", waybill=f"WB{n}", subtotal=Decimal("80.00"), total=Decimal("80.00"),
+            )
+            OrderItem.objects.create(order=order, product_variant=variant, quantity=1, price=Decimal("80.00"))
+            self.orders.append(order)
+
+    def test_bulk_transition_is_one_update_and_one_event(self):
+        from .transitions import status_transitioned, transition_orders
+
+        events = []
+        handler = lambda sender, **kwargs: events.append(kwargs)
+        status_transitioned.connect(handler, sender=Order)
+        self.addCleanup(status_transitioned.disconnect, handler, sender=Order)
+
+        Order.objects.filter(pk=self.orders[0].pk).update(status="delivered")
+        # savepoint, select for update, update, timeline insert, release; notifications run on commit
+        with self.assertNumQueries(5):
+            moved = transition_orders(Order.objects.filter(order_number__startswith="ORD-FSM"), "in_transit")
+
+        self.assertEqual(len(moved), 11)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["to_status"], "in_transit")
+        self.assertEqual(Order.objects.filter(status="in_transit").count(), 11)
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).status, "delivered")
+
+        # already there: nothing to do, no event
+        self.assertEqual(transition_orders([o.pk for o in self.orders[1:]], "in_transit"), [])
+        self.assertEqual(len(events), 1)
+
+    def test_invalid_transitions_skip_or_raise(self):
+        from .transitions import InvalidTransition, transition_items, transition_orders
+
+        Order.objects.filter(pk=self.orders[0].pk).update(status="cancelled")
+        with self.assertRaises(InvalidTransition) as ctx:
+            transition_orders([self.orders[0].pk, self.orders[1].pk], "delivered", strict=True)
+        self.assertEqual(ctx.exception.rejected, [(self.orders[0].pk, "cancelled")])
+        self.assertEqual(Order.objects.filter(status="delivered").count(), 0)
+
+        moved = transition_orders([self.orders[0].pk, self.orders[1].pk], "delivered")
+        self.assertEqual(moved, [(self.orders[1].pk, "processing")])
+        self.assertIsNotNone(Order.objects.get(pk=self.orders[1].pk).delivered_at)
+
+        with self.assertRaises(ValueError):
+            transition_items([1], "shipped")
+
+    def test_item_delivery_notifies_per_item_once(self):
+        from .models import Notification, OrderItem
+        from .transitions import transition_items
+
+        items = OrderItem.objects.filter(order__in=self.orders[:2])
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                transition_items(items, "delivered")
+        self.assertEqual(Notification.objects.filter(event="item_delivered").count(), items.count())
+
+    def test_webhook_moves_order_and_items_and_notifies_once(self):
+        from .models import Notification, OrderItem
+
+        client = APIClient()
+        for scan in ("in transit", "in transit"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post("/api/webhook/delhivery/", {
+                    "Shipment": {"AWB": "WB3", "Status": scan, "Status Type": "UD"},
+                }, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(response.json()["processed"][0]["transitioned"], False)
+        self.assertEqual(Order.objects.get(waybill="WB3").status, "in_transit")
+        self.assertEqual(OrderItem.objects.get(order__waybill="WB3").status, "in_transit")
+        self.assertEqual(Notification.objects.filter(event="order_shipped").count(), 1)
+
+        # a late "manifested" scan cannot move it back
+        client.post("/api/webhook/delhivery/", {
+            "Shipment": {"AWB": "WB3", "Status": "manifested", "Status Type": "UD"},
+        }, format="json")
+        self.assertEqual(Order.objects.get(waybill="WB3").status, "in_transit")
+
+    def test_rollup_from_items(self):
+        from .models import OrderItem
+        from .transitions import rollup_order_status
+
+        OrderItem.objects.filter(order__in=self.orders[:3]).update(status="cancelled")
+        OrderItem.objects.filter(order__in=self.orders[3:5]).update(status="delivered")
+        with self.assertNumQueries(2 + 5 * 2):  # statuses, then one transition per target status
+            moved = rollup_order_status([o.pk for o in self.orders])
+
+        self.assertEqual(len(moved), 5)
+        self.assertEqual(Order.objects.filter(status="cancelled").count(), 3)
+        self.assertEqual(Order.objects.filter(status="delivered").count(), 2)
+        self.assertEqual(Order.objects.filter(status="processing").count(), 7)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Notification, OrderItem, ReturnRequest
+
+        self.user = make_user("old@example.com", "Old")
+        address = make_address(self.user)
+        variant = make_variant(make_product("Wild Honey", "Honey"), "WH-500", "300.00", "500g")
+        long_ago = timezone.now() - timezone.timedelta(days=400)
+
+        def order(number, status, delivered_at=None):
+            o = Order.objects.create(
+                user=self.user, shipping_address=address, status=status, is_paid=True, order_number=number,
+                delivered_at=delivered_at, subtotal=Decimal("300.00"), total=Decimal("300.00"),
+            )
+            OrderItem.objects.create(order=o, product_variant=variant, quantity=1, price=Decimal("300.00"), status=status)
+            return o
+
+        self.old = order("ORD-OLD-1", "delivered", long_ago)
+        self.claimed = order("ORD-OLD-2", "delivered", long_ago)
+        self.recent = order("ORD-NEW-1", "delivered", timezone.now())
+        self.open = order("ORD-OLD-3", "processing")
+        Order.objects.filter(pk=self.open.pk).update(updated_at=long_ago)
+        ReturnRequest.objects.create(order=self.claimed, user=self.user, reason="Damaged")
+        # the delivered email sent by the post_save receiver
+        self.sent = Notification.objects.get(order=self.old)
+        Notification.objects.filter(pk=self.sent.pk).update(created_at=long_ago)
+        self.long_ago = long_ago
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archive_moves_closed_history_out_of_hot_set(self):
+        from .models import ArchivedNotification, Notification, OrderItem
+
+        out = StringIO()
+        call_command("archive_orders", stdout=out)
+        self.assertIn("Archived 1 orders and 1 notifications", out.getvalue())
+
+        self.assertEqual(list(Order.objects.archived().values_list("order_number", flat=True)), ["ORD-OLD-1"])
+        self.assertEqual(OrderItem.objects.filter(archived_at__isnull=False).count(), 1)
+        self.assertFalse(Notification.objects.filter(order=self.old).exists())
+        self.assertEqual(ArchivedNotification.objects.get().original_id, self.sent.pk)
+
+        # still readable through the same endpoints
+        listed = self.client.get("/api/orders/").json()
+        self.assertEqual(listed["count"], 4)
+        recent = self.client.get("/api/orders/?archived=false").json()
+        self.assertNotIn("ORD-OLD-1", [o["order_number"] for o in recent["results"]])
+        detail = self.client.get("/api/order-detail/ORD-OLD-1/")
+        self.assertEqual(detail.status_code, 200)
+
+        # saving an archived order does not resend its notifications
+        Order.objects.get(pk=self.old.pk).save()
+        self.assertFalse(Notification.objects.filter(order=self.old).exists())
+
+    def test_restore_brings_notifications_back(self):
+        from .archive import archive_orders, restore_orders
+        from .models import ArchivedNotification, Notification
+
+        archive_orders()
+        self.assertEqual(restore_orders(["ORD-OLD-1"]), 1)
+
+        self.assertFalse(Order.objects.archived().exists())
+        self.assertFalse(ArchivedNotification.objects.exists())
+        restored = Notification.objects.get(order=self.old)
+        self.assertEqual((restored.pk, restored.event, restored.created_at), (self.sent.pk, "order_delivered", self.long_ago))
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command("archive_orders", "--dry-run", stdout=out)
+        self.assertIn("1 orders closed before", out.getvalue())
+        self.assertFalse(Order.objects.archived().exists())
+
+    def test_return_opened_after_selection_keeps_order_hot(self):
+        from django.utils import timezone
+        from .archive import _archive_batch, archivable_orders, archive_cutoff
+        from .models import ReturnRequest
+
+        cutoff = archive_cutoff()
+        candidates = list(archivable_orders(cutoff).values_list("pk", flat=True))
+        self.assertEqual(candidates, [self.old.pk])
+        ReturnRequest.objects.create(order=self.old, user=self.user, reason="Late claim")
+
+        self.assertEqual(_archive_batch(candidates, cutoff, timezone.now()), (0, 0))
+        self.assertFalse(Order.objects.archived().exists())
+
+
+class OrderTimelineTests(TestCase):
+    def setUp(self):
+        self.user = make_user("story@example.com", "Story")
+        self.admin = make_user("story-admin@example.com", "Ad", "Min", role="admin")
+        variant = make_variant(make_product("Fig Jam", "Jam"), "FJ-200", "120.00", "200g")
+        self.order = make_customer_order(self.user, make_address(self.user), [variant], "ORD-STORY-1", quantity=2)
+        self.client = APIClient()
+
+    def timeline(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(f"/api/orders/{self.order.order_number}/timeline/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["events"]
+
+    def test_history_is_written_as_it_happens(self):
+        from .models import OrderEvent, Refund
+        from .transitions import transition_items, transition_orders
+
+        Order.objects.filter(pk=self.order.pk).update(status="processing")
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_items(self.order.items.all(), "processing", actor=self.admin, source="packing")
+            transition_orders([self.order.pk], "delivered", source="tracking")
+        refund = Refund.objects.create(order=self.order, amount=Decimal("240.00"))
+        refund.status = "processed"
+        refund.save()
+        refund.save()  # no change, no event
+
+        customer = [(e["kind"], e["code"]) for e in self.timeline(self.user)]
+        self.assertEqual(customer, [
+            ("placed", "pending"), ("item_status", "processing"), ("status", "delivered"),
+            ("refund", "pending"), ("refund", "processed"),
+        ])
+
+        admin = self.timeline(self.admin)
+        self.assertIn(("notification", "order_delivered"), [(e["kind"], e["code"]) for e in admin])
+        packed = next(e for e in admin if e["kind"] == "item_status")
+        self.assertEqual((packed["actor"], packed["previous"], packed["source"]),
+                         ("story-admin@example.com", "pending", "packing"))
+
+        with self.assertRaises(ValueError):
+            OrderEvent.objects.first().save()
+
+    def test_endpoint_is_one_range_scan_and_private(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .timeline import record_event
+
+        for n in range(20):
+            record_event(self.order, "shipment_scan", "in transit", f"scan {n}")
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/api/orders/{self.order.order_number}/timeline/")
+        event_queries = [q["sql"] for q in queries if "orders_orderevent" in q["sql"]]
+        self.assertEqual(len(event_queries), 1)
+
+        stranger = make_user("nosy@example.com")
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(f"/api/orders/{self.order.order_number}/timeline/").status_code, 404)
+
+
+class OrderSearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user("finder@example.com", "Fin", "Der")
+        self.other = make_user("other@example.com", "Oth", "Er")
+        self.admin = make_user("finder-admin@example.com", "Ad", "Min", role="admin")
+        self.variants = [
+            make_variant(make_product(name), sku, "100.00")
+            for name, sku in (("Nilgiri Green Tea", "NG-250"), ("Masala Chai", "MC-250"))
+        ]
+        self.orders = {}
+        for n, (user, variant) in enumerate(((self.user, self.variants[0]), (self.user, self.variants[1]),
+                                             (self.other, self.variants[0]))):
+            address = make_address(user, full_name=f"{user.first_name} Home", phone_number=f"+91 98765 4321{n}")
+            self.orders[n] = make_customer_order(user, address, [variant], f"ORD-FIND-{n}")
+        self.client = APIClient()
+
+    def search(self, user, url, query):
+        self.client.force_authenticate(user)
+        response = self.client.get(url, {"search": query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row["order_number"] for row in response.json()["results"])
+
+    def test_customer_finds_own_orders_by_product_sku_and_number(self):
+        self.assertEqual(self.search(self.user, "/api/orders/", "green tea"), ["ORD-FIND-0"])
+        self.assertEqual(self.search(self.user, "/api/orders/", "mc-250"), ["ORD-FIND-1"])
+        self.assertEqual(self.search(self.user, "/api/orders/", "ord-find"), ["ORD-FIND-0", "ORD-FIND-1"])
+        self.assertEqual(self.search(self.user, "/api/orders/", "ORD-FIND-2"), [])
+
+    def test_admin_searches_by_customer_and_phone(self):
+        self.assertEqual(self.search(self.admin, "/api/admin/orders/", "9876543212"), ["ORD-FIND-2"])
+        self.assertEqual(self.search(self.admin, "/api/admin/orders/", "finder@example.com nilgiri"), ["ORD-FIND-0"])
+
+    def test_documents_follow_changes_after_commit(self):
+        order = self.orders[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            order.waybill = "WB123456"
+            order.save(update_fields=["waybill"])
+        self.assertEqual(self.search(self.user, "/api/orders/", "wb123456"), ["ORD-FIND-0"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.phone_number = "9123456789"
+            self.other.save()
+        self.assertEqual(self.search(self.admin, "/api/admin/orders/", "9123456789"), ["ORD-FIND-2"])
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = make_user("hold@example.com", "Hold")
+        product = make_product("Filter Coffee", "Coffee")
+        self.scarce = make_variant(product, "FC-1K", "500.00", "1kg", stock=1)
+        self.plenty = make_variant(product, "FC-250", "150.00")
+        self.order = make_customer_order(self.user, make_address(self.user), [self.plenty], "ORD-HOLD-1")
+
+    def stock(self, variant):
+        variant.refresh_from_db()
+        return variant.stock
+
+    def test_reserve_is_all_or_nothing(self):
+        from rest_framework.exceptions import ValidationError
+        from .reservations import reserve_stock
+
+        with self.assertRaises(ValidationError) as ctx:
+            reserve_stock(self.order, [(self.plenty.id, 3), (self.scarce.id, 2)])
+
+        self.assertEqual(ctx.exception.detail["out_of_stock_variant_ids"], [str(self.scarce.id)])
+        self.assertEqual(self.stock(self.plenty), 10)
+        self.assertEqual(self.stock(self.scarce), 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservations_are_swept_back_into_stock(self):
+        from django.utils import timezone
+        from .reservations import reserve_stock
+
+        reserve_stock(self.order, [(self.plenty.id, 3), (self.scarce.id, 1)])
+        self.assertEqual(self.stock(self.scarce), 0)
+
+        StockReservation.objects.update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        out = StringIO()
+        call_command("release_expired_reservations", stdout=out)
+
+        self.assertIn("Released 2", out.getvalue())
+        self.assertEqual(self.stock(self.scarce), 1)
+        self.assertEqual(self.stock(self.plenty), 10)
+        self.assertEqual(
+            set(StockReservation.objects.values_list("status", flat=True)), {StockReservation.EXPIRED}
+        )
+
+    def test_commit_retakes_expired_lines_and_cancel_releases(self):
+        from .reservations import reserve_stock, release_expired_reservations, commit_reservations, release_for_items
+        from django.utils import timezone
+
+        reserve_stock(self.order, [(self.plenty.id, 1)])
+        release_expired_reservations(now=timezone.now() + timezone.timedelta(days=1))
+        self.assertEqual(self.stock(self.plenty), 10)
+
+        self.assertEqual(commit_reservations(self.order), [])
+        self.assertEqual(self.stock(self.plenty), 9)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.COMMITTED)
+
+        release_for_items(self.order, list(self.order.items.all()))
+        self.assertEqual(self.stock(self.plenty), 10)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.RELEASED)
+
+
+class IdempotencyKeyTests(TestCase):
+    url = "/api/checkout/buy-now/"
+
+    def setUp(self):
+        self.user = make_user("idem@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.body = {"items": [{"product_variant_id": 1, "quantity": 1}], "payment_method": "Razorpay", "shipping_address_id": 1}
+        patcher = mock.patch("orders.views.process_checkout", return_value={"response": {"order_number": "ORD-1"}})
+        self.process_checkout = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body, key="key-1"):
+        return self.client.post(self.url, body, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_rerunning(self):
+        first = self.post(self.body)
+        second = self.post(self.body)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), {"order_number": "ORD-1"})
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(self.process_checkout.call_count, 1)
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self.post(self.body)
+        other = dict(self.body, items=[{"product_variant_id": 1, "quantity": 2}])
+
+        self.assertEqual(self.post(other).status_code, 422)
+        self.assertEqual(self.process_checkout.call_count, 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_of_in_flight_request_does_not_run(self):
+        self.post(self.body, key="warmup")
+        IdempotencyKey.objects.create(
+            user=self.user, scope="checkout", key="key-2",
+            fingerprint=IdempotencyKey.objects.get(key="warmup").fingerprint,
+        )
+
+        response = self.post(self.body, key="key-2")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.process_checkout.call_count, 1)
+
+    def test_failed_request_frees_the_key(self):
+        self.process_checkout.side_effect = RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            self.post(self.body)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET="whsec_test")
+class RazorpayWebhookTests(TestCase):
+    url = "/api/payments/razorpay/webhook/"
+
+    def setUp(self):
+        user = make_user("hook@example.com", "Hook")
+        variant = make_variant(make_product("Jam", "Jam"), "JM-200", "120.00", "200g", stock=5)
+        self.order = make_customer_order(user, make_address(user), [variant], "ORD-HOOK-1")
+        Order.objects.filter(pk=self.order.pk).update(razorpay_order_id="order_hook1")
+        self.client = APIClient()
+
+    def deliver(self, payload, event_id="evt_1", signature=None):
+        import json
+        from .webhooks import sign_webhook_payload
+
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            self.url, body, content_type="application/json",
+            HTTP_X_RAZORPAY_SIGNATURE=signature or sign_webhook_payload(body),
+            HTTP_X_RAZORPAY_EVENT_ID=event_id,
+        )
+
+    def captured(self):
+        return {
+            "event": "payment.captured",
+            "payload": {"payment": {"entity": {"id": "pay_1", "order_id": "order_hook1", "amount": 12000}}},
+        }
+
+    def test_signed_event_is_stored_once_and_processed_later(self):
+        with self.captureOnCommitCallbacks() as scheduled:
+            first = self.deliver(self.captured())
+            again = self.deliver(self.captured())
+
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(again.json()["duplicate"])
+        self.assertEqual(RazorpayWebhookEvent.objects.count(), 1)
+        self.assertEqual(len(scheduled), 1)
+        self.assertFalse(Order.objects.get(pk=self.order.pk).is_paid)
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(self.captured(), signature="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RazorpayWebhookEvent.objects.exists())
+
+    def test_captured_payment_marks_order_paid_once(self):
+        from .webhooks import process_webhook_event
+
+        self.deliver(self.captured())
+        event = RazorpayWebhookEvent.objects.get()
+        with mock.patch("orders.helpers.create_delhivery_shipment", return_value={"success": False}) as shipment, \
+                mock.patch("orders.helpers.send_multichannel_notification"):
+            self.assertEqual(process_webhook_event(event.pk), RazorpayWebhookEvent.PROCESSED)
+            self.assertIsNone(process_webhook_event(event.pk))
+
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.razorpay_payment_id, "pay_1")
+        self.assertEqual(shipment.call_count, 1)
+        self.assertEqual(RazorpayWebhookEvent.objects.get().order_id, order.pk)
+
+    def test_amount_mismatch_is_left_unpaid(self):
+        from .webhooks import process_webhook_event
+
+        payload = self.captured()
+        payload["payload"]["payment"]["entity"]["amount"] = 100
+        self.deliver(payload)
+        event = RazorpayWebhookEvent.objects.get()
+        with mock.patch("orders.helpers.create_delhivery_shipment") as shipment:
+            self.assertEqual(process_webhook_event(event.pk), RazorpayWebhookEvent.IGNORED)
+
+        self.assertFalse(Order.objects.get(pk=self.order.pk).is_paid)
+        shipment.assert_not_called()
+        self.assertIn("amount mismatch", RazorpayWebhookEvent.objects.get().error)
+
+    def test_shipment_failure_does_not_undo_payment(self):
+        from .helpers import finalize_paid_order
+
+        with mock.patch("orders.helpers.create_delhivery_shipment", side_effect=ConnectionError("down")), \
+                mock.patch("orders.helpers.send_multichannel_notification") as notify:
+            outcome = finalize_paid_order(self.order, "order_hook1", "pay_1")
+
+        self.assertFalse(outcome["shipment"]["success"])
+        self.assertTrue(Order.objects.get(pk=self.order.pk).is_paid)
+        notify.assert_called_once()
+
+
+class PaymentReconciliationTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        user = make_user("recon@example.com", "Recon")
+        address = make_address(user)
+        variant = make_variant(make_product("Honey", "Honey"), "HN-500", "300.00", "500g", stock=50)
+        for n in range(1, 4):
+            order = make_customer_order(user, address, [variant], f"ORD-REC-{n}")
+            Order.objects.filter(pk=order.pk).update(razorpay_order_id=f"order_rec{n}")
+        Order.objects.filter(order_number="ORD-REC-1").update(is_paid=True, razorpay_payment_id="pay_1")
+        UnusedGatewayOrder.objects.create(razorpay_order_id="order_unused", amount=Decimal("300.00"))
+
+        self.now = timezone.now()
+        ts = int(self.now.timestamp()) - 60
+        self.payments = [
+            {"id": "pay_1", "order_id": "order_rec1", "status": "captured", "amount": 30000, "created_at": ts},
+            {"id": "pay_2", "order_id": "order_rec2", "status": "captured", "amount": 30000, "created_at": ts},
+            {"id": "pay_3", "order_id": "order_rec3", "status": "failed", "amount": 30000, "created_at": ts},
+            {"id": "pay_4", "order_id": "order_unused", "status": "captured", "amount": 30000, "created_at": ts},
+            {"id": "pay_5", "order_id": "order_ghost", "status": "captured", "amount": 100, "created_at": ts},
+        ]
+
+    def run_reconcile(self, apply):
+        from .reconciliation import StubPaymentSource, reconcile_payments
+
+        source = StubPaymentSource(self.payments)
+        rows = []
+        report = mock.Mock(writerow=rows.append)
+        with mock.patch("orders.helpers.create_delhivery_shipment", return_value={"success": False}), \
+                mock.patch("orders.helpers.send_multichannel_notification"):
+            summary = reconcile_payments(
+                self.now - timedelta(days=1), self.now, source, apply=apply, page_size=2, report=report
+            )
+        return summary, rows, source
+
+    def test_dry_run_reports_without_changing_anything(self):
+        summary, rows, source = self.run_reconcile(apply=False)
+
+        self.assertEqual(summary["payments"], 5)
+        self.assertEqual(summary["ok"], 1)
+        self.assertEqual(summary["paid_not_marked"], 1)
+        self.assertEqual(summary["unused_gateway"], 1)
+        self.assertEqual(summary["orphan"], 1)
+        self.assertEqual(summary["not_captured"], 1)
+        self.assertEqual(len(rows), 4)
+        self.assertFalse(Order.objects.get(order_number="ORD-REC-2").is_paid)
+        self.assertEqual(source.refunds, [])
+
+    def test_apply_marks_paid_and_refunds_unused_gateway_payment(self):
+        summary, rows, source = self.run_reconcile(apply=True)
+
+        order = Order.objects.get(order_number="ORD-REC-2")
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.razorpay_payment_id, "pay_2")
+        unused = UnusedGatewayOrder.objects.get(razorpay_order_id="order_unused")
+        self.assertEqual((unused.status, unused.razorpay_payment_id), ("refunded", "pay_4"))
+        self.assertEqual(source.refunds[0]["amount"], 30000)
+        self.assertEqual(summary["action:marked_paid"], 1)
+        self.assertEqual(summary["action:refunded"], 1)
+
+        # Running again is a no-op
+        summary, _, source = self.run_reconcile(apply=True)
+        self.assertEqual(summary["ok"], 2)
+        self.assertEqual(source.refunds, [])
+
+    def test_underpaid_order_is_reported_not_marked_paid(self):
+        self.payments[1]["amount"] = 100
+        summary, rows, _ = self.run_reconcile(apply=True)
+
+        self.assertEqual(summary["amount_mismatch"], 1)
+        self.assertEqual(summary["action:marked_paid"], 0)
+        self.assertFalse(Order.objects.get(order_number="ORD-REC-2").is_paid)
+
+
+class PaymentGatewayTests(SimpleTestCase):
+    def test_fake_gateway_signs_like_razorpay(self):
+        import razorpay
+
+        gateway = FakePaymentGateway()
+        rzp_order = gateway.create_order({"amount": 5000, "currency": "INR", "receipt": "r1"})
+        callback = gateway.pay(rzp_order["id"])
+
+        self.assertTrue(gateway.verify_payment_signature(callback))
+        with self.assertRaises(razorpay.errors.SignatureVerificationError):
+            gateway.verify_payment_signature(dict(callback, razorpay_signature="forged"))
+
+        gateway.refund_payment(callback["razorpay_payment_id"], {"amount": 3000})
+        with self.assertRaises(razorpay.errors.BadRequestError):
+            gateway.refund_payment(callback["razorpay_payment_id"], {"amount": 3000})
+
+    def test_retry_rules_per_call(self):
+        import requests
+
+        gateway = RazorpayGateway(key_id="k", key_secret="s", retries=2, backoff=0)
+        gateway.client = mock.MagicMock()
+        dropped = requests.exceptions.ConnectionError("reset")
+
+        gateway.client.order.create.side_effect = [dropped, {"id": "order_1"}]
+        self.assertEqual(gateway.create_order({"amount": 100})["id"], "order_1")
+        self.assertEqual(gateway.client.order.create.call_args.kwargs["timeout"], (3.05, 10))
+
+        # A refund may have reached Razorpay: never replay it after the request was sent
+        gateway.client.payment.refund.side_effect = [dropped, {"id": "rfnd_1"}]
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            gateway.refund_payment("pay_1", {"amount": 100})
+        self.assertEqual(gateway.client.payment.refund.call_count, 1)
+
+        gateway.client.payment.fetch.side_effect = [requests.exceptions.ReadTimeout(), dropped, {"id": "pay_1"}]
+        self.assertEqual(gateway.fetch_payment("pay_1")["id"], "pay_1")
+
+
+
+class OrderListProjectionTests(TestCase):
+    def setUp(self):
+        from products.models import ProductVariantImage
+
+        self.user = make_user("history@example.com", "History")
+        self.address = make_address(self.user)
+        product = make_product("Filter Coffee", "Coffee")
+        self.variants = [make_variant(product, f"FC-{n}", "50.00", f"{n}g") for n in (100, 250)]
+        ProductVariantImage.objects.create(variant=self.variants[0], image_url="https://img.example.com/fc-100.jpg")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_orders(self, count):
+        from .models import OrderItem, Refund
+
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user, shipping_address=self.address, subtotal=Decimal("150.00"), total=Decimal("150.00"),
+            )
+            for variant in self.variants:
+                OrderItem.objects.create(order=order, product_variant=variant, quantity=1, price=Decimal("50.00"))
+            Refund.objects.create(order=order, amount=Decimal("10.00"), status="pending")
+            Refund.objects.create(order=order, amount=Decimal("20.00"), status="processed")
+
+    def list_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.make_orders(1)
+        few, _ = self.list_queries("/api/orders/")
+        few_summary, _ = self.list_queries("/api/orders/?view=summary")
+
+        self.make_orders(4)
+        many, body = self.list_queries("/api/orders/")
+        many_summary, summary = self.list_queries("/api/orders/?view=summary")
+
+        self.assertEqual((many, many_summary), (few, few_summary))
+        self.assertEqual(len(body["results"]), 5)
+        row = summary["results"][0]
+        self.assertNotIn("items", row)
+        self.assertEqual((row["item_count"], row["latest_refund_status"]), (2, "processed"))
+        self.assertEqual(row["first_item"], {
+            "product_name": "Filter Coffee", "variant_name": "100g", "image": "https://img.example.com/fc-100.jpg",
+        })
+        self.assertEqual(body["results"][0]["refund_info"]["status"], "processed")
+
+
+class CheckoutLoadHarnessTests(TestCase):
+    def test_flow_runs_end_to_end_against_fakes(self):
+        from .loadtest import compare_to_baseline, fake_services, run_checkout_load, seed_loadtest_data
+
+        cache.clear()
+        fixtures = seed_loadtest_data(users=2, stock=50)
+        with fake_services() as fakes:
+            result = run_checkout_load(fixtures, fakes, concurrency=1, iterations=1)
+
+        self.assertEqual(set(result["steps"]), {"preview", "checkout", "verify", "cancel"})
+        for name in ("preview", "checkout", "verify"):
+            self.assertEqual(result["steps"][name]["errors"], {}, name)
+            self.assertGreater(result["steps"][name]["queries_avg"], 0)
+        self.assertEqual(Order.objects.filter(user__email__startswith="loadtest+", is_paid=True).count(), 2)
+        self.assertGreaterEqual(result["external_calls"]["razorpay"], 2)
+
+        slower = {**result, "flows_per_second": result["flows_per_second"] * 2}
+        slower["steps"] = {k: dict(v, p95_ms=v["p95_ms"] / 2 - 1) for k, v in result["steps"].items()}
+        self.assertTrue(any("p95" in p for p in compare_to_baseline(result, slower)))
+        self.assertTrue(any("throughput" in p for p in compare_to_baseline(result, slower)))
+        self.assertEqual(compare_to_baseline(result, result), [])
+
+    def test_fake_smtp_accepts_django_mail(self):
+        from django.core.mail import send_mail
+        from .fake_smtp import FakeSMTPServer
+
+        with FakeSMTPServer() as smtp, override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST=smtp.host, EMAIL_PORT=smtp.port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="",
+        ):
+            send_mail("Hi", "Body", "shop@example.com", ["buyer@example.com"])
+
+        self.assertEqual(smtp.count, 1)
+        self.assertEqual(smtp.messages[0]["to"], ["buyer@example.com"])
@@ -0,0 +1,74 @@
+"""
+Order timeline.
+
+Everything that happens to an order is appended to OrderEvent as it
+happens: status transitions (one insert per change set, from the
+`status_transitioned` signal), courier scans, payment, refunds, returns,
+replacements and notifications. The receivers live in orders/signals.py.
+
+    events = order_timeline(order)                      # customer view
+    events = order_timeline(order, include_internal=True)
+
+Reading the history is one range scan on orderevent_timeline_idx; nothing
+is stitched together at request time.
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import OrderEvent, OrderItem
+
+
+def record_event(order, kind, code, message="", *, order_item=None, previous="", payload=None,
+                 internal=False, actor=None, source="", occurred_at=None):
+    return OrderEvent.objects.create(
+        order_id=getattr(order, "pk", order),
+        order_item_id=getattr(order_item, "pk", order_item),
+        kind=kind,
+        code=str(code)[:50],
+        previous=str(previous or "")[:50],
+        message=(message or "")[:255],
+        payload=payload or {},
+        internal=internal,
+        actor=actor if getattr(actor, "is_authenticated", False) else None,
+        source=source,
+        occurred_at=occurred_at or timezone.now(),
+    )
+
+
+def record_status_changes(model, changes, to_status, actor=None, source=""):
+    """Timeline rows for one bulk transition (one insert; one lookup for items)."""
+    now = timezone.now()
+    actor = actor if getattr(actor, "is_authenticated", False) else None
+
+    if model is OrderItem:
+        order_ids = dict(OrderItem.objects.filter(pk__in=[pk for pk, _ in changes]).values_list("pk", "order_id"))
+        events = [
+            OrderEvent(order_id=order_ids[pk], order_item_id=pk, kind=OrderEvent.ITEM_STATUS, code=to_status,
+                       previous=previous, actor=actor, source=source, occurred_at=now)
+            for pk, previous in changes if pk in order_ids
+        ]
+    else:
+        events = [
+            OrderEvent(order_id=pk, kind=OrderEvent.STATUS, code=to_status, previous=previous,
+                       actor=actor, source=source, occurred_at=now)
+            for pk, previous in changes
+        ]
+    OrderEvent.objects.bulk_create(events)
+    return events
+
+
+def scan_time(value):
+    """Courier timestamps arrive as strings (or not at all)."""
+    if hasattr(value, "tzinfo"):
+        moment = value
+    else:
+        moment = parse_datetime(str(value or "")) or timezone.now()
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def order_timeline(order, include_internal=False):
+    events = OrderEvent.objects.filter(order_id=getattr(order, "pk", order)).order_by("occurred_at", "id")
+    if not include_internal:
+        events = events.filter(internal=False)
+    return events
@@ -0,0 +1,196 @@
+"""
+Order / order item state machine.
+
+Every status change goes through `transition_orders` / `transition_items`,
+which check it against the tables below and apply it to the whole set in
+one statement:
+
+    UPDATE orders_order SET status = 'delivered', ...
+     WHERE id IN (...) AND status IN (<states that may become 'delivered'>)
+
+Rows already in the target state are left alone; rows in a state that
+cannot reach it are skipped, or raise InvalidTransition with strict=True.
+Nothing is saved row by row, so post_save receivers do not run; instead
+`status_transitioned` is sent once per change set with every row that
+moved:
+
+    @receiver(status_transitioned, sender=Order)
+    def on_orders(sender, changes, to_status, actor, source, **kwargs):
+        ...  # changes: [(order_id, from_status), ...]
+
+Receivers run inside the transition's transaction; defer side effects
+with transaction.on_commit.
+"""
+import logging
+from collections import Counter
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import Order, OrderItem, OrderItemStatus, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+status_transitioned = Signal()
+
+
+class InvalidTransition(Exception):
+    def __init__(self, model, to_status, rejected):
+        self.model = model
+        self.to_status = to_status
+        self.rejected = rejected  # [(pk, current_status), ...]
+        super().__init__(
+            f"{model.__name__} cannot move to {to_status!r} from "
+            + ", ".join(f"{pk}:{status}" for pk, status in rejected)
+        )
+
+
+# =====================================================
+# TRANSITION TABLES (current status -> allowed next statuses)
+# =====================================================
+_SHIPPING = {"in_transit", "out_for_delivery", "delivered", "undelivered"}
+
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PROCESSING, OrderStatus.CANCELLED, OrderStatus.PARTIALLY_CANCELLED},
+    OrderStatus.PROCESSING: _SHIPPING | {OrderStatus.CANCELLED, OrderStatus.PARTIALLY_CANCELLED},
+    OrderStatus.PARTIALLY_CANCELLED: _SHIPPING | {OrderStatus.PROCESSING, OrderStatus.CANCELLED},
+    OrderStatus.IN_TRANSIT: _SHIPPING | {OrderStatus.CANCELLED},
+    OrderStatus.OUT_FOR_DELIVERY: _SHIPPING,
+    OrderStatus.UNDELIVERED: _SHIPPING | {OrderStatus.CANCELLED},
+    OrderStatus.DELIVERED: {OrderStatus.RETURN_INITIATED, OrderStatus.REPL_SCHEDULED},
+    OrderStatus.RETURN_INITIATED: {OrderStatus.DELIVERED_TO_WAREHOUSE, OrderStatus.DELIVERED},
+    OrderStatus.REPL_SCHEDULED: {OrderStatus.REPL_IN_TRANSIT},
+    OrderStatus.REPL_IN_TRANSIT: {OrderStatus.REPL_COMPLETED},
+    OrderStatus.DELIVERED_TO_WAREHOUSE: set(),
+    OrderStatus.REPL_COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+ITEM_TRANSITIONS = {
+    # unpacked items still follow the courier's scans
+    OrderItemStatus.PENDING: _SHIPPING | {OrderItemStatus.PROCESSING, OrderItemStatus.CANCELLED},
+    OrderItemStatus.PROCESSING: _SHIPPING | {OrderItemStatus.CANCELLED},
+    OrderItemStatus.IN_TRANSIT: _SHIPPING | {OrderItemStatus.CANCELLED},
+    OrderItemStatus.OUT_FOR_DELIVERY: _SHIPPING,
+    OrderItemStatus.UNDELIVERED: _SHIPPING | {OrderItemStatus.CANCELLED},
+    OrderItemStatus.DELIVERED: {OrderItemStatus.RETURN_INITIATED, OrderItemStatus.REPL_SCHEDULED},
+    OrderItemStatus.RETURN_INITIATED: {OrderItemStatus.DELIVERED_TO_WAREHOUSE, OrderItemStatus.REFUNDED,
+                                       OrderItemStatus.DELIVERED},
+    OrderItemStatus.DELIVERED_TO_WAREHOUSE: {OrderItemStatus.REFUNDED},
+    OrderItemStatus.REPL_SCHEDULED: {OrderItemStatus.REPL_IN_TRANSIT},
+    OrderItemStatus.REPL_IN_TRANSIT: {OrderItemStatus.REPL_COMPLETED},
+    OrderItemStatus.CANCELLED: {OrderItemStatus.REFUNDED},
+    OrderItemStatus.REFUNDED: set(),
+    OrderItemStatus.REPL_COMPLETED: set(),
+}
+
+# Timestamp stamped alongside a status unless the caller sets it
+ORDER_TIMESTAMPS = {
+    OrderStatus.OUT_FOR_DELIVERY: "shipped_at",
+    OrderStatus.DELIVERED: "delivered_at",
+    OrderStatus.CANCELLED: "cancelled_at",
+}
+
+TABLES = {Order: (ORDER_TRANSITIONS, ORDER_TIMESTAMPS), OrderItem: (ITEM_TRANSITIONS, {})}
+
+
+def sources_for(model, to_status):
+    """Statuses from which `model` rows may move to `to_status`."""
+    transitions, _ = TABLES[model]
+    if to_status not in transitions:
+        raise ValueError(f"Unknown {model.__name__} status {to_status!r}")
+    return {str(status) for status, targets in transitions.items() if to_status in targets}
+
+
+def can_transition(model, from_status, to_status):
+    return from_status in sources_for(model, to_status)
+
+
+# =====================================================
+# BULK TRANSITIONS
+# =====================================================
+def _transition(model, rows, to_status, fields=None, actor=None, source="", strict=False):
+    _, timestamps = TABLES[model]
+    allowed = sources_for(model, to_status)
+    queryset = rows if hasattr(rows, "filter") else model.objects.filter(pk__in=list(rows))
+    values = dict(fields or {})
+    if to_status in timestamps:
+        values.setdefault(timestamps[to_status], timezone.now())
+
+    with transaction.atomic():
+        current = list(
+            queryset.order_by().exclude(status=to_status).select_for_update().values_list("pk", "status")
+        )
+        changes = [(pk, status) for pk, status in current if status in allowed]
+        rejected = [(pk, status) for pk, status in current if status not in allowed]
+        if rejected:
+            if strict:
+                raise InvalidTransition(model, to_status, rejected)
+            logger.info("Skipped %d %s rows that cannot move to %s: %s",
+                        len(rejected), model.__name__, to_status, dict(Counter(s for _, s in rejected)))
+        if not changes:
+            return []
+
+        model.objects.filter(pk__in=[pk for pk, _ in changes], status__in=allowed).update(
+            status=to_status, **values
+        )
+        status_transitioned.send(
+            sender=model, changes=changes, to_status=to_status, actor=actor, source=source,
+        )
+    return changes
+
+
+def transition_orders(orders, to_status, *, fields=None, actor=None, source="", strict=False):
+    """
+    Move every order in `orders` (queryset or ids) that may go to
+    `to_status` there, with `fields` updated on the moved rows. Returns
+    [(order_id, from_status), ...] for the rows that changed.
+    """
+    return _transition(Order, orders, to_status, fields, actor, source, strict)
+
+
+def transition_items(items, to_status, *, fields=None, actor=None, source="", strict=False):
+    """transition_orders for order items."""
+    return _transition(OrderItem, items, to_status, fields, actor, source, strict)
+
+
+# =====================================================
+# ORDER STATUS FROM ITEMS
+# =====================================================
+def derived_order_status(item_statuses):
+    """Order status implied by its items' statuses, or None to leave it."""
+    item_statuses = set(item_statuses)
+    if not item_statuses:
+        return OrderStatus.PENDING
+    if item_statuses <= {OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED}:
+        return OrderStatus.CANCELLED
+    if item_statuses <= {OrderItemStatus.DELIVERED, OrderItemStatus.CANCELLED, OrderItemStatus.REFUNDED}:
+        return OrderStatus.DELIVERED
+    if OrderItemStatus.PROCESSING in item_statuses:
+        return OrderStatus.PROCESSING
+    if OrderItemStatus.PENDING in item_statuses:
+        return OrderStatus.PENDING
+    return None
+
+
+def rollup_order_status(order_ids, actor=None, source="items"):
+    """
+    Recompute the status of many orders from their items: two queries for
+    the current statuses, then one transition per status that actually
+    changes.
+    """
+    current, statuses = {}, {pk: set() for pk in order_ids}
+    for order_id, order_status in Order.objects.filter(pk__in=order_ids).values_list("pk", "status"):
+        current[order_id] = order_status
+    for order_id, status in OrderItem.objects.filter(order_id__in=order_ids).values_list("order_id", "status").distinct():
+        statuses[order_id].add(status)
+
+    by_target = {}
+    for order_id, item_statuses in statuses.items():
+        target = derived_order_status(item_statuses)
+        if target is not None and order_id in current and can_transition(Order, current[order_id], target):
+            by_target.setdefault(target, []).append(order_id)
+
+    changes = []
+    for target, ids in by_target.items():
+        changes += transition_orders(ids, target, actor=actor, source=source)
+    return changes
@@ -11,9 +11,11 @@ from .views import (
     OrderDetailAPIView,
     OrderPaymentAPIView,
     OrderTrackingAPIView,
+    OrderTimelineAPIView,
     CancelOrderAPIView,
     RazorpayOrderCreateAPIView,
     RazorpayPaymentVerifyAPIView,
+    RazorpayWebhookAPIView,
     GenerateDelhiveryLabelsAPIView,
   
     # Shipping address flows
@@ -37,7 +39,7 @@ from .returnReplacement import (
     
    
 )
-from .tasks import apply_commission_cron
+from .tasks import apply_commission_cron, release_reservations_cron, process_webhooks_cron
 
 
 urlpatterns = [
@@ -54,7 +56,9 @@ urlpatterns = [
     path('orders/<str:order_number>/cancel/', CancelOrderAPIView.as_view(), name='orders-cancel'),
     path('orders/<str:order_number>/razorpay/', RazorpayOrderCreateAPIView.as_view(), name='orders-razorpay-create'),
     path('orders/razorpay/verify/', RazorpayPaymentVerifyAPIView.as_view(), name='orders-razorpay-verify'),
+    path('payments/razorpay/webhook/', RazorpayWebhookAPIView.as_view(), name='razorpay-webhook'),
     path("orders/<str:order_number>/track/", OrderTrackingAPIView.as_view(), name="order-track"),
+    path("orders/<str:order_number>/timeline/", OrderTimelineAPIView.as_view(), name="order-timeline"),
 
     # 🏠 Shipping Address APIs
     path('shipping-addresses/', ShippingAddressListCreateView.as_view(), name='shipping-addresses-list-create'),
@@ -80,4 +84,6 @@ urlpatterns = [
 
 
     path("apply-commission-cron/", apply_commission_cron),
+    path("release-reservations-cron/", release_reservations_cron),
+    path("process-webhooks-cron/", process_webhooks_cron),
 ]
\ No newline at end of file
@@ -3,7 +3,6 @@ import logging
 from decimal import Decimal
 from django.utils import timezone
 from django.db import models
-from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
 import razorpay
 import urllib.parse
@@ -14,7 +13,7 @@ from django.conf import settings
 from django.utils import timezone
 import time
 from django.conf import settings
-from .models import Order, OrderItem, ShippingAddress,Refund,ReturnRequest,ReturnRecoveryAccount
+from .models import Order, OrderItem, ShippingAddress,Refund,ReturnRequest,ReturnRecoveryAccount,DeliveryRateCard,catalog_snapshots,first_variant_image_url
 from products.models import ProductVariant
 from promoter.models import Promoter
 from cart.models import CartItem
@@ -25,8 +24,18 @@ from django.conf import settings
 from decimal import Decimal
 from admin_dashboard.utils import create_warehouse_log
 from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.http import Http404
 logger = logging.getLogger(__name__)
 from .serializers import OrderSerializer
+from .delivery_cache import quote_cache, quote_key, weight_slab, normalize_pin, DeliveryQuoteError
+from .pincodes import lookup_pincode, pickup_pin
+from .ratecard import local_delivery_quote
+from .delhivery import get_delhivery_client
+from .gateway import get_payment_gateway
+from .transitions import InvalidTransition, rollup_order_status, transition_items
+from .search import build_search_document
+from .aggregates import AGGREGATE_FIELDS, item_aggregates
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +102,8 @@ def create_order_with_items(
     payment_method,
     existing_order=None,
     fallback_promoter_code=None,
+    order_number=None,
+    delivery_charge=None,
 ):
     """
     Corrected version:
@@ -100,6 +111,8 @@ def create_order_with_items(
     - Does NOT override or recalculate promoter
     - Only uses fallback promoter if item has no referral & no promoter
     - Ensures true item-level referral logic
+    - `order_number` / `delivery_charge` may be decided by the caller before
+      the transaction (two-phase checkout); then no Delhivery call is made here
     """
 
     # Reuse existing order if passed (retry flow)
@@ -108,6 +121,7 @@ def create_order_with_items(
         order.items.all().delete()
     else:
         order = Order.objects.create(
+            order_number=order_number,
             user=user,
             shipping_address=shipping_address,
             subtotal=Decimal("0.00"),
@@ -122,22 +136,47 @@ def create_order_with_items(
     total_commission = Decimal("0.00")
     total_weight_kg = Decimal("0.00")
     order_items_data = []
+    order_items = []
 
     # ----------------------------------------------------------
-    # 🔵 PROCESS EACH ITEM
+    # 🔵 LOAD VARIANTS + FALLBACK PROMOTER ONCE
+    # ----------------------------------------------------------
+    # process_checkout() passes the variant objects it already revalidated;
+    # anything else is fetched in a single query.
+    missing_ids = {
+        int(item["product_variant_id"])
+        for item in items
+        if isinstance(item, dict) and item.get("product_variant") is None
+    }
+    variants = ProductVariant.objects.select_related("product").annotate(
+        snapshot_image_url=first_variant_image_url()
+    ).in_bulk(missing_ids) if missing_ids else {}
+    not_found = missing_ids - set(variants)
+    if not_found:
+        raise Http404(f"ProductVariant with id {min(not_found)} does not exist")
+
+    fallback_promoter = None
+    if fallback_promoter_code and any(
+        not (item.get("promoter") if isinstance(item, dict) else None) for item in items
+    ):
+        fallback_promoter = Promoter.objects.filter(referral_code=fallback_promoter_code).first()
+
+    # ----------------------------------------------------------
+    # 🔵 PROCESS EACH ITEM (in memory)
     # ----------------------------------------------------------
     for item in items:
 
-        # 1️⃣ Fetch variant + quantity
+        # 1️⃣ Variant + quantity
         if isinstance(item, dict):
-            variant_id = item.get("product_variant_id")
+            variant = item.get("product_variant") or variants[int(item["product_variant_id"])]
             quantity = int(item.get("quantity", 1))
-            variant = get_object_or_404(ProductVariant, id=variant_id)
             item_referral = item.get("referral_code")  # raw referral code
+            item_promoter = item.get("promoter")
         else:
             variant = item.product_variant
             quantity = item.quantity
             item_referral = getattr(item, "referral_code", None)
+            item_promoter = None
 
         # 2️⃣ Basic price calc
         price = Decimal(str(variant.offer_price or variant.base_price))
@@ -147,14 +186,10 @@ def create_order_with_items(
         # ------------------------------------------------------
         # 🟢 PROMOTER — SINGLE SOURCE OF TRUTH
         # ------------------------------------------------------
-        # process_checkout() already validated this
-        item_promoter = item.get("promoter")
-
-        # Only fallback promoter if:
-        # - item has NO promoter
-        # - and a fallback was provided
-        if not item_promoter and fallback_promoter_code:
-            item_promoter = Promoter.objects.filter(referral_code=fallback_promoter_code).first()
+        # process_checkout() already validated item['promoter'];
+        # fall back only when the item has none.
+        if not item_promoter:
+            item_promoter = fallback_promoter
 
         # The referral code written to DB
         final_referral_code = item_referral or fallback_promoter_code
@@ -169,8 +204,8 @@ def create_order_with_items(
 
         total_commission += commission_amount
 
-        # 4️⃣ Create the order item
-        OrderItem.objects.create(
+        # 4️⃣ Build the order item
+        order_items.append(OrderItem(
             order=order,
             product_variant=variant,
             quantity=quantity,
@@ -179,7 +214,7 @@ def create_order_with_items(
             promoter_commission_rate=commission_rate,
             promoter_commission_amount=commission_amount,
             referral_code=final_referral_code,
-        )
+        ))
 
         order_items_data.append({
             "product_variant_id": variant.id,
@@ -190,19 +225,44 @@ def create_order_with_items(
             "referral_code": final_referral_code,
         })
 
+    # Catalog snapshot for every line; variants loaded above already carry
+    # it, the ones passed in by the caller take one query
+    catalog = catalog_snapshots({
+        order_item.product_variant_id for order_item in order_items
+        if not hasattr(order_item.product_variant, "snapshot_image_url")
+    })
+    for order_item in order_items:
+        order_item.capture_snapshot(order_item.product_variant, catalog.get(order_item.product_variant_id))
+
+    # Search document from what is already in memory (no extra query)
+    order.search_document = build_search_document(order, order_items, address=shipping_address, user=user)
+    for order_item in order_items:
+        order_item._search_indexed = True
+        order_item._aggregated = True
+    for field, value in item_aggregates(order_items, is_paid=order.is_paid).items():
+        setattr(order, field, value)
+
+    # 5️⃣ One INSERT for all items. bulk_create skips signals, so post_save is
+    # sent explicitly to keep OrderItem receivers working (they currently
+    # return early for created=True, so this costs no queries).
+    OrderItem.objects.bulk_create(order_items)
+    for order_item in order_items:
+        post_save.send(sender=OrderItem, instance=order_item, created=True, raw=False, using=OrderItem.objects.db, update_fields=None)
+
     # ----------------------------------------------------------
     # 🚚 DELIVERY CHARGE
     # ----------------------------------------------------------
-    try:
-        delivery_info = get_delivery_charge(
-            o_pin="643212",
-            d_pin=shipping_address.postal_code,
-            weight_grams=total_weight_kg * 1000,
-            payment_type="Pre-paid"
-        )
-        delivery_charge = Decimal(str(delivery_info.get("charge", 0)))
-    except Exception:
-        delivery_charge = Decimal("0.00")
+    if delivery_charge is None:
+        try:
+            delivery_info = get_delivery_charge(
+                o_pin="643212",
+                d_pin=shipping_address.postal_code,
+                weight_grams=total_weight_kg * 1000,
+                payment_type="Pre-paid"
+            )
+            delivery_charge = Decimal(str(delivery_info.get("charge", 0)))
+        except Exception:
+            delivery_charge = Decimal("0.00")
 
     # ----------------------------------------------------------
     # 💰 FINAL TOTALS
@@ -211,35 +271,16 @@ def create_order_with_items(
     order.delivery_charge = delivery_charge
     order.total_commission = total_commission
     order.total = subtotal + delivery_charge
-    order.save(update_fields=["subtotal", "delivery_charge", "total_commission", "total"])
+    order.save(update_fields=["subtotal", "delivery_charge", "total_commission", "total", "search_document", *AGGREGATE_FIELDS])
 
     return order, None, order_items_data
 
 
 def update_order_status_from_items(order):
-    item_statuses = list(order.items.values_list('status', flat=True))
-    print(f"[DEBUG] Order {order.order_number} item statuses: {item_statuses}")
-
-    if not item_statuses:
-        order.status = 'pending'
-        print(f"[DEBUG] No items found. Setting order status to 'pending'.")
-    elif all(status in ['cancelled', 'failed'] for status in item_statuses):
-        order.status = 'cancelled'
-        print(f"[DEBUG] All items cancelled/failed. Setting order status to 'cancelled'.")
-    elif all(status == 'fulfilled' for status in item_statuses):
-        order.status = 'fulfilled'
-        print(f"[DEBUG] All items fulfilled. Setting order status to 'fulfilled'.")
-    elif any(status == 'processing' for status in item_statuses):
-        order.status = 'processing'
-        print(f"[DEBUG] Some items processing. Setting order status to 'processing'.")
-    elif any(status == 'pending' for status in item_statuses):
-        order.status = 'pending'
-        print(f"[DEBUG] Some items pending. Setting order status to 'pending'.")
-    else:
-        print(f"[DEBUG] No matching condition. Order status unchanged: {order.status}")
-
-    order.save(update_fields=['status'])
-    print(f"[DEBUG] Final order status for {order.order_number}: {order.status}")    
+    """Recompute order.status from its items (see transitions.rollup_order_status)."""
+    rollup_order_status([order.pk])
+    order.refresh_from_db(fields=["status"])
+    return order.status
 
 def update_item_status(item_id, expected_status, new_status, user, timestamp_field=None, comment=None):
     """Update an OrderItem's status with logging and audit trail."""
@@ -253,11 +294,15 @@ def update_item_status(item_id, expected_status, new_status, user, timestamp_fie
             f"Only items with status '{expected_status}' can be marked as '{new_status}'"
         )
 
-    # ✅ update status + optional timestamp
-    item.status = new_status
-    if timestamp_field:
-        setattr(item, timestamp_field, timezone.now())
-    item.save(update_fields=["status"] + ([timestamp_field] if timestamp_field else []))
+    # ✅ update status + optional timestamp (validated by the state machine)
+    try:
+        transition_items(
+            [item.pk], new_status, actor=user, source="admin", strict=True,
+            fields={timestamp_field: timezone.now()} if timestamp_field else None,
+        )
+    except InvalidTransition as e:
+        raise ValidationError(str(e))
+    item.refresh_from_db()
 
     # ✅ create admin log (formerly warehouse log)
     AdminLog.objects.create(
@@ -310,18 +355,18 @@ def process_refund(return_request):
     amount = return_request.refund_amount
     order_item = return_request.order_item
 
-    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+    gateway = get_payment_gateway()
 
     try:
         with transaction.atomic():
-            payment_data = client.payment.fetch(order.razorpay_payment_id)
+            payment_data = gateway.fetch_payment(order.razorpay_payment_id)
             actual_paid_amount = Decimal(payment_data.get("amount", 0)) / 100
             already_refunded = Decimal(payment_data.get("amount_refunded", 0)) / 100
 
             if Decimal(amount) > (actual_paid_amount - already_refunded):
                 raise ValidationError("Refund amount exceeds remaining refundable amount")
 
-            refund_response = client.payment.refund(
+            refund_response = gateway.refund_payment(
                 order.razorpay_payment_id,
                 {"amount": int(Decimal(amount) * 100)}
             )
@@ -369,10 +414,8 @@ def check_refund_status(order_number):
     if not latest_refund or not latest_refund.refund_id:
         return {"success": False, "message": "No refund initiated for this order."}
 
-    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
     try:
-        refund_data = client.refund.fetch(latest_refund.refund_id)
+        refund_data = get_payment_gateway().fetch_refund(latest_refund.refund_id)
         status = refund_data.get("status", "unknown")
         refund_amount = Decimal(refund_data.get("amount", 0)) / Decimal(100)
 
@@ -412,10 +455,9 @@ def check_refund_status(order_number):
     except Exception as e:
         return {"success": False, "message": str(e) or "Unknown Razorpay error."}
 
-DELHIVERY_API_TOKEN = settings.DELHIVERY_API_TOKEN
 DELHIVERY_API_URL = settings.DELHIVERY_API_URL
 
-def get_delivery_charge(o_pin, d_pin, weight_grams=1, payment_type="Pre-paid"):
+def _fetch_delivery_charge(o_pin, d_pin, weight_grams, payment_type):
     params = {
         "md": "E",
         "ss": "Delivered",
@@ -425,47 +467,63 @@ def get_delivery_charge(o_pin, d_pin, weight_grams=1, payment_type="Pre-paid"):
         "pt": payment_type
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Token {DELHIVERY_API_TOKEN}"
-    }
+    headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(DELHIVERY_API_URL, params=params, headers=headers, timeout=10)
+        response = get_delhivery_client().get(DELHIVERY_API_URL, params=params, headers=headers, timeout=10)
+    except requests.exceptions.RequestException as e:
+        raise DeliveryQuoteError(str(e))
 
-        if response.status_code == 401:
-            print("[Delhivery API Error] Unauthorized token. Check if token is active.")
-            return {"charge": 0, "service": None, "gross": 0, "taxes": {}, "charged_weight": 0}
+    if response.status_code == 401:
+        raise DeliveryQuoteError("Unauthorized token. Check if token is active.")
 
-        if response.status_code != 200:
-            print(f"[Delhivery API HTTP Error] Status code: {response.status_code}")
-            return {"charge": 0, "service": None, "gross": 0, "taxes": {}, "charged_weight": 0}
+    if response.status_code != 200:
+        raise DeliveryQuoteError(f"HTTP {response.status_code}")
 
-        # Safely parse JSON
-        try:
-            data = response.json()
-        except ValueError:
-            return {"charge": 0, "service": None, "gross": 0, "taxes": {}, "charged_weight": 0}
+    # Safely parse JSON
+    try:
+        data = response.json()
+    except ValueError:
+        raise DeliveryQuoteError("Invalid JSON response.")
 
-        if isinstance(data, list) and data:
-            service_info = data[0]
-            return {
-                "charge": service_info.get("total_amount", 0),
-                "service": service_info.get("status", ""),
-                "gross": service_info.get("gross_amount", 0),
-                "taxes": service_info.get("tax_data", {}),
-                "charged_weight": service_info.get("charged_weight", weight_grams)
-            }
+    # An empty or unexpected body is not a free lane; never cache it
+    if not (isinstance(data, list) and data and isinstance(data[0], dict)) or data[0].get("total_amount") is None:
+        raise DeliveryQuoteError("No charge in Delhivery response.")
+
+    service_info = data[0]
+    return {
+        "charge": service_info["total_amount"],
+        "service": service_info.get("status", ""),
+        "gross": service_info.get("gross_amount", 0),
+        "taxes": service_info.get("tax_data", {}),
+        "charged_weight": service_info.get("charged_weight", weight_grams)
+    }
 
-        return {"charge": 0, "service": None, "gross": 0, "taxes": {}, "charged_weight": weight_grams}
 
+def get_delivery_charge(o_pin, d_pin, weight_grams=1, payment_type="Pre-paid"):
+    """
+    Forward delivery quote. Priced locally from the rate card when the zone
+    is known; otherwise served from the quote cache keyed on (origin,
+    destination, weight slab, payment mode), with Delhivery only hit on a
+    miss or a background refresh.
+    """
+    o_pin, d_pin = normalize_pin(o_pin), normalize_pin(d_pin)
+    local = local_delivery_quote(DeliveryRateCard.FORWARD, o_pin, d_pin, weight_grams, payment_type)
+    if local is not None:
+        return local
+    slab = weight_slab(weight_grams)
+    key = quote_key("charge", o_pin, d_pin, slab, payment_type)
+
+    try:
+        return dict(quote_cache.get(
+            key, lambda: _fetch_delivery_charge(o_pin, d_pin, slab, payment_type)
+        ))
     except Exception as e:
         print(f"[Delhivery API Error] {e}")
         return {"charge": 0, "service": None, "gross": 0, "taxes": {}, "charged_weight": weight_grams}
 
-def get_expected_tat(origin_pin, destination_pin, mot='E', pdt='B2C'):
-    url = 'https://track.delhivery.com/api/dc/expected_tat'
-    headers = {"Authorization": f"Token {DELHIVERY_API_TOKEN}"}
+
+def _fetch_expected_tat(origin_pin, destination_pin, mot, pdt):
     params = {
         "origin_pin": origin_pin,
         "destination_pin": destination_pin,
@@ -474,22 +532,42 @@ def get_expected_tat(origin_pin, destination_pin, mot='E', pdt='B2C'):
     }
 
     try:
-        res = requests.get(url, headers=headers, params=params, timeout=10)
+        res = get_delhivery_client().get('/api/dc/expected_tat', params=params, timeout=10)
         res.raise_for_status()
         data = res.json()
-
-        if data.get("success") and data.get("data", {}).get("tat") is not None:
-            return {
-                "tat_days": data["data"]["tat"],
-                "msg": data.get("msg", "")
-            }
-
     except requests.exceptions.Timeout:
-        print("[Delhivery TAT API Error] Request timed out.")
+        raise DeliveryQuoteError("Request timed out.")
     except requests.exceptions.RequestException as e:
-        print(f"[Delhivery TAT API Error] {e}")
+        raise DeliveryQuoteError(str(e))
     except ValueError:
-        print("[Delhivery TAT API Error] Invalid JSON response.")
+        raise DeliveryQuoteError("Invalid JSON response.")
+
+    if data.get("success") and data.get("data", {}).get("tat") is not None:
+        return {
+            "tat_days": data["data"]["tat"],
+            "msg": data.get("msg", "")
+        }
+
+    raise DeliveryQuoteError(data.get("msg") or "TAT not available")
+
+
+def get_expected_tat(origin_pin, destination_pin, mot='E', pdt='B2C'):
+    origin_pin, destination_pin = normalize_pin(origin_pin), normalize_pin(destination_pin)
+
+    # Typical TAT from our pickup pin is kept in the local pincode directory
+    if origin_pin == pickup_pin() and mot == 'E':
+        entry = lookup_pincode(destination_pin)
+        if entry is not None and entry.tat_days is not None:
+            return {"tat_days": entry.tat_days, "msg": ""}
+
+    key = quote_key("tat", origin_pin, destination_pin, mot, pdt)
+
+    try:
+        return dict(quote_cache.get(
+            key, lambda: _fetch_expected_tat(origin_pin, destination_pin, mot, pdt)
+        ))
+    except Exception as e:
+        print(f"[Delhivery TAT API Error] {e}")
 
     return {"tat_days": None, "msg": "Unable to fetch expected TAT"}
 
@@ -506,32 +584,19 @@ def create_delhivery_shipment(order):
 
     logger = logging.getLogger(__name__)
 
-    url = "https://track.delhivery.com/api/cmu/create.json"
-    headers = {
-        "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
+    headers = {"Content-Type": "application/json"}
 
     pickup = getattr(settings, "DELHIVERY_PICKUP", None)
     if not pickup:
         return {"success": False, "error": "Pickup configuration missing in settings"}
 
-    # 🧮 Calculate total weight
-    try:
-        total_weight = sum(
-            item.product_variant.get_weight_in_grams() * item.quantity
-            for item in order.items.all()
-        )
-        if total_weight <= 0:
-            total_weight = 500
-    except Exception as e:
-        logger.exception("Error calculating total weight")
-        total_weight = 500
+    # 🧮 Total weight (stored on the order from the active items)
+    total_weight = order.total_weight_grams or 500
+    items = list(order.items.all())
 
     # 🧾 Prepare product description summary
     products_desc = ", ".join(
-        [item.product_variant.product.name for item in order.items.all()]
+        [item.product_name for item in items]
     )[:250]
 
     try:
@@ -545,7 +610,7 @@ def create_delhivery_shipment(order):
             "phone": str(order.shipping_address.phone_number),
             "order": str(order.order_number),
             "payment_mode": "Prepaid" if order.is_paid else "COD",
-            "quantity": str(sum(item.quantity for item in order.items.all())),
+            "quantity": str(sum(item.quantity for item in items)),
             "products_desc": products_desc,
             "total_amount": str(order.total),
             "cod_amount": "0" if order.is_paid else str(order.total),
@@ -579,7 +644,7 @@ def create_delhivery_shipment(order):
 
    
     try:
-        response = requests.post(url, headers=headers, data=payload, timeout=20)
+        response = get_delhivery_client().post("/api/cmu/create.json", headers=headers, data=payload, timeout=20)
         response.raise_for_status()
         data = response.json()
     except requests.exceptions.RequestException as e:
@@ -619,26 +684,20 @@ def cancel_delhivery_shipment(order):
     """
     import requests
     import logging
-    from django.conf import settings
 
     logger = logging.getLogger(__name__)
 
     if not order.waybill:
         return {"success": False, "message": "No waybill found for this order"}
 
-    url = "https://track.delhivery.com/api/p/edit"
-    headers = {
-        "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
     payload = {
         "waybill": order.waybill,
         "cancellation": "true",
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
+        # Cancelling the same waybill twice is harmless, so it may be retried
+        response = get_delhivery_client().post("/api/p/edit", json=payload, timeout=15, idempotent=True)
         data = response.json()
     except requests.exceptions.RequestException as e:
         logger.exception(f"❌ Delhivery cancellation request failed for {order.order_number}")
@@ -675,8 +734,6 @@ def track_delhivery_shipment(waybill=None, ref_id=None):
     if not waybill and not ref_id:
         return {"success": False, "message": "waybill or ref_id is required"}
 
-    base_url = "https://track.delhivery.com/api/v1/packages/json/"
-
     # 🧠 Handle both single and list input
     params = {}
     if waybill:
@@ -690,13 +747,8 @@ def track_delhivery_shipment(waybill=None, ref_id=None):
         else:
             params["ref_ids"] = str(ref_id)
 
-    headers = {
-        "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-        "Accept": "application/json",
-    }
-
     try:
-        response = requests.get(base_url, headers=headers, params=params, timeout=10)
+        response = get_delhivery_client().get("/api/v1/packages/json/", params=params, timeout=10)
         if response.status_code != 200:
             logger.warning(f"⚠️ Delhivery returned {response.status_code}: {response.text}")
             return {
@@ -770,8 +822,6 @@ def track_delhivery_shipment(waybill=None, ref_id=None):
             "error": str(e),
         }
  
-DELHIVERY_BASE_URL = "https://track.delhivery.com"
-
 def create_reverse_pickup(return_request, use_mock=False):
     """
     Creates a reverse pickup (return shipment) in Delhivery for a given ReturnRequest.
@@ -816,7 +866,7 @@ def create_reverse_pickup(return_request, use_mock=False):
         # ---------------- Weight ----------------
         try:
             total_weight_grams = sum(
-                (item.product_variant.get_weight_in_grams() or 500) * item.quantity
+                (item.weight_grams or 500) * item.quantity
                 for item in order.items.all()
             )
             total_weight_grams = max(total_weight_grams, 50)
@@ -828,7 +878,7 @@ def create_reverse_pickup(return_request, use_mock=False):
         # ---------------- Product Description ----------------
         try:
             products_desc = ", ".join(
-                [item.product_variant.product.name for item in order.items.all()]
+                [item.product_name for item in order.items.all()]
             )[:250]
             logger.info(f"[Reverse Pickup] Products description: {products_desc}")
         except Exception as e:
@@ -878,17 +928,13 @@ def create_reverse_pickup(return_request, use_mock=False):
         }
 
         payload = {"format": "json", "data": json.dumps(payload_dict)}
-        headers = {
-            "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-            "Accept": "application/json",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
         logger.info(f"[Reverse Pickup] Sending payload to Delhivery: {json.dumps(payload_dict, indent=2)}")
 
         # ---------------- API Call ----------------
-        response = requests.post(
-            f"{DELHIVERY_BASE_URL}/api/cmu/create.json",
+        response = get_delhivery_client().post(
+            "/api/cmu/create.json",
             headers=headers,
             data=payload,
             timeout=20
@@ -923,11 +969,7 @@ def create_reverse_pickup(return_request, use_mock=False):
         return {"success": False, "message": str(e)}
 
 
-def get_delhivery_return_charge(o_pin, d_pin, weight_grams, payment_type="Pre-paid"):
-    """
-    Calls Delhivery's rate API to estimate reverse pickup (DTO) charge.
-    Returns a Decimal value for total charge.
-    """
+def _fetch_return_charge(o_pin, d_pin, weight_grams, payment_type):
     params = {
         "md": "E",            # Express mode
         "ss": "DTO",          # DTO = reverse pickup
@@ -937,42 +979,57 @@ def get_delhivery_return_charge(o_pin, d_pin, weight_grams, payment_type="Pre-pa
         "pt": payment_type,
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Token {DELHIVERY_API_TOKEN}",
-    }
+    headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(
-            "https://track.delhivery.com/api/kinko/v1/invoice/charges/.json",
+        response = get_delhivery_client().get(
+            "/api/kinko/v1/invoice/charges/.json",
             params=params,
             headers=headers,
             timeout=10,
         )
+    except requests.exceptions.RequestException as e:
+        raise DeliveryQuoteError(str(e))
 
-        if response.status_code == 401:
-            return Decimal("0.00")
+    if response.status_code != 200:
+        raise DeliveryQuoteError(f"HTTP {response.status_code}")
 
-        if response.status_code != 200:
-            return Decimal("0.00")
+    try:
+        data = response.json()
+    except ValueError:
+        raise DeliveryQuoteError("Invalid JSON response.")
 
-        try:
-            data = response.json()
-        except ValueError:
-           return Decimal("0.00")
+    if not (isinstance(data, list) and data and isinstance(data[0], dict)) or data[0].get("total_amount") is None:
+        raise DeliveryQuoteError("No charge in Delhivery response.")
+    return str(data[0]["total_amount"])
 
-        if isinstance(data, list) and data:
-            total = data[0].get("total_amount", 0)
-            return Decimal(str(total or "0.00"))
 
+def get_delhivery_return_charge(o_pin, d_pin, weight_grams, payment_type="Pre-paid"):
+    """
+    Estimates the reverse pickup (DTO) charge: rate card first, then
+    Delhivery's rate API (cached like forward quotes).
+    Returns a Decimal value for total charge.
+    """
+    o_pin, d_pin = normalize_pin(o_pin), normalize_pin(d_pin)
+    local = local_delivery_quote(DeliveryRateCard.RETURN, o_pin, d_pin, weight_grams, payment_type)
+    if local is not None:
+        return Decimal(str(local["charge"]))
+    slab = weight_slab(weight_grams)
+    key = quote_key("return", o_pin, d_pin, slab, payment_type)
+
+    try:
+        return Decimal(quote_cache.get(
+            key, lambda: _fetch_return_charge(o_pin, d_pin, slab, payment_type)
+        ))
     except Exception as e:
         print(f"[Delhivery API Error] {e}")
 
     return Decimal("0.00")
 
+
 def get_total_replacement_charge(order, weight_grams=None):
     total_weight = weight_grams or sum(
-        item.product_variant.get_weight_in_grams() * item.quantity
+        item.weight_grams * item.quantity
         for item in order.items.all()
     )
 
@@ -1104,17 +1161,14 @@ def create_repl_shipment(*, replacement_request):
 
     pickup = settings.DELHIVERY_PICKUP  # Warehouse details
     pickup_location_name = settings.DELHIVERY_PICKUP_LOCATION
-    api_token = settings.DELHIVERY_API_TOKEN
 
     if not addr:
         raise ValueError("Order has no shipping address")
 
-    url = "https://track.delhivery.com/api/cmu/create.json"
-
     # Calculate total weight
     try:
         total_weight = sum(
-            i.product_variant.get_weight_in_grams() * i.quantity
+            i.weight_grams * i.quantity
             for i in order.items.all()
         )
         if total_weight <= 0:
@@ -1148,7 +1202,7 @@ def create_repl_shipment(*, replacement_request):
                 "return_country": pickup.get("country", "India"),
                 "return_phone": [str(pickup["phone"])],
 
-                "products_desc": item.product_variant.product.name,
+                "products_desc": item.product_name,
                 "quantity": str(item.quantity or 1),
                 "weight": str(total_weight),
                 "shipping_mode": "Surface",
@@ -1171,13 +1225,9 @@ def create_repl_shipment(*, replacement_request):
         "data": json.dumps(manifest)
     }
 
-    headers = {
-        "Authorization": f"Token {api_token}",
-        "Accept": "application/json",
-        "Content-Type": "application/x-www-form-urlencoded",
-    }
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
-    response = requests.post(url, headers=headers, data=payload, timeout=20)
+    response = get_delhivery_client().post("/api/cmu/create.json", headers=headers, data=payload, timeout=20)
     logger.info("📬 Delhivery response: status=%s body=%s", response.status_code, response.text)
 
     try:
@@ -1,17 +1,19 @@
 from django.utils.dateparse import parse_date
 import logging
 from accounts.permissions import IsAdmin
-from admin_dashboard.utils import  create_warehouse_log
-from rest_framework.permissions import IsAuthenticated
+from admin_dashboard.utils import  create_warehouse_log, create_warehouse_logs
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from .serializers import (ShippingAddressSerializer,
                         CartCheckoutInputSerializer,
                         ReferralCheckoutInputSerializer,
                         OrderPreviewInputSerializer,
                         OrderPreviewOutputSerializer,
                         CustomerOrderListSerializer,
+                        OrderSummarySerializer,
                         OrderDetailSerializer,
+                        OrderEventSerializer,
+                        AdminOrderEventSerializer,
                         )
-from products.models import ProductVariant
 import requests
 from decimal import Decimal
 
@@ -27,9 +29,10 @@ from django.utils import timezone
 from cart.models import CartItem
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
-from .models import Order,ShippingAddress,OrderItemStatus,Refund,OrderItem
+from .models import Order,ShippingAddress,OrderItemStatus,OrderStatus,Refund,OrderItem
+from .transitions import transition_items, transition_orders
 from django.db import transaction
-import razorpay
+from django.db.models import F
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 import logging
@@ -38,6 +41,17 @@ from .utils import (process_refund,get_delivery_charge,
                     track_delhivery_shipment,
                     get_expected_tat
                     )
+from .pincodes import lookup_pincode
+from .parallel import fetch_concurrently
+from .quotes import issue_quote_token, quote_token_ttl
+from .idempotency import idempotent
+from .webhooks import ingest_webhook, WebhookSignatureError
+from .gateway import get_payment_gateway
+from .delhivery import get_delhivery_client
+from .reservations import release_for_items
+from .projections import with_list_summary, prefetch_list_items
+from .timeline import order_timeline
+from .search import OrderSearchFilter
 
 from .helpers import( process_checkout,
                     verify_razorpay_payment,
@@ -68,7 +82,7 @@ class ReferralCheckoutAPIView(APIView):
    
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
+    @idempotent("checkout")
     def post(self, request):
         serializer = ReferralCheckoutInputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -82,6 +96,7 @@ class ReferralCheckoutAPIView(APIView):
             promoter_code=request.query_params.get("ref"),
             is_cart=False,
             checkout_session_id=request.data.get("checkout_session_id") or request.data.get("unique_identifier"),
+            quote_token=request.data.get("quote_token"),
         )
 
         return Response(result["response"], status=status.HTTP_200_OK)
@@ -89,7 +104,7 @@ class ReferralCheckoutAPIView(APIView):
 class CartCheckoutAPIView(APIView):
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
+    @idempotent("checkout")
     def post(self, request):
         cart_items = CartItem.objects.filter(cart__user=request.user)
         if not cart_items.exists():
@@ -107,6 +122,7 @@ class CartCheckoutAPIView(APIView):
             is_cart=True,  # cart mode
             promoter_code=None,  # ❌ never pass promoter_code
             checkout_session_id=request.data.get("checkout_session_id") or request.data.get("unique_identifier"),
+            quote_token=request.data.get("quote_token"),
         )
 
         return Response(result["response"], status=status.HTTP_200_OK)
@@ -114,7 +130,7 @@ class CartCheckoutAPIView(APIView):
 class BuyNowAPIView(APIView):
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
+    @idempotent("checkout")
     def post(self, request):
         items = request.data.get("items", [])
         if not items or not isinstance(items, list):
@@ -138,6 +154,7 @@ class BuyNowAPIView(APIView):
             is_cart=False,
             promoter_code=None,  # ❌ do NOT pass item referral here
             checkout_session_id=request.data.get("checkout_session_id") or request.data.get("unique_identifier"),
+            quote_token=request.data.get("quote_token"),
         )
 
         return Response(result["response"], status=status.HTTP_200_OK)
@@ -158,7 +175,6 @@ class OrderDetailAPIView(RetrieveAPIView):
 class OrderPaymentAPIView(APIView):
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
     def post(self, request, order_number):
         user = request.user
         order = get_object_or_404(Order, order_number=order_number, user=user)
@@ -183,6 +199,7 @@ class OrderPaymentAPIView(APIView):
 class CancelOrderAPIView(APIView):
     permission_classes = [IsAdminOrCustomer]
 
+    @idempotent("cancel")
     @transaction.atomic
     def post(self, request, order_number):
         """
@@ -255,28 +272,33 @@ class CancelOrderAPIView(APIView):
                     notes=f"Refund error: {str(e)}",
                 )
 
-        # --- Cancel items & restock ---
-        cancelled_items_data = []
+        # --- Cancel items & restock (one UPDATE for the whole set) ---
+        items_to_cancel = list(items_to_cancel)
+        release_for_items(order, items_to_cancel)
+        transition_items(
+            [item.pk for item in items_to_cancel],
+            OrderItemStatus.CANCELLED,
+            fields={
+                "cancel_reason": cancel_reason,
+                "refund_amount": F("price") * F("quantity") if order.is_paid else 0,
+            },
+            actor=user,
+            source="cancel",
+            strict=True,
+        )
         for item in items_to_cancel:
-            variant = item.product_variant
-            variant.stock += item.quantity
-            variant.save(update_fields=["stock"])
-
             item.status = OrderItemStatus.CANCELLED
-            item.cancel_reason = cancel_reason
-            item.refund_amount = item.price * item.quantity if order.is_paid else 0
-            item.save(update_fields=["status", "cancel_reason", "refund_amount"])
-
-            create_warehouse_log(item, updated_by=user, comment="Order item cancelled")
-
-            cancelled_items_data.append(
-                {
-                    "id": item.id,
-                    "product_variant": str(item.product_variant),
-                    "quantity": item.quantity,
-                    "refund_amount": float(item.refund_amount),
-                }
-            )
+        create_warehouse_logs(items_to_cancel, updated_by=user, comment="Order item cancelled")
+
+        cancelled_items_data = [
+            {
+                "id": item.id,
+                "product_variant": item.display_name,
+                "quantity": item.quantity,
+                "refund_amount": float(item.price * item.quantity if order.is_paid else 0),
+            }
+            for item in items_to_cancel
+        ]
 
         # --- Cancel the Delhivery shipment (one per order) ---
         delhivery_response = None
@@ -288,23 +310,20 @@ class CancelOrderAPIView(APIView):
 
         # --- Update order status ---
         remaining_active = order.items.filter(status__in=cancellable_statuses)
-        order.status = "partially_cancelled" if remaining_active.exists() else "cancelled"
-
-        order.cancel_reason = cancel_reason
-        order.cancelled_at = timezone.now()
-        order.cancelled_by = user
-        order.cancelled_by_role = role
-        order.is_restocked = True
-        order.save(
-            update_fields=[
-                "status",
-                "cancel_reason",
-                "cancelled_at",
-                "cancelled_by",
-                "cancelled_by_role",
-                "is_restocked",
-            ]
+        Order.objects.filter(pk=order.pk).update(
+            cancel_reason=cancel_reason,
+            cancelled_at=timezone.now(),
+            cancelled_by=user,
+            cancelled_by_role=role,
+            is_restocked=True,
+        )
+        transition_orders(
+            [order.pk],
+            OrderStatus.PARTIALLY_CANCELLED if remaining_active.exists() else OrderStatus.CANCELLED,
+            actor=user,
+            source="cancel",
         )
+        order.refresh_from_db()
 
         create_warehouse_log(order, updated_by=user, comment="Order cancelled")
 
@@ -331,7 +350,6 @@ class CancelOrderAPIView(APIView):
 class RazorpayOrderCreateAPIView(APIView):
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
     def post(self, request, order_number):
         order = get_object_or_404(Order, order_number=order_number, user=request.user)
 
@@ -350,7 +368,9 @@ class RazorpayOrderCreateAPIView(APIView):
 class RazorpayPaymentVerifyAPIView(APIView):
     permission_classes = [IsCustomer]
 
-    @transaction.atomic
+    # No outer transaction: finalize_paid_order() commits the payment under
+    # its own short lock before any courier / mail call
+    @idempotent("verify")
     def post(self, request):
         razorpay_order_id = request.data.get("razorpay_order_id")
         razorpay_payment_id = request.data.get("razorpay_payment_id")
@@ -361,8 +381,6 @@ class RazorpayPaymentVerifyAPIView(APIView):
             raise ValidationError("Missing Razorpay payment details")
 
         order = get_object_or_404(Order, order_number=order_number, user=request.user)
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
         # Verify payment with Razorpay
         result = verify_razorpay_payment(
             order=order,
@@ -370,48 +388,43 @@ class RazorpayPaymentVerifyAPIView(APIView):
             razorpay_payment_id=razorpay_payment_id,
             razorpay_signature=razorpay_signature,
             user=request.user,
-            client=client
+            gateway=get_payment_gateway(),
         )
 
-        # ✅ Mark order paid and deduct stock
-        if not order.is_paid:
-            order.is_paid = True
-            order.save(update_fields=["is_paid"])
-
-            for item in order.items.all():
-                variant = item.product_variant
-                if variant.stock < item.quantity:
-                    raise ValidationError(f"Not enough stock for {variant}")
-                variant.stock -= item.quantity
-                variant.save(update_fields=["stock"])
-
-        # ✅ Apply pending recovery dynamically for all types
-        applied_recoveries = {}
-        if hasattr(order.user, "recovery_account"):
-            from orders.utils import apply_pending_recovery
-
-            delivery_charge = order.delivery_charge
-            for recovery_type in ["return", "replacement"]:
-                delivery_charge, applied = apply_pending_recovery(
-                    user=order.user,
-                    order=order,
-                    delivery_charge=delivery_charge,
-                    recovery_type=recovery_type
-                )
-                applied_recoveries[recovery_type] = float(applied)
-
-            order.delivery_charge = delivery_charge
-            order.total = (order.subtotal + delivery_charge).quantize(Decimal("0.01"))
-            order.save(update_fields=["delivery_charge", "total"])
-
         return Response({
             "success": True,
             "message": "Payment verified, stock updated, recovery applied",
             "data": result,
-            "applied_recoveries": applied_recoveries,
+            "applied_recoveries": result.pop("applied_recoveries", {}),
+            "stock_shortfall_variant_ids": result.pop("stock_shortfall_variant_ids", []),
         })
 
 
+# --------- Razorpay webhook (server-to-server, signed) ---------
+class RazorpayWebhookAPIView(APIView):
+    """
+    Verifies X-Razorpay-Signature, stores the raw event and acknowledges.
+    Processing (payment.captured, order.paid, refund.*) runs afterwards
+    through the same finalize_paid_order() as the verify endpoint.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            event, created = ingest_webhook(
+                request.body,
+                request.headers.get("X-Razorpay-Signature"),
+                request.headers.get("X-Razorpay-Event-Id"),
+            )
+        except WebhookSignatureError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"detail": "Invalid JSON payload"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"status": "ok", "event_id": event.event_id, "duplicate": not created})
+
+
 class ShippingAddressListCreateView(ListCreateAPIView):
     serializer_class = ShippingAddressSerializer
     permission_classes = [IsCustomer]
@@ -462,17 +475,33 @@ class ShippingAddressRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
 
 # --------- OrderListAPIView (customer-facing response) ---------
 class OrderListAPIView(ListAPIView):
+    """
+    ?view=summary returns flat rows (item count, first item, latest refund
+    status) without the nested items. ?search= matches order number,
+    waybill, product name or SKU.
+    """
     serializer_class = CustomerOrderListSerializer
     permission_classes = [IsCustomer]
-    filter_backends = [OrderingFilter]
+    filter_backends = [OrderingFilter, OrderSearchFilter]
     ordering_fields = ["created_at", "updated_at"]
     ordering = ["-created_at"]
 
+    def is_summary(self):
+        return self.request.query_params.get("view") == "summary"
+
+    def get_serializer_class(self):
+        return OrderSummarySerializer if self.is_summary() else CustomerOrderListSerializer
+
     def get_queryset(self):
         user = self.request.user
 
-
-        queryset = Order.objects.filter(user=user)
+        # Fixed query count per page: summary columns are subqueries,
+        # nested rows are prefetched
+        queryset = with_list_summary(Order.objects.filter(user=user))
+        if self.is_summary():
+            queryset = queryset.select_related("shipping_address")
+        else:
+            queryset = prefetch_list_items(queryset)
 
         status_filter = self.request.query_params.get("status")
         if status_filter:
@@ -482,6 +511,11 @@ class OrderListAPIView(ListAPIView):
         if refunded_filter in ["true", "false"]:
             queryset = queryset.filter(is_refunded=(refunded_filter == "true"))
 
+        # archived=false: recent orders only (hot index), true: history only
+        archived_filter = self.request.query_params.get("archived")
+        if archived_filter in ["true", "false"]:
+            queryset = queryset.archived() if archived_filter == "true" else queryset.hot()
+
         start_date = self.request.query_params.get("start")
         end_date = self.request.query_params.get("end")
         if start_date and end_date:
@@ -501,32 +535,26 @@ class OrderPreviewAPIView(APIView):
 
         user = request.user
 
-        # 1️⃣ Calculate subtotal
+        # 1️⃣ Calculate subtotal (whole cart revalidated in one pass)
         result = calculate_order_preview(data["items"], data["postal_code"])
 
         # 2️⃣ Total weight in grams
-        total_weight_kg = 0
-        for item in data['items']:
-            variant = ProductVariant.objects.get(id=item['product_variant_id'])
-            total_weight_kg += item['quantity'] * variant.weight
-        total_weight_g = total_weight_kg * 1000
-
-        # 3️⃣ Base delivery charge from Delhivery
-        delivery_info = get_delivery_charge(
-            o_pin=settings.DELHIVERY_PICKUP.get('pin'),
-            d_pin=data["postal_code"],
-            weight_grams=total_weight_g,
-            payment_type="Pre-paid"
-        )
-        base_delivery_charge = Decimal(delivery_info.get("charge", 0))
+        total_weight_g = result["weight_grams"]
 
-        # 4️⃣ Estimated TAT
-        tat_info = get_expected_tat(
-            origin_pin=settings.DELHIVERY_PICKUP.get('pin'),
-            destination_pin=data["postal_code"],
-            mot='E',
-            pdt='B2C'
+        # 3️⃣ + 4️⃣ Delivery charge and estimated TAT, fetched in parallel
+        pickup_pin = settings.DELHIVERY_PICKUP.get('pin')
+        external = fetch_concurrently(
+            {
+                "delivery": (get_delivery_charge, (pickup_pin, data["postal_code"]),
+                             {"weight_grams": total_weight_g, "payment_type": "Pre-paid"}),
+                "tat": (get_expected_tat, (pickup_pin, data["postal_code"]),
+                        {"mot": 'E', "pdt": 'B2C'}),
+            },
+            defaults={"delivery": {"charge": 0}, "tat": {"tat_days": None}},
         )
+        delivery_info = external["results"]["delivery"]
+        tat_info = external["results"]["tat"]
+        base_delivery_charge = Decimal(delivery_info.get("charge", 0))
 
         # 5️⃣ Add recovery amount for display only
         recovery_for_preview = Decimal("0.00")
@@ -540,8 +568,22 @@ class OrderPreviewAPIView(APIView):
         # 6️⃣ Assign into result
         result["delivery_charge"] = float(final_delivery_charge)
         result["estimated_delivery_days"] = tat_info.get("tat_days")
+        pincode = lookup_pincode(data["postal_code"])
+        result["is_serviceable"] = pincode.is_serviceable if pincode else None
+        result["partial"] = bool(external["timed_out"] or external["failed"])
         result["total"] = float(result["subtotal"]) + float(final_delivery_charge)
 
+        # 7️⃣ Signed quote so checkout can skip re-quoting the same cart
+        if data.get("postal_code") and not result["partial"] and not result["cart_changes"] \
+                and result["is_serviceable"] is not False:
+            result["quote_token"] = issue_quote_token(
+                user, data["postal_code"], result["lines"],
+                delivery_charge=base_delivery_charge,
+                recovery=recovery_for_preview,
+                tat_days=result["estimated_delivery_days"],
+            )
+            result["quote_expires_in"] = quote_token_ttl()
+
         return Response(OrderPreviewOutputSerializer(result).data, status=status.HTTP_200_OK)
 
 from .serializers import ShipmentTrackingSerializer
@@ -584,6 +626,27 @@ class OrderTrackingAPIView(APIView):
         })
 
 
+class OrderTimelineAPIView(APIView):
+    """Full history of one order, oldest first (see orders/timeline.py)."""
+    permission_classes = [IsAdminOrCustomer]
+
+    def get(self, request, order_number):
+        is_admin = request.user.is_staff or getattr(request.user, "role", None) == "admin"
+        orders = Order.objects.all() if is_admin else Order.objects.filter(user=request.user)
+        order = get_object_or_404(orders.only("pk", "order_number", "status"), order_number=order_number)
+
+        events = order_timeline(order, include_internal=is_admin)
+        serializer_class = AdminOrderEventSerializer if is_admin else OrderEventSerializer
+        if is_admin:
+            events = events.select_related("actor")
+
+        return Response({
+            "order_number": order.order_number,
+            "status": order.status,
+            "events": serializer_class(events, many=True).data,
+        })
+
+
 class GenerateDelhiveryLabelsAPIView(APIView):
     permission_classes = [IsAdmin]
 
@@ -599,11 +662,6 @@ class GenerateDelhiveryLabelsAPIView(APIView):
         if not order.waybill:
             return Response({"success": False, "message": "No waybill assigned to this order"}, status=400)
 
-        url = "https://track.delhivery.com/api/p/packing_slip"
-        headers = {
-            "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-            "Accept": "application/json",
-        }
         params = {
             "wbns": order.waybill,
             "pdf": "true",
@@ -611,7 +669,7 @@ class GenerateDelhiveryLabelsAPIView(APIView):
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=20)
+            response = get_delhivery_client().get("/api/p/packing_slip", params=params, timeout=20)
             response.raise_for_status()
             data = response.json()
         except requests.Timeout:
@@ -0,0 +1,186 @@
+"""
+Razorpay webhook ingestion.
+
+The endpoint only verifies the signature, stores the raw event (deduplicated
+on Razorpay's event id) and acknowledges. Processing happens afterwards on
+the shared worker pool, and `process_webhook_events` / the cron hook pick
+up anything a restart left behind.
+
+For local testing, sign a payload with the same secret:
+
+    body = json.dumps(payload).encode()
+    client.post(url, body, content_type="application/json",
+                HTTP_X_RAZORPAY_SIGNATURE=sign_webhook_payload(body))
+"""
+import hashlib
+import hmac
+import json
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Order, Refund, RazorpayWebhookEvent
+from .parallel import submit_calls
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_EVENTS = {"payment.captured", "order.paid"}
+REFUND_EVENTS = {"refund.processed", "refund.failed"}
+MAX_ATTEMPTS = getattr(settings, "RAZORPAY_WEBHOOK_MAX_ATTEMPTS", 5)
+
+
+class WebhookSignatureError(Exception):
+    pass
+
+
+def _secret(secret=None):
+    return secret or getattr(settings, "RAZORPAY_WEBHOOK_SECRET", "")
+
+
+def sign_webhook_payload(body, secret=None):
+    """HMAC-SHA256 hex digest of the raw body, as Razorpay sends it."""
+    return hmac.new(_secret(secret).encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_webhook_signature(body, signature, secret=None):
+    if not _secret(secret) or not signature:
+        raise WebhookSignatureError("Missing webhook secret or signature")
+    if not hmac.compare_digest(sign_webhook_payload(body, secret), signature):
+        raise WebhookSignatureError("Invalid webhook signature")
+
+
+# =====================================================
+# INGESTION (request path: verify, store, acknowledge)
+# =====================================================
+def ingest_webhook(body, signature, event_id=None):
+    """
+    Returns (event, created). Duplicate deliveries return the stored event
+    and are not processed again.
+    """
+    verify_webhook_signature(body, signature)
+    payload = json.loads(body)
+    # Razorpay sends X-Razorpay-Event-Id; fall back to the body hash
+    event_id = event_id or payload.get("id") or hashlib.sha256(body).hexdigest()
+
+    event, created = RazorpayWebhookEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={"event": payload.get("event", ""), "payload": payload},
+    )
+    if created:
+        transaction.on_commit(lambda: schedule_webhook_event(event.pk))
+    return event, created
+
+
+def schedule_webhook_event(event_pk):
+    submit_calls({"webhook": (process_webhook_event, (event_pk,), {})})
+
+
+# =====================================================
+# PROCESSING (worker pool / sweeper)
+# =====================================================
+def _claim(event_pk):
+    """Move the event to PROCESSING; False if another worker has it or it is done."""
+    return RazorpayWebhookEvent.objects.filter(
+        pk=event_pk, status__in=[RazorpayWebhookEvent.RECEIVED, RazorpayWebhookEvent.FAILED]
+    ).update(status=RazorpayWebhookEvent.PROCESSING, attempts=F("attempts") + 1, updated_at=timezone.now()) == 1
+
+
+def _entity(payload, name):
+    return ((payload.get("payload") or {}).get(name) or {}).get("entity") or {}
+
+
+def handle_payment_event(event):
+    """
+    Same path as the client verify endpoint once the payment is known to be
+    genuine (the webhook signature covers it).
+    """
+    from .helpers import finalize_paid_order, gateway_amount
+
+    payment = _entity(event.payload, "payment")
+    razorpay_order_id = payment.get("order_id") or _entity(event.payload, "order").get("id")
+    order = Order.objects.filter(razorpay_order_id=razorpay_order_id).first() if razorpay_order_id else None
+    if order is None:
+        # Unknown / unused gateway order: left to payment reconciliation
+        return RazorpayWebhookEvent.IGNORED, None, f"no order for {razorpay_order_id}"
+
+    if payment.get("amount") is not None and int(payment["amount"]) != gateway_amount(order.total):
+        # Never mark an under/over-paid order paid; reconciliation reports it
+        logger.warning(
+            "Webhook amount %s differs from order %s total %s",
+            payment["amount"], order.order_number, order.total,
+        )
+        return (
+            RazorpayWebhookEvent.IGNORED, order,
+            f"amount mismatch: paid {payment['amount']}, expected {gateway_amount(order.total)}",
+        )
+
+    outcome = finalize_paid_order(order, razorpay_order_id, payment.get("id"))
+    note = "already paid" if outcome["already_paid"] else ""
+    return RazorpayWebhookEvent.PROCESSED, order, note
+
+
+def handle_refund_event(event):
+    refund = _entity(event.payload, "refund")
+    refund_status = "processed" if event.event == "refund.processed" else "failed"
+    updates = {"status": refund_status}
+    if refund_status == "processed":
+        updates["processed_at"] = timezone.now()
+
+    rows = Refund.objects.filter(refund_id=refund.get("id"))
+    if not refund.get("id") or not rows.update(**updates):
+        return RazorpayWebhookEvent.IGNORED, None, f"no refund {refund.get('id')}"
+    return RazorpayWebhookEvent.PROCESSED, rows.first().order, ""
+
+
+def process_webhook_event(event_pk):
+    if not _claim(event_pk):
+        return None
+    event = RazorpayWebhookEvent.objects.get(pk=event_pk)
+
+    try:
+        if event.event in PAYMENT_EVENTS:
+            status, order, note = handle_payment_event(event)
+        elif event.event in REFUND_EVENTS:
+            status, order, note = handle_refund_event(event)
+        else:
+            status, order, note = RazorpayWebhookEvent.IGNORED, None, "unhandled event type"
+    except Exception as e:
+        logger.exception("Webhook %s (%s) failed", event.event_id, event.event)
+        RazorpayWebhookEvent.objects.filter(pk=event_pk).update(
+            status=RazorpayWebhookEvent.FAILED, error=str(e)[:2000], updated_at=timezone.now()
+        )
+        return RazorpayWebhookEvent.FAILED
+
+    RazorpayWebhookEvent.objects.filter(pk=event_pk).update(
+        status=status, order=order, error=note, processed_at=timezone.now(), updated_at=timezone.now()
+    )
+    return status
+
+
+def process_pending_webhook_events(limit=200, stale_after=timedelta(minutes=5)):
+    """
+    Sweeper for events nobody finished: never scheduled (process restarted),
+    failed with attempts left, or stuck in PROCESSING past `stale_after`.
+    """
+    now = timezone.now()
+    stuck = RazorpayWebhookEvent.objects.filter(
+        status=RazorpayWebhookEvent.PROCESSING, updated_at__lt=now - stale_after
+    )
+    stuck.update(status=RazorpayWebhookEvent.FAILED, error="processing timed out", updated_at=now)
+
+    pending = (
+        RazorpayWebhookEvent.objects.filter(
+            Q(status=RazorpayWebhookEvent.RECEIVED, received_at__lt=now - timedelta(minutes=1))
+            | Q(status=RazorpayWebhookEvent.FAILED, attempts__lt=MAX_ATTEMPTS)
+        )
+        .order_by("received_at")
+        .values_list("pk", flat=True)[:limit]
+    )
+    results = {}
+    for pk in list(pending):
+        status = process_webhook_event(pk)
+        if status:
+            results[status] = results.get(status, 0) + 1
+    return results
@@ -9,9 +9,9 @@ from products.serializers import ProductVariantSerializer
 from django.utils import timezone
 from django.db.models import Count
 from dateutil.relativedelta import relativedelta
-from django.conf import settings
 from django.db import transaction
 import razorpay
+from orders.gateway import get_payment_gateway
 from rest_framework import filters
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum, Count, F
@@ -471,9 +471,9 @@ class BecomePremiumPromoterAPIView(APIView):
         amount_to_charge = premium.current_amount(plan_type=plan_type)
 
         # Razorpay order creation
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        gateway = get_payment_gateway()
         payment_amount_paise = int(amount_to_charge * 100)
-        razorpay_order = client.order.create({
+        razorpay_order = gateway.create_order({
             "amount": payment_amount_paise,
             "currency": "INR",
             "receipt": f"premium_promoter_{user.id}_{timezone.now().timestamp()}",
@@ -507,9 +507,9 @@ class VerifyPremiumPaymentAPIView(APIView):
             return Response({"detail": "Invalid plan type"}, status=400)
 
         # Verify Razorpay signature
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        gateway = get_payment_gateway()
         try:
-            client.utility.verify_payment_signature({
+            gateway.verify_payment_signature({
                 "razorpay_order_id": data["razorpay_order_id"],
                 "razorpay_payment_id": data["razorpay_payment_id"],
                 "razorpay_signature": data["razorpay_signature"],
@@ -594,9 +594,9 @@ class ManageSubscriptionAPIView(APIView):
         amount_to_charge = premium.current_amount(plan_type=plan_type)
 
         # Create Razorpay order
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        gateway = get_payment_gateway()
         payment_amount_paise = int(amount_to_charge * 100)
-        razorpay_order = client.order.create({
+        razorpay_order = gateway.create_order({
             "amount": payment_amount_paise,
             "currency": "INR",
             "receipt": f"premium_renewal_{user.id}_{timezone.now().timestamp()}",
@@ -631,11 +631,11 @@ class VerifySubscriptionPaymentAPIView(APIView):
         if plan_type not in ["monthly", "annual"]:
             return Response({"detail": "Invalid plan type"}, status=400)
 
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        gateway = get_payment_gateway()
 
         # 1️⃣ Verify signature
         try:
-            client.utility.verify_payment_signature({
+            gateway.verify_payment_signature({
                 "razorpay_order_id": data["razorpay_order_id"],
                 "razorpay_payment_id": data["razorpay_payment_id"],
                 "razorpay_signature": data["razorpay_signature"],
@@ -647,7 +647,7 @@ class VerifySubscriptionPaymentAPIView(APIView):
         amount = premium.current_amount(plan_type)
 
         # 2️⃣ Validate order amount
-        order = client.order.fetch(data["razorpay_order_id"])
+        order = gateway.fetch_order(data["razorpay_order_id"])
         if order["amount"] != int(amount * 100):
             return Response({"detail": "Amount mismatch"}, status=400)
 
@@ -1267,7 +1267,8 @@ class RegisterPromoterClickAPIView(APIView):
     
 # views.py
 import requests
-from django.conf import settings
+from orders.pincodes import lookup_pincode, serviceability_payload, parse_delhivery_pincodes, upsert_pincodes, DELHIVERY_PINCODE_PATH
+from orders.delhivery import get_delhivery_client
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -1275,18 +1276,18 @@ from rest_framework import status
 
 class PincodeServiceabilityView(APIView):
     """
-    Checks if a given pincode is serviceable via Delhivery API.
+    Checks if a given pincode is serviceable.
+    Answered from the local pincode directory; unknown pincodes fall back to
+    Delhivery's API and are stored for next time.
     """
 
     def get(self, request, pin):
-        delhivery_url = f"https://track.delhivery.com/c/api/pin-codes/json/?filter_codes={pin}"
-        headers = {
-            "Authorization": f"Token {settings.DELHIVERY_API_TOKEN}",
-            "Accept": "application/json",
-        }
+        entry = lookup_pincode(pin)
+        if entry is not None:
+            return Response(serviceability_payload(entry), status=status.HTTP_200_OK)
 
         try:
-            response = requests.get(delhivery_url, headers=headers, timeout=5)
+            response = get_delhivery_client().get(DELHIVERY_PINCODE_PATH, params={"filter_codes": pin}, timeout=5)
             if response.status_code != 200:
                 return Response(
                     {
@@ -1298,6 +1299,7 @@ class PincodeServiceabilityView(APIView):
                 )
 
             data = response.json()
+            upsert_pincodes(parse_delhivery_pincodes(data))
             return Response(data, status=status.HTTP_200_OK)
 
         except requests.exceptions.RequestException as e: